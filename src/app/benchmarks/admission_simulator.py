@@ -0,0 +1,94 @@
+"""
+Simulator that replays mixed Azure OpenAI workloads through the admission controller.
+
+A few heavy users run planner/architect chains on o3-mini, many light users chat
+with gpt-4.1-mini, and background summarization shares the same deployment.
+The budget window is scaled down so a "minute" passes in a few seconds.
+
+For each workload class the simulator reports how many requests would have been
+throttled with 429 without admission control, and the queueing delay they see with it.
+
+Run from src/app:
+    python -m benchmarks.admission_simulator --window 3
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from services.admission_controller import AdmissionController, DeploymentBudget, Priority
+
+# (name, user count, requests per user, tokens per request, priority, deployment)
+workloads = [
+    ("heavy_chain", 3, 8, 9_000, Priority.INTERACTIVE, "o3-mini"),
+    ("interactive", 20, 3, 1_500, Priority.INTERACTIVE, "o3-mini"),
+    ("summarization", 2, 6, 4_000, Priority.BACKGROUND, "o3-mini"),
+]
+budgets = {"o3-mini": {"tpm": 60_000, "rpm": 60}}
+
+
+def build_requests() -> list:
+    """Build the request schedule: (arrival offset, workload, user, tokens, priority, deployment)."""
+    requests = []
+    for name, users, per_user, tokens, priority, deployment in workloads:
+        for user in range(users):
+            arrival = random.uniform(0, 0.5)
+            for _ in range(per_user):
+                requests.append((arrival, name, f"{name}-{user}",
+                                 tokens, priority, deployment))
+                arrival += random.uniform(0.05, 0.3)
+    return sorted(requests)
+
+
+def count_throttled(requests: list, window: float) -> dict:
+    """Count requests that would exceed the budget if sent immediately."""
+    budget = DeploymentBudget(budgets["o3-mini"]["tpm"],
+                              budgets["o3-mini"]["rpm"], window)
+    throttled = {name: 0 for name, *_ in workloads}
+    for arrival, name, _, tokens, _, _ in requests:
+        if budget.wait_time(tokens, arrival) > 0:
+            throttled[name] += 1
+        else:
+            budget.reserve(tokens, arrival)
+    return throttled
+
+
+async def replay(requests: list, window: float) -> dict:
+    controller = AdmissionController(budgets=budgets, window_seconds=window)
+    waits = {name: [] for name, *_ in workloads}
+    start = time.perf_counter()
+
+    async def send(arrival, name, user, tokens, priority, deployment):
+        await asyncio.sleep(arrival)
+        requested_at = time.perf_counter()
+        async with controller.admit(deployment, tokens, user_id=user, priority=priority):
+            waits[name].append(time.perf_counter() - requested_at)
+
+    await asyncio.gather(*(send(*request) for request in requests))
+    print(f"Replayed {len(requests)} requests in {time.perf_counter() - start:.1f}s")
+    return waits
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def main(window: float):
+    random.seed(7)
+    requests = build_requests()
+    throttled = count_throttled(requests, window)
+    waits = await replay(requests, window)
+
+    print(f"{'workload':<15}{'requests':>10}{'429s without':>14}{'p50 wait':>10}{'p95 wait':>10}")
+    for name, values in waits.items():
+        print(f"{name:<15}{len(values):>10}{throttled[name]:>14}"
+              f"{statistics.median(values):>9.2f}s{percentile(values, 0.95):>9.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--window", type=float, default=3.0,
+                        help="Length of the simulated budget minute in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.window))
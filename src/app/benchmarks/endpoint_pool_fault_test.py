@@ -0,0 +1,83 @@
+"""
+Fault-injection test for the Azure OpenAI endpoint pool.
+
+Runs chat-completion requests against local fake endpoints:
+  - eastus throttles most requests with 429 and a retry-after,
+  - westeurope is healthy but slow,
+  - swedencentral is healthy and fast,
+  - francecentral is down and returns 500 until its circuit breaker opens.
+
+Every request must succeed through failover, and the report shows how the pool
+spread the traffic, how often it failed over and which breakers opened.
+
+Run from src/app:
+    python -m benchmarks.endpoint_pool_fault_test --requests 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import httpx
+from services.endpoint_pool import Backend, EndpointPool, PooledAsyncTransport
+
+fake_latency = {
+    "eastus.fake": 0.05,
+    "westeurope.fake": 0.25,
+    "swedencentral.fake": 0.05,
+    "francecentral.fake": 0.05,
+}
+
+
+async def fake_azure_openai(request: httpx.Request) -> httpx.Response:
+    """Local stand-in for the Azure OpenAI endpoints, with injected faults."""
+    host = request.url.host
+    await asyncio.sleep(fake_latency[host])
+    if host == "eastus.fake" and random.random() < 0.8:
+        return httpx.Response(429, headers={"retry-after-ms": "500"})
+    if host == "francecentral.fake":
+        return httpx.Response(500)
+    body = {"choices": [{"message": {"content": f"served by {host}"}}]}
+    return httpx.Response(200, content=json.dumps(body))
+
+
+async def main(request_count: int, concurrency: int):
+    random.seed(3)
+    pool = EndpointPool([
+        Backend("eastus", "https://eastus.fake", "key-1",
+                deployments={"gpt-4.1": "gpt-4.1-eus"}, weight=2),
+        Backend("westeurope", "https://westeurope.fake", "key-2"),
+        Backend("swedencentral", "https://swedencentral.fake", "key-3"),
+        Backend("francecentral", "https://francecentral.fake", "key-4"),
+    ])
+    transport = PooledAsyncTransport(
+        pool, transport=httpx.MockTransport(fake_azure_openai))
+    semaphore = asyncio.Semaphore(concurrency)
+    served = {}
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        async def call():
+            async with semaphore:
+                response = await client.post(
+                    "https://logical.openai.azure.com/openai/deployments/gpt-4.1/chat/completions?api-version=2024-12-01-preview",
+                    json={"messages": [{"role": "user", "content": "hi"}]})
+                response.raise_for_status()
+                host = response.json()["choices"][0]["message"]["content"]
+                served[host] = served.get(host, 0) + 1
+
+        await asyncio.gather(*(call() for _ in range(request_count)))
+
+    stats = pool.get_stats()
+    print(f"{request_count} requests succeeded, {stats['failovers']} failovers")
+    for host, count in sorted(served.items()):
+        print(f"  {host}: {count}")
+    for name, backend in stats["backends"].items():
+        print(f"  {name:<14} requests={backend['requests']:<4} throttled={backend['throttled']:<4}"
+              f" failed={backend['failed']:<3} latency={backend['latency_seconds']:.3f}s breaker={backend['breaker']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,75 @@
+"""
+Fault-injection test for the tool resilience guard.
+
+Drives a ToolGuard with a local stub endpoint that goes through four phases:
+  1. healthy, with a slow tail on a few percent of requests (hedging kicks in),
+  2. hanging past the latency budget (timeouts, then the breaker opens),
+  3. down with errors while the breaker is open (fail fast, stale results served),
+  4. recovered (the half-open trial closes the breaker again).
+
+Run from src/app:
+    python -m benchmarks.resilience_fault_test
+"""
+import asyncio
+import random
+import time
+from services.resilience import CircuitBreaker, ToolGuard
+
+queries = [f"query {index}" for index in range(10)]
+
+
+class FaultyToolStub:
+    """Local stand-in for an MCP endpoint with injectable faults."""
+
+    def __init__(self):
+        self.mode = "healthy"
+        self.requests = 0
+
+    async def search(self, query: str) -> str:
+        self.requests += 1
+        if self.mode == "hanging":
+            await asyncio.sleep(60)
+        if self.mode == "down":
+            raise ConnectionError("endpoint unreachable")
+        # Healthy: mostly fast, with a slow tail
+        await asyncio.sleep(2.0 if random.random() < 0.05 else random.uniform(0.02, 0.06))
+        return f"results for {query}"
+
+
+async def run_phase(guard: ToolGuard, stub: FaultyToolStub, mode: str, calls: int):
+    stub.mode = mode
+    before = dict(guard.stats)
+    stale = failed = 0
+    start = time.perf_counter()
+    for index in range(calls):
+        query = queries[index % len(queries)]
+        result = await guard.call(key=query,
+                                  fn=lambda: stub.search(query),
+                                  fallback_message="Could not retrieve results.")
+        stale += result.startswith("[Stale result")
+        failed += result.startswith("Could not retrieve")
+    elapsed = time.perf_counter() - start
+    delta = {key: guard.stats[key] - before[key] for key in before}
+    print(f"{mode:<9} calls={calls:<4} {elapsed:6.2f}s hedged={delta['hedged']:<3} "
+          f"timeouts={delta['timeouts']:<3} errors={delta['failures']:<3} "
+          f"short_circuited={delta['short_circuited']:<4} stale={stale:<4} "
+          f"unanswered={failed:<3} breaker={guard.breaker.state}")
+
+
+async def main():
+    random.seed(5)
+    stub = FaultyToolStub()
+    guard = ToolGuard("stub", latency_budget=0.5,
+                      breaker=CircuitBreaker(failure_threshold=3, reset_timeout=1.0))
+
+    await run_phase(guard, stub, "healthy", 200)
+    print(f"          hedging after {guard.hedge_after():.3f}s")
+    await run_phase(guard, stub, "hanging", 20)
+    await run_phase(guard, stub, "down", 50)
+    await asyncio.sleep(1.1)  # Let the breaker reach half-open
+    await run_phase(guard, stub, "healthy", 20)
+    print(f"Stub received {stub.requests} requests in total")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Compare RU cost and latency of filtered and unfiltered Seismic searches.
+
+Runs every case twice against the configured Cosmos DB account: once with the
+filters pushed into the query, and once unfiltered with the filters applied to
+the top results afterwards, as the agent used to do. Reports request charge,
+latency and how many of the top results actually match the filters.
+
+Cases come from a JSONL file of {"query": ..., "filters": {...}} lines, or a
+built-in set. The request charge is that of the query's last response page,
+which is the whole query for these TOP-limited searches.
+
+Run from src/app (apply infra/cosmos/seismic-contents-indexing-policy.json first):
+    python -m benchmarks.seismic_filter_benchmark [cases.jsonl] --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from services.cosmos_db_service import cosmos_db_service
+
+container_name = "seismic-contents"
+fields = ["name", "url", "description", "last_update", "expiration_date",
+          "level", "solution_area", "format", "size", "confidentiality"]
+
+default_cases = [
+    {"query": "azure openai pitch deck", "filters": {"level": "300"}},
+    {"query": "data platform modernization", "filters": {"format": "PPTX"}},
+    {"query": "copilot customer stories", "filters": {"level": ["300", "400"]}},
+    {"query": "security workshop", "filters": {}},
+]
+
+
+def matches(item: dict, filters: dict, now: str) -> bool:
+    """Return True if an unfiltered result would have passed the filters."""
+    for field, value in filters.items():
+        allowed = value if isinstance(value, list) else [value]
+        if item.get(field) not in allowed:
+            return False
+    expiration_date = item.get("expiration_date")
+    return not expiration_date or expiration_date >= now
+
+
+def run(case: dict, filtered: bool) -> tuple[float, float, int]:
+    container = cosmos_db_service.get_container(container_name)
+    start = time.perf_counter()
+    results = cosmos_db_service.hybrid_search(
+        search_terms=case["query"],
+        container_name=container_name,
+        fields=fields,
+        top_count=10,
+        filters=case["filters"] if filtered else None,
+        not_expired_field="expiration_date" if filtered else None)
+    latency = time.perf_counter() - start
+    charge = float(container.client_connection.last_response_headers.get(
+        "x-ms-request-charge", 0))
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    return charge, latency, sum(matches(item, case["filters"], now) for item in results)
+
+
+def main(path: str, repeat: int):
+    if path:
+        with open(path, "r", encoding="utf-8") as file:
+            cases = [json.loads(line) for line in file if line.strip()]
+    else:
+        cases = default_cases
+
+    print(f"{'query':32} {'mode':10} {'RU':>8} {'p50 ms':>8} {'matching':>9}")
+    for case in cases:
+        for filtered in (False, True):
+            runs = [run(case, filtered) for _ in range(repeat)]
+            print(f"{case['query'][:32]:32} {'filtered' if filtered else 'unfiltered':10} "
+                  f"{statistics.mean(r[0] for r in runs):8.2f} "
+                  f"{statistics.median(r[1] for r in runs) * 1000:8.0f} "
+                  f"{runs[-1][2]:>6}/10")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("cases", nargs="?", help="JSONL file with query and filters cases")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Runs per case and mode")
+    args = parser.parse_args()
+    main(args.cases, args.repeat)
@@ -0,0 +1,97 @@
+"""
+Replay traffic through the semantic answer cache and report hit ratio and latency.
+
+Replays a JSONL file of {"agent": ..., "message": ...} turns (or a synthetic mix
+of repeated and paraphrased questions when no file is given). Embeddings come
+from a local hashed bag-of-words model so the replay runs offline, and answer
+generation is simulated with a fixed latency per miss.
+
+Run from src/app:
+    python -m benchmarks.semantic_cache_replay [turns.jsonl] --generation-latency 4
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+from services.semantic_cache import SemanticCache
+
+dimensions = 256
+
+synthetic_questions = {
+    "github_agent": ["rag samples with cosmos db", "semantic kernel agent samples",
+                     "azure openai chat app template", "aks landing zone repo"],
+    "blog_posts_agent": ["latest announcements about fabric", "copilot studio news",
+                         "what is new in azure ai foundry"],
+    "explainer_agent": ["what is a vector database", "explain retrieval augmented generation",
+                        "what is kubernetes", "what is a service principal"],
+    "aws_docs_agent": ["s3 authentication options", "lambda cold start tuning"],
+}
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Hashed bag-of-words embedding, good enough to group paraphrases offline."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0
+    return vector
+
+
+def paraphrase(question: str) -> str:
+    variants = [question, question.capitalize() + "?", f"{question} please",
+                f"can you tell me {question}", question.upper()]
+    return random.choice(variants)
+
+
+def synthetic_turns(count: int) -> list[dict]:
+    turns = []
+    for _ in range(count):
+        agent = random.choice(list(synthetic_questions))
+        turns.append({"agent": agent,
+                      "message": paraphrase(random.choice(synthetic_questions[agent]))})
+    return turns
+
+
+def main(path: str, count: int, threshold: float, generation_latency: float):
+    random.seed(11)
+    if path:
+        with open(path, "r", encoding="utf-8") as file:
+            turns = [json.loads(line) for line in file if line.strip()]
+    else:
+        turns = synthetic_turns(count)
+
+    cache = SemanticCache(embed=fake_embedding, similarity_threshold=threshold,
+                          dimensions=dimensions)
+    cached_latency = 0.0
+    replayed = 0
+    for turn in turns:
+        if not cache.is_cacheable(turn["agent"]):
+            continue
+        replayed += 1
+        answer, embedding = cache.lookup(turn["agent"], turn["message"])
+        if answer is None:
+            cache.store(turn["agent"], turn["message"], embedding,
+                        f"answer to {turn['message']}")
+            cached_latency += generation_latency
+
+    stats = cache.get_stats()
+    cached_latency += stats["average_lookup_seconds"] * replayed
+    uncached_latency = generation_latency * replayed
+    print(f"Replayed {replayed} cacheable turns")
+    print(f"Hit ratio: {stats['hit_ratio']:.1%} ({stats['hits']} hits, {stats['entries']} entries)")
+    print(f"Average lookup: {stats['average_lookup_seconds'] * 1000:.2f} ms")
+    print(f"Mean turn latency without cache: {uncached_latency / replayed:.2f}s, "
+          f"with cache: {cached_latency / replayed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("turns", nargs="?", help="JSONL file with recorded turns")
+    parser.add_argument("--count", type=int, default=1000,
+                        help="Number of synthetic turns when no file is given")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--generation-latency", type=float, default=4.0,
+                        help="Simulated seconds to generate an answer on a miss")
+    args = parser.parse_args()
+    main(args.turns, args.count, args.threshold, args.generation_latency)
@@ -0,0 +1,85 @@
+"""
+Load test for request coalescing of identical concurrent searches.
+
+Simulates many sessions sending near-identical starter questions at the same
+moment against a fake search backend, and compares the number of backend calls
+with and without the shared SingleFlight layer.
+
+Run from src/app:
+    python -m benchmarks.singleflight_load_test --sessions 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from services.singleflight import SingleFlight
+
+starter_questions = [
+    "Design an AI assistant with frontend, backend, and database integration.",
+    "Create a bot to analyze and visualize data trends.",
+    "How is the weather today?",
+]
+
+
+class FakeSearchBackend:
+    """Stand-in for an embedding call plus a Cosmos DB query."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, query: str) -> list:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [{"name": f"result for {query}"}]
+
+
+def vary(question: str) -> str:
+    """Apply the casing and whitespace noise of real user input."""
+    if random.random() < 0.3:
+        question = question.lower()
+    if random.random() < 0.3:
+        question = f"  {question}  "
+    return question
+
+
+async def run_sessions(sessions: int, latency: float, coalesce: bool) -> tuple:
+    backend = FakeSearchBackend(latency)
+    flight = SingleFlight()
+
+    async def session():
+        # Users arrive within the same second, as they do after an announcement
+        await asyncio.sleep(random.uniform(0, 1.0))
+        query = vary(random.choice(starter_questions))
+        if coalesce:
+            return await flight.do(("search", flight.normalize(query)),
+                                   lambda: backend.search(query))
+        return await backend.search(query)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    return backend.calls, time.perf_counter() - start, flight.get_stats()
+
+
+async def main(sessions: int, latency: float):
+    random.seed(42)
+    baseline_calls, baseline_time, _ = await run_sessions(
+        sessions, latency, coalesce=False)
+    random.seed(42)
+    coalesced_calls, coalesced_time, stats = await run_sessions(
+        sessions, latency, coalesce=True)
+
+    print(f"Sessions: {sessions}, backend latency: {latency:.2f}s")
+    print(f"Without coalescing: {baseline_calls} backend calls in {baseline_time:.2f}s")
+    print(f"With coalescing:    {coalesced_calls} backend calls in {coalesced_time:.2f}s")
+    print(f"Coalesced calls:    {stats['coalesced']} of {stats['calls']}")
+    print(f"Backend calls saved: {1 - coalesced_calls / baseline_calls:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.8,
+                        help="Simulated backend latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency))
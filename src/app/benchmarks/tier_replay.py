@@ -0,0 +1,78 @@
+"""
+Offline replay harness that compares model tiers on recorded sessions.
+
+Reads recorded turns from a JSONL file with one {"agent": ..., "message": ...}
+object per line, replays each turn on every tier of the agent, and reports
+latency, estimated tokens and how often each tier's answer would have been
+escalated. With --dry-run only the tier plan is computed, without model calls.
+
+Run from src/app:
+    python -m benchmarks.tier_replay recorded_sessions.jsonl
+"""
+import argparse
+import asyncio
+import json
+import time
+from services.model_tiering import ModelTieringService
+
+
+def load_turns(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+async def replay(turns: list[dict], tiering: ModelTieringService):
+    # Imported here so a dry run does not need Azure OpenAI credentials
+    from semantic_kernel.contents import ChatMessageContent
+    from services.agent_factory import agent_factory
+
+    for turn in turns:
+        policy = tiering.policies.get(turn["agent"])
+        if not policy:
+            continue
+        for model_name in policy.tiers:
+            agent = agent_factory.get_tier_agent(turn["agent"], model_name)
+            start = time.perf_counter()
+            response = await agent.get_response(messages=[ChatMessageContent(
+                role="user", content=turn["message"])])
+            answer = str(response)
+            tiering.record(agent_name=turn["agent"],
+                           model_name=model_name,
+                           message=turn["message"],
+                           answer=answer,
+                           latency=time.perf_counter() - start,
+                           escalated=tiering.should_escalate(answer))
+
+
+def main(path: str, dry_run: bool):
+    turns = load_turns(path)
+    tiering = ModelTieringService()
+
+    planned = {}
+    for turn in turns:
+        models = tiering.plan(turn["agent"], turn["message"])
+        start_model = models[0] if models else "untiered"
+        planned[(turn["agent"], start_model)] = planned.get(
+            (turn["agent"], start_model), 0) + 1
+
+    print("Starting tier chosen per turn:")
+    for (agent, model), count in sorted(planned.items()):
+        print(f"  {agent:<24}{model:<16}{count:>6}")
+    if dry_run:
+        return
+
+    asyncio.run(replay(turns, tiering))
+    print(f"\n{'tier':<40}{'turns':>6}{'escalate':>10}{'p50':>8}{'p95':>8}{'prompt tok':>12}{'compl tok':>11}")
+    for tier, stats in sorted(tiering.get_stats().items()):
+        print(f"{tier:<40}{stats['turns']:>6}{stats['escalations']:>10}"
+              f"{stats['latency_p50']:>7.2f}s{stats['latency_p95']:>7.2f}s"
+              f"{stats['prompt_tokens']:>12}{stats['completion_tokens']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sessions", help="JSONL file with recorded turns")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only compute the tier plan, without model calls")
+    args = parser.parse_args()
+    main(args.sessions, args.dry_run)
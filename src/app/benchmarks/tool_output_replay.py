@@ -0,0 +1,81 @@
+"""
+Replay recorded tool outputs through the tool-output formatter.
+
+Reports, per tool, the tokens the model would have received before shaping
+(indented JSON, or the repr of the Cosmos DB result lists) and after shaping,
+how many results were dropped as duplicates or cut by the budget, and the time
+spent formatting.
+
+Outputs come from a JSONL file of {"tool": ..., "output": ...} lines, where
+output is the raw result list, dict or text of the tool, or a built-in set of
+synthetic outputs. The end-to-end effect on latency shows in the
+response_time of the chat_message telemetry, next to the tool_output events.
+
+Run from src/app:
+    python -m benchmarks.tool_output_replay [outputs.jsonl]
+"""
+import argparse
+import json
+import random
+from services.tool_output import ToolOutputFormatter
+
+
+def synthetic_outputs() -> list[dict]:
+    random.seed(11)
+    passage = ("Azure Functions is a serverless solution that allows you to write less code, "
+               "maintain less infrastructure, and save on costs. ")
+    docs = [{"title": f"Azure Functions overview {index % 4}",
+             "content": passage * random.randint(5, 40)} for index in range(10)]
+    repos = [{"name": f"functions-sample-{index}",
+              "url": f"https://github.com/Azure-Samples/functions-sample-{index}",
+              "description": "Sample showing how to build serverless APIs with Azure Functions. " * 3,
+              "stars_count": random.randint(0, 500), "archived": False,
+              "updated_at": "2025-08-01T10:00:00Z",
+              "similarity_score": random.random()} for index in range(10)]
+    seismic = [{"name": f"Azure AI pitch deck {index}",
+                "url": f"https://seismic.example.com/content/{index}",
+                "description": "Customer facing presentation on Azure AI services. " * 4,
+                "last_update": "2025-08-01T09:15:00", "expiration_date": "",
+                "level": "300", "solution_area": "Cloud and AI Platforms",
+                "format": "PPTX", "size": "2.4 MB", "confidentiality": "Internal",
+                "similarity_score": random.random()} for index in range(10)]
+    return [
+        {"tool": "microsoft_docs_search", "output": docs},
+        {"tool": "github_repository_search", "output": repos},
+        {"tool": "github_repository_search_many",
+         "output": {"fused": repos[:10]}},
+        {"tool": "seismic_search", "output": seismic},
+        {"tool": "bing_search", "output": passage * 200},
+    ]
+
+
+def load_outputs(path: str) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def main(path: str = None, repeat: int = 20):
+    outputs = load_outputs(path) if path else synthetic_outputs()
+    # Every call is measured, not a sample
+    formatter = ToolOutputFormatter(measure_every=1)
+    for _ in range(repeat):
+        for record in outputs:
+            formatter.format(record["tool"], record["output"])
+
+    print(f"{'tool':32} {'before':>8} {'after':>8} {'saved':>7} {'dupes':>6} {'cut':>5} {'ms':>7}")
+    for tool, stats in formatter.get_stats().items():
+        before = stats["tokens_before_per_call"]
+        after = stats["tokens_after_per_call"]
+        saved = 1 - after / before if before else 0.0
+        print(f"{tool:32} {before:8.0f} {after:8.0f} {saved:7.0%} "
+              f"{stats['duplicates_removed'] / stats['calls']:6.1f} "
+              f"{stats['truncated'] / stats['calls']:5.0%} "
+              f"{stats['average_format_seconds'] * 1000:7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("outputs", nargs="?", help="JSONL file of recorded tool outputs")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.outputs, args.repeat)
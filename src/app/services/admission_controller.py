@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Awaitable, Callable, Optional
+import httpx
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priorities, lower values are admitted first."""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# Per-turn request context, set by the chat handler
+current_user: ContextVar[str] = ContextVar(
+    "admission_user", default="anonymous")
+current_priority: ContextVar[Priority] = ContextVar(
+    "admission_priority", default=Priority.INTERACTIVE)
+# Called with (deployment, queue position, estimated wait seconds) when a request has to wait
+current_wait_notifier: ContextVar[Optional[Callable[[str, int, float], Awaitable[None]]]] = ContextVar(
+    "admission_wait_notifier", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used for budgeting (about 4 characters per token)."""
+    return max(1, len(text or "") // 4)
+
+
+class DeploymentBudget:
+    """Sliding-window token-per-minute and request-per-minute budget of a deployment."""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int, window_seconds: float = 60.0):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self.usage: deque = deque()  # (timestamp, tokens)
+        self.tokens_in_window = 0
+
+    def _trim(self, now: float) -> None:
+        while self.usage and now - self.usage[0][0] >= self.window_seconds:
+            _, tokens = self.usage.popleft()
+            self.tokens_in_window -= tokens
+
+    def clamp(self, tokens: int) -> int:
+        # A single request larger than the whole budget would never be admitted
+        return min(tokens, self.tokens_per_minute)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Return how long until the request fits the budget, 0 if it fits now."""
+        self._trim(now)
+        tokens = self.clamp(tokens)
+        if (len(self.usage) < self.requests_per_minute
+                and self.tokens_in_window + tokens <= self.tokens_per_minute):
+            return 0.0
+
+        # Find the earliest moment enough old usage has left the window
+        freed_tokens = 0
+        for index, (timestamp, used) in enumerate(self.usage):
+            freed_tokens += used
+            requests_left = len(self.usage) - index - 1
+            if (requests_left < self.requests_per_minute
+                    and self.tokens_in_window - freed_tokens + tokens <= self.tokens_per_minute):
+                return max(timestamp + self.window_seconds - now, 0.001)
+        return self.window_seconds
+
+    def reserve(self, tokens: int, now: float) -> None:
+        tokens = self.clamp(tokens)
+        self.usage.append((now, tokens))
+        self.tokens_in_window += tokens
+
+
+class Waiter:
+    """A request waiting for admission."""
+
+    def __init__(self, user_id: str, priority: Priority, tokens: int):
+        self.user_id = user_id
+        self.priority = priority
+        self.tokens = tokens
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class DeploymentQueue:
+    """Per-deployment fair queue: priority levels, round-robin across users within a level."""
+
+    def __init__(self, budget: DeploymentBudget):
+        self.budget = budget
+        self.levels: dict[Priority, OrderedDict] = {
+            priority: OrderedDict() for priority in Priority}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for level in self.levels.values() for waiters in level.values())
+
+    def push(self, waiter: Waiter) -> None:
+        self.levels[waiter.priority].setdefault(
+            waiter.user_id, deque()).append(waiter)
+
+    def peek(self) -> Optional[Waiter]:
+        for priority in Priority:
+            level = self.levels[priority]
+            if level:
+                return next(iter(level.values()))[0]
+        return None
+
+    def pop(self, waiter: Waiter) -> None:
+        level = self.levels[waiter.priority]
+        waiters = level[waiter.user_id]
+        waiters.remove(waiter)
+        # Move the user to the back of the round-robin order
+        del level[waiter.user_id]
+        if waiters:
+            level[waiter.user_id] = waiters
+
+    def position(self, waiter: Waiter) -> int:
+        position = 0
+        for priority in Priority:
+            for waiters in self.levels[priority].values():
+                if waiter in waiters:
+                    return position + waiters.index(waiter) + 1
+                position += len(waiters)
+        return position
+
+
+class AdmissionController:
+    """Admission control in front of every Azure OpenAI chat-completion and embedding call.
+
+    Tracks token-per-minute and request-per-minute budgets per deployment and
+    queues requests that would exceed them instead of letting them fail with 429.
+    Queued requests are admitted by priority and round-robin across users, so a
+    few heavy users cannot starve everyone else.
+    """
+
+    default_budget = {"tpm": 100_000, "rpm": 600}
+
+    def __init__(self, budgets: Optional[dict] = None, window_seconds: float = 60.0):
+        if budgets is None:
+            budgets = json.loads(os.getenv("AZURE_OPENAI_BUDGETS", "{}"))
+        self.budgets = budgets
+        self.window_seconds = window_seconds
+        self.queues: dict[str, DeploymentQueue] = {}
+        self.admitted = 0
+        self.queued = 0
+        self.total_wait = 0.0
+
+    def get_queue(self, deployment: str) -> DeploymentQueue:
+        if deployment not in self.queues:
+            budget = self.budgets.get(deployment, self.default_budget)
+            self.queues[deployment] = DeploymentQueue(DeploymentBudget(
+                tokens_per_minute=budget["tpm"],
+                requests_per_minute=budget["rpm"],
+                window_seconds=self.window_seconds))
+        return self.queues[deployment]
+
+    def _dispatch(self, deployment: str) -> None:
+        queue = self.get_queue(deployment)
+        queue.timer = None
+        loop = asyncio.get_running_loop()
+        while (waiter := queue.peek()) is not None:
+            if waiter.future.done():
+                # The caller was cancelled while waiting
+                queue.pop(waiter)
+                continue
+            delay = queue.budget.wait_time(waiter.tokens, loop.time())
+            if delay > 0:
+                queue.timer = loop.call_later(delay, self._dispatch, deployment)
+                return
+            queue.budget.reserve(waiter.tokens, loop.time())
+            queue.pop(waiter)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, deployment: str, tokens: int,
+                    user_id: Optional[str] = None,
+                    priority: Optional[Priority] = None):
+        """Wait until the deployment has budget for the request, then let it through."""
+        waiter = Waiter(user_id=user_id or current_user.get(),
+                        priority=current_priority.get() if priority is None else priority,
+                        tokens=tokens)
+        queue = self.get_queue(deployment)
+        queue.push(waiter)
+        if queue.timer is None:
+            self._dispatch(deployment)
+
+        if not waiter.future.done():
+            self.queued += 1
+            notifier = current_wait_notifier.get()
+            if notifier:
+                loop = asyncio.get_running_loop()
+                eta = queue.budget.wait_time(waiter.tokens, loop.time())
+                await notifier(deployment, queue.position(waiter), eta)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            waiter.future.cancel()
+            raise
+
+        self.admitted += 1
+        self.total_wait += time.perf_counter() - waiter.enqueued_at
+        yield
+
+    def get_stats(self) -> dict:
+        """Return admission counters and the current queue depth per deployment."""
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "average_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "queue_depth": {name: len(queue) for name, queue in self.queues.items()},
+        }
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """Estimate prompt plus completion tokens of an Azure OpenAI request body."""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return estimate_tokens(body.decode("utf-8", errors="ignore"))
+
+    if "input" in payload:  # Embeddings
+        inputs = payload["input"]
+        texts = inputs if isinstance(inputs, list) else [inputs]
+        return sum(estimate_tokens(str(text)) for text in texts)
+
+    prompt_tokens = estimate_tokens(json.dumps(
+        payload.get("messages", []), ensure_ascii=False))
+    completion_tokens = payload.get("max_completion_tokens") or payload.get(
+        "max_tokens") or 1000
+    return prompt_tokens + min(completion_tokens, 4096)
+
+
+class AdmissionTransport(httpx.AsyncBaseTransport):
+    """httpx transport that puts the admission controller in front of Azure OpenAI requests."""
+
+    deployment_pattern = re.compile(r"/deployments/([^/]+)/")
+
+    def __init__(self, controller: "AdmissionController",
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 priority: Optional[Priority] = None):
+        self.controller = controller
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.priority = priority
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        match = self.deployment_pattern.search(request.url.path)
+        if not match:
+            return await self.transport.handle_async_request(request)
+
+        async with self.controller.admit(
+                deployment=match.group(1),
+                tokens=estimate_request_tokens(request.content),
+                priority=self.priority):
+            return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# Global instance
+admission_controller = AdmissionController()
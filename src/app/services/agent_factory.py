@@ -1,4 +1,5 @@
 import os
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from semantic_kernel import Kernel
 from semantic_kernel.agents import ChatCompletionAgent
 from semantic_kernel.connectors.ai import FunctionChoiceBehavior
@@ -6,10 +7,13 @@ from semantic_kernel.connectors.ai.open_ai import (
     AzureChatCompletion,
     OpenAIChatPromptExecutionSettings,
 )
+from .admission_controller import AdmissionTransport, Priority, admission_controller
 from .cache_service import cache_service
+from .endpoint_pool import PooledAsyncTransport, endpoint_pool
 from .plugin_factory import (
     github_plugin, github_docs_plugin, microsoft_docs_plugin,
-    blog_posts_plugin, seismic_plugin, bing_plugin, aws_docs_plugin
+    blog_posts_plugin, seismic_plugin, bing_plugin, aws_docs_plugin,
+    related_content_plugin
 )
 import logging
 
@@ -22,6 +26,9 @@ logger = logging.getLogger(__name__)
 class AgentFactory:
     """Factory for creating chat completion agents."""
 
+    # Agents whose calls yield to interactive traffic under load
+    background_agents = ["summarizer_agent"]
+
     def __init__(self):
         self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.api_key = os.getenv("AI_FOUNDRY_KEY")
@@ -44,12 +51,28 @@ class AgentFactory:
             "explainer_agent": self.get_explainer_agent(),
         }
         self.agents["orchestrator_agent"] = self.get_orchestrator_agent()
+        self.tier_agents: dict[tuple, ChatCompletionAgent] = {}
 
     def create_kernel(self,
                       agent_name: str,
                       model_name: str,
                       api_version: str = "2024-12-01-preview") -> Kernel:
         """Create a kernel with the desired model."""
+        # Route every completion through the admission controller so agents
+        # sharing a deployment queue fairly instead of hitting 429s, then
+        # spread it over the endpoint pool with failover on throttling
+        priority = Priority.BACKGROUND if agent_name in self.background_agents else None
+        async_client = AsyncAzureOpenAI(
+            azure_endpoint=self.endpoint,
+            api_key=self.api_key,
+            api_version=api_version,
+            http_client=DefaultAsyncHttpxClient(
+                transport=AdmissionTransport(
+                    admission_controller,
+                    transport=PooledAsyncTransport(endpoint_pool),
+                    priority=priority))
+        )
+
         kernel = Kernel()
         kernel.add_service(
             AzureChatCompletion(
@@ -57,7 +80,8 @@ class AgentFactory:
                 endpoint=self.endpoint,
                 api_key=self.api_key,
                 service_id=agent_name,
-                api_version=api_version)
+                api_version=api_version,
+                async_client=async_client)
         )
 
         return kernel
@@ -66,6 +90,14 @@ class AgentFactory:
         """Get all agents."""
         return self.agents
 
+    def get_tier_agent(self, agent_name: str, model_name: str) -> ChatCompletionAgent:
+        """Get a variant of an agent running on the given model tier."""
+        key = (agent_name, model_name)
+        if key not in self.tier_agents:
+            self.tier_agents[key] = getattr(self, f"get_{agent_name}")(
+                model_name=model_name)
+        return self.tier_agents[key]
+
     def get_orchestrator_agent(self) -> ChatCompletionAgent:
         """Create an orchestrator agent with the necessary plugins."""
         agent_name = "orchestrator_agent"
@@ -140,10 +172,9 @@ class AgentFactory:
 
         return planner_agent
 
-    def get_github_agent(self) -> ChatCompletionAgent:
+    def get_github_agent(self, model_name: str = "gpt-4.1-mini") -> ChatCompletionAgent:
         """Create a GitHub agent with the necessary plugins."""
         agent_name = "github_agent"
-        model_name = "gpt-4.1-mini"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -157,15 +188,14 @@ class AgentFactory:
             name=agent_name,
             description="GitHub agent that fetches relevant information from GitHub repositories.",
             instructions=cache_service.load_prompt(agent_name),
-            plugins=[github_plugin]
+            plugins=[github_plugin, related_content_plugin]
         )
 
         return github_agent
 
-    def get_microsoft_docs_agent(self) -> ChatCompletionAgent:
+    def get_microsoft_docs_agent(self, model_name: str = "gpt-4.1") -> ChatCompletionAgent:
         """Create a Microsoft Docs agent with the necessary plugins."""
         agent_name = "microsoft_docs_agent"
-        model_name = "gpt-4.1"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -184,10 +214,9 @@ class AgentFactory:
 
         return microsoft_docs_agent
 
-    def get_blog_posts_agent(self) -> ChatCompletionAgent:
+    def get_blog_posts_agent(self, model_name: str = "gpt-4.1-mini") -> ChatCompletionAgent:
         """Create a Blog Posts agent with the necessary plugins."""
         agent_name = "blog_posts_agent"
-        model_name = "gpt-4.1-mini"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -201,15 +230,14 @@ class AgentFactory:
             name=agent_name,
             description="Blog Posts agent that searches for relevant blog posts.",
             instructions=cache_service.load_prompt(agent_name),
-            plugins=[blog_posts_plugin]
+            plugins=[blog_posts_plugin, related_content_plugin]
         )
 
         return blog_posts_agent
 
-    def get_seismic_agent(self) -> ChatCompletionAgent:
+    def get_seismic_agent(self, model_name: str = "gpt-4.1-mini") -> ChatCompletionAgent:
         """Create a Seismic agent with the necessary plugins."""
         agent_name = "seismic_agent"
-        model_name = "gpt-4.1-mini"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -223,7 +251,7 @@ class AgentFactory:
             name=agent_name,
             description="Seismic agent that searches for relevant presentations and PowerPoints.",
             instructions=cache_service.load_prompt(agent_name),
-            plugins=[seismic_plugin]
+            plugins=[seismic_plugin, related_content_plugin]
         )
 
         return seismic_agent
@@ -272,10 +300,9 @@ class AgentFactory:
 
         return github_docs_search_agent
 
-    def get_aws_docs_agent(self) -> ChatCompletionAgent:
+    def get_aws_docs_agent(self, model_name: str = "gpt-4.1-mini") -> ChatCompletionAgent:
         """Create an AWS Docs agent with the necessary plugins."""
         agent_name = "aws_docs_agent"
-        model_name = "gpt-4.1-mini"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -339,10 +366,9 @@ class AgentFactory:
 
         return summarizer_agent
 
-    def get_explainer_agent(self) -> ChatCompletionAgent:
+    def get_explainer_agent(self, model_name: str = "gpt-4.1") -> ChatCompletionAgent:
         """Create an explainer agent with the necessary plugins."""
         agent_name = "explainer_agent"
-        model_name = "gpt-4.1"
 
         # Clone the base kernel and add the OpenAI service
         kernel = self.create_kernel(
@@ -1,13 +1,38 @@
 import os
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from azure.core import MatchConditions
 from azure.cosmos import CosmosClient, PartitionKey, exceptions, ContainerProxy, CosmosDict
 from .foundry_service import FoundryService
+from .singleflight import search_flight
+from .admission_controller import admission_controller, estimate_tokens
+from .turn_scope import remaining_time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv(override=True)
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Neighbors of each item across containers, precomputed nightly by the crawlers' related content job
+related_container_name = "related-content"
+
+# Profiles of embedding model migrations, written by the crawlers' embedding backfill
+embedding_profiles_container_name = "embedding-profiles"
+default_embedding_profile = {"model": "text-embedding-3-small", "dimensions": 1536, "field": "embedding"}
+
 
 class CosmosDBService:
+    search_timeout = 30.0
+    embedding_profile_ttl = 60.0
+
     def __init__(self):
         endpoint = os.environ.get('COSMOSDB_ENDPOINT')
         key = os.environ.get('COSMOSDB_KEY')
@@ -18,6 +43,7 @@ class CosmosDBService:
         self.client = CosmosClient(endpoint, key)
         self.database = self.client.get_database_client(database_name)
         self.foundry_service = FoundryService()
+        self.embedding_profiles: dict[str, tuple[float, dict]] = {}
 
     def get_container(self, container_name: str) -> ContainerProxy:
         return self.database.get_container_client(container_name)
@@ -37,13 +63,31 @@ class CosmosDBService:
         except exceptions.CosmosResourceNotFoundError:
             return None
 
-    def update_item(self, item_id: str, partition_key: PartitionKey, updated_fields: dict, container_name: str) -> CosmosDict:
+    def update_item(self, item_id: str, partition_key: PartitionKey, updated_fields: dict, container_name: str,
+                    etag: Optional[str] = None) -> CosmosDict:
+        """
+        Set the given fields with a partial document update instead of reading and replacing the item.
+        With an etag, the update only applies if the item was not modified since it was read.
+        """
         container = self.get_container(container_name)
-        item = self.read_item(item_id, partition_key, container_name)
-        if not item:
+        if len(updated_fields) > 10:
+            # Cosmos DB accepts at most 10 patch operations per request
+            item = self.read_item(item_id, partition_key, container_name)
+            if not item:
+                return None
+            item.update(updated_fields)
+            return container.replace_item(item=item_id, body=item, etag=etag,
+                                          match_condition=MatchConditions.IfNotModified if etag else None)
+        try:
+            return container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=[{"op": "set", "path": f"/{field}", "value": value}
+                                  for field, value in updated_fields.items()],
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified if etag else None)
+        except exceptions.CosmosResourceNotFoundError:
             return None
-        item.update(updated_fields)
-        return container.replace_item(item=item_id, body=item)
 
     def delete_item(self, item_id: str, partition_key: PartitionKey, container_name: str) -> bool:
         container = self.get_container(container_name)
@@ -69,30 +113,76 @@ class CosmosDBService:
             enable_cross_partition_query=True
         ))
 
+    def get_embedding_profile(self, container_name: str) -> dict:
+        """
+        Return the embedding model, dimensions, field and container that vector search
+        uses for a container. A backfill cuts over by rewriting the container's profile,
+        which is read again at most every minute, so model and field switch together.
+        """
+        now = time.monotonic()
+        cached = self.embedding_profiles.get(container_name)
+        if cached and now - cached[0] < self.embedding_profile_ttl:
+            return cached[1]
+        profile_id = f"profile-{container_name}"
+        try:
+            profile = self.read_item(profile_id, profile_id, embedding_profiles_container_name)
+            spec = {**default_embedding_profile, **((profile or {}).get("active") or {})}
+            if not field_pattern.match(spec["field"]):
+                raise ValueError(f"Invalid embedding field {spec['field']!r}")
+        except Exception as e:
+            # Keep searching with the last known profile
+            logger.warning(f"Could not read the embedding profile of {container_name}: {e}")
+            spec = cached[1] if cached else dict(default_embedding_profile)
+        self.embedding_profiles[container_name] = (now, spec)
+        return spec
+
+    def get_related_content(self, url: str) -> Optional[dict]:
+        """Return the related items of an item across containers, by container, with one point read."""
+        item_id = related_content_id(url)
+        document = self.read_item(item_id, item_id, related_container_name)
+        return document.get("related") if document else None
+
     def hybrid_search(self, search_terms: str,
                       container_name: str,
                       fields: list[str],
                       full_text_search_field: str = 'name',
-                      top_count: int = 5) -> list:
+                      top_count: int = 5,
+                      search_embedding: list = None,
+                      filters: dict = None,
+                      not_expired_field: str = None,
+                      exclude_removed: bool = False,
+                      exclude_duplicates: bool = False,
+                      embedding_profile: dict = None) -> list:
         """
         Perform a hybrid search using full-text search and vector search.
-        This is a placeholder for the actual implementation.
+        Filters ({field: value or list of values}), the optional expiry check and
+        the exclusion of items tombstoned by the index hygiene job, or linked to
+        a canonical item as near duplicates by the crawlers, are applied in the
+        query, so they do not use up the top results.
+        The embedding model and vector field are the container's embedding profile;
+        a caller passing search_embedding passes the profile it was generated with.
         """
 
-        # Generate the embedding for the search terms
-        search_embedding = self.foundry_service.generate_embedding(
-            search_terms)
+        profile = embedding_profile or self.get_embedding_profile(container_name)
+        # Generate the embedding for the search terms, unless the caller already did
+        if search_embedding is None:
+            search_embedding = self.foundry_service.generate_embedding(
+                search_terms, model=profile["model"], dimensions=profile["dimensions"])
         # Split search terms to a quoted, comma-separated string for full-text search
         full_text = ', '.join(f'"{word}"' for word in search_terms.split())
         query_fields = f"c.{', c.'.join(fields)}"
+        where_clause, filter_parameters = build_filter_clause(
+            filters, not_expired_field, exclude_removed, exclude_duplicates)
         hybrid_query = f"""
             SELECT TOP {top_count} {query_fields}, 
-            VectorDistance(c.embedding, {search_embedding}) AS similarity_score
+            VectorDistance(c.{profile["field"]}, {search_embedding}) AS similarity_score
             FROM c
-            ORDER BY RANK RRF(VectorDistance(c.embedding, {search_embedding}), FullTextScore(c.{full_text_search_field}, '@full_text'))
+            {where_clause}
+            ORDER BY RANK RRF(VectorDistance(c.{profile["field"]}, {search_embedding}), FullTextScore(c.{full_text_search_field}, '@full_text'))
         """
 
-        container = self.get_container(container_name)
+        # A migration to a new vector index may have moved the items to another container
+        container = self.get_container(profile.get("container") or container_name)
 
         response = container.query_items(
             query=hybrid_query,
@@ -100,12 +190,189 @@ class CosmosDBService:
                 {
                     "name": "@full_text",
                     "value": full_text
-                }
+                },
+                *filter_parameters
             ],
             enable_cross_partition_query=True,
             populate_query_metrics=True)
 
         return list(response)
 
+    async def hybrid_search_async(self, search_terms: str,
+                                  container_name: str,
+                                  fields: list[str],
+                                  full_text_search_field: str = 'name',
+                                  top_count: int = 5,
+                                  filters: dict = None,
+                                  not_expired_field: str = None,
+                                  exclude_removed: bool = False,
+                                  exclude_duplicates: bool = False) -> list:
+        """
+        Run hybrid_search off the event loop, coalescing identical concurrent searches.
+        Callers with the same normalized search terms share one embedding call and query.
+        """
+        key = ("hybrid_search", container_name, tuple(fields),
+               full_text_search_field, top_count,
+               filter_key(filters), not_expired_field, exclude_removed, exclude_duplicates,
+               search_flight.normalize(search_terms))
+
+        async def search() -> list:
+            profile = await asyncio.to_thread(self.get_embedding_profile, container_name)
+            # The embedding call shares its deployment budget with the agents
+            async with admission_controller.admit(
+                    deployment=profile["model"],
+                    tokens=estimate_tokens(search_terms)):
+                return await asyncio.to_thread(
+                    self.hybrid_search,
+                    search_terms=search_terms,
+                    container_name=container_name,
+                    fields=fields,
+                    full_text_search_field=full_text_search_field,
+                    top_count=top_count,
+                    filters=filters,
+                    not_expired_field=not_expired_field,
+                    exclude_removed=exclude_removed,
+                    exclude_duplicates=exclude_duplicates,
+                    embedding_profile=profile)
+
+        # Stop waiting when the turn deadline passes; a shared search keeps running for other callers
+        return await asyncio.wait_for(search_flight.do(key, search),
+                                      timeout=remaining_time(self.search_timeout))
+
+    async def hybrid_search_many(self, queries: list[str],
+                                 container_name: str,
+                                 fields: list[str],
+                                 full_text_search_field: str = 'name',
+                                 top_count: int = 5,
+                                 fuse: bool = False,
+                                 filters: dict = None,
+                                 not_expired_field: str = None,
+                                 exclude_removed: bool = False,
+                                 exclude_duplicates: bool = False) -> dict:
+        """
+        Run several hybrid searches with one batched embedding call and concurrent queries.
+        Each result is returned once, under the first query that found it. With fuse,
+        all results are also ranked together by reciprocal rank fusion.
+        """
+        # Queries differing only in case or spacing are searched once
+        unique_queries = {}
+        for query in queries:
+            unique_queries.setdefault(search_flight.normalize(query), query)
+        search_terms = list(unique_queries.values())
+        if not search_terms:
+            return {"results": {}, "fused": []} if fuse else {"results": {}}
+
+        async def search_all() -> list[list]:
+            # All queries embed with the same profile, even if a cut over lands meanwhile
+            profile = await asyncio.to_thread(self.get_embedding_profile, container_name)
+            async with admission_controller.admit(
+                    deployment=profile["model"],
+                    tokens=sum(estimate_tokens(terms) for terms in search_terms)):
+                embeddings = await asyncio.to_thread(
+                    self.foundry_service.generate_embeddings, search_terms,
+                    profile["model"], profile["dimensions"])
+            return await asyncio.gather(*(
+                asyncio.to_thread(
+                    self.hybrid_search,
+                    search_terms=terms,
+                    container_name=container_name,
+                    fields=fields,
+                    full_text_search_field=full_text_search_field,
+                    top_count=top_count,
+                    search_embedding=embedding,
+                    filters=filters,
+                    not_expired_field=not_expired_field,
+                    exclude_removed=exclude_removed,
+                    exclude_duplicates=exclude_duplicates,
+                    embedding_profile=profile)
+                for terms, embedding in zip(search_terms, embeddings)))
+
+        ranked = await asyncio.wait_for(search_all(),
+                                        timeout=remaining_time(self.search_timeout))
+
+        results, seen, scores = {}, {}, {}
+        for terms, items in zip(search_terms, ranked):
+            results[terms] = []
+            for rank, item in enumerate(items):
+                key = result_key(item)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+                if key not in seen:
+                    seen[key] = item
+                    results[terms].append(item)
+
+        if not fuse:
+            return {"results": results}
+        fused = sorted(seen, key=lambda key: scores[key], reverse=True)
+        return {"results": results,
+                "fused": [seen[key] for key in fused[:top_count]]}
+
+
+# Constant of reciprocal rank fusion, as used by Cosmos DB's RANK RRF
+rrf_k = 60
+
+
+field_pattern = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def build_filter_clause(filters: Optional[dict], not_expired_field: Optional[str] = None,
+                        exclude_removed: bool = False,
+                        exclude_duplicates: bool = False) -> tuple[str, list]:
+    """Translate filters into a parameterized WHERE clause and its parameters.
+
+    A list value matches any of its values. Items whose not_expired_field is
+    missing, empty or in the future count as not expired.
+    """
+    conditions, parameters = [], []
+    for field, value in (filters or {}).items():
+        if value is None or value == "" or value == []:
+            continue
+        if not field_pattern.match(field):
+            raise ValueError(f"Invalid filter field: {field}")
+        if isinstance(value, (list, tuple)):
+            names = [f"@filter_{field}_{index}" for index in range(len(value))]
+            conditions.append(f"c.{field} IN ({', '.join(names)})")
+            parameters.extend({"name": name, "value": item}
+                              for name, item in zip(names, value))
+        else:
+            conditions.append(f"c.{field} = @filter_{field}")
+            parameters.append({"name": f"@filter_{field}", "value": value})
+
+    if not_expired_field:
+        if not field_pattern.match(not_expired_field):
+            raise ValueError(f"Invalid filter field: {not_expired_field}")
+        field = f"c.{not_expired_field}"
+        conditions.append(f"(NOT IS_DEFINED({field}) OR IS_NULL({field}) "
+                          f"OR {field} = '' OR {field} >= @now)")
+        # Dates are stored as ISO 8601 strings, which sort chronologically
+        parameters.append({"name": "@now",
+                           "value": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")})
+
+    if exclude_removed:
+        conditions.append("NOT IS_DEFINED(c.removed_at)")
+
+    if exclude_duplicates:
+        # Near duplicates are stored without an embedding, linked to their canonical item
+        conditions.append("NOT IS_DEFINED(c.canonical_id)")
+
+    if not conditions:
+        return "", []
+    return "WHERE " + " AND ".join(conditions), parameters
+
+
+def filter_key(filters: Optional[dict]) -> tuple:
+    """Return a hashable form of the filters, for coalescing identical searches."""
+    return tuple(sorted((field, tuple(value) if isinstance(value, (list, tuple)) else value)
+                        for field, value in (filters or {}).items()))
+
+
+def related_content_id(url: str) -> str:
+    """Identify an item's related content by its URL, as the related content job does."""
+    return hashlib.md5(url.strip().rstrip("/").lower().encode()).hexdigest()
+
+
+def result_key(item: dict) -> str:
+    """Identify a search result by its id or url, or else by its content."""
+    return item.get("id") or item.get("url") or json.dumps(item, sort_keys=True, default=str)
+
 # Global instance
 cosmos_db_service = CosmosDBService()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+from typing import Optional
+from urllib.parse import urlparse
+import httpx
+from .resilience import CircuitBreaker
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+    """An Azure OpenAI endpoint with the deployments it serves per model."""
+
+    def __init__(self, name: str, endpoint: str, api_key: str,
+                 deployments: Optional[dict] = None, weight: float = 1.0):
+        self.name = name
+        self.endpoint = urlparse(endpoint)
+        self.api_key = api_key
+        self.deployments = deployments  # None serves every model under its own name
+        self.weight = weight
+        self.latency = 1.0  # Exponentially weighted time to first byte, in seconds
+        self.cooldown_until = 0.0
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def deployment_for(self, model: str) -> Optional[str]:
+        if self.deployments is None:
+            return model
+        return self.deployments.get(model)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.cooldown_until and self.breaker.allow()
+
+
+class EndpointPool:
+    """Weighted, health-tracked and latency-aware pool of Azure OpenAI backends.
+
+    Backends are configured with AZURE_OPENAI_BACKENDS as a JSON list of
+    {"name", "endpoint", "api_key", "weight", "deployments": {model: deployment}}.
+    Without it the pool holds the single AZURE_OPENAI_ENDPOINT backend.
+    """
+
+    latency_smoothing = 0.2
+
+    def __init__(self, backends: list[Backend]):
+        if not backends:
+            raise ValueError("Endpoint pool needs at least one backend.")
+        self.backends = backends
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls) -> "EndpointPool":
+        config = os.getenv("AZURE_OPENAI_BACKENDS")
+        if config:
+            return cls([Backend(**backend) for backend in json.loads(config)])
+        return cls([Backend(name="default",
+                            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
+                            api_key=os.getenv("AI_FOUNDRY_KEY", ""))])
+
+    def candidates(self, model: str) -> list[Backend]:
+        """Return the backends serving the model, in weighted, latency-aware random order."""
+        now = time.monotonic()
+        serving = [backend for backend in self.backends
+                   if backend.deployment_for(model)]
+        available = [backend for backend in serving
+                     if backend.is_available(now)]
+        ordered = []
+        while available:
+            scores = [backend.weight / max(backend.latency, 0.01)
+                      for backend in available]
+            backend = random.choices(available, weights=scores)[0]
+            available.remove(backend)
+            ordered.append(backend)
+
+        # When everything is cooling down, try the one that recovers first
+        if not ordered and serving:
+            ordered.append(min(serving, key=lambda b: b.cooldown_until))
+        return ordered
+
+    def record_success(self, backend: Backend, latency: float) -> None:
+        backend.breaker.record_success()
+        backend.latency += self.latency_smoothing * (latency - backend.latency)
+
+    def record_throttle(self, backend: Backend, retry_after: float) -> None:
+        backend.throttled += 1
+        backend.cooldown_until = time.monotonic() + retry_after
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.failed += 1
+        backend.breaker.record_failure()
+
+    def get_stats(self) -> dict:
+        """Return request, throttle, failure and latency figures per backend."""
+        return {
+            "failovers": self.failovers,
+            "backends": {
+                backend.name: {
+                    "requests": backend.requests,
+                    "throttled": backend.throttled,
+                    "failed": backend.failed,
+                    "latency_seconds": round(backend.latency, 3),
+                    "breaker": backend.breaker.state,
+                } for backend in self.backends
+            },
+        }
+
+
+deployment_pattern = re.compile(r"/deployments/([^/]+)/")
+
+
+def parse_retry_after(response: httpx.Response) -> float:
+    """Read the throttling delay from Azure OpenAI response headers."""
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        return float(retry_after_ms) / 1000
+    retry_after = response.headers.get("retry-after")
+    try:
+        return float(retry_after) if retry_after else 10.0
+    except ValueError:
+        return 10.0
+
+
+def route_request(request: httpx.Request, backend: Backend, model: str) -> httpx.Request:
+    """Rewrite a request for a logical model to the backend's endpoint and deployment."""
+    path = deployment_pattern.sub(
+        f"/deployments/{backend.deployment_for(model)}/", request.url.path, count=1)
+    url = request.url.copy_with(scheme=backend.endpoint.scheme or "https",
+                                host=backend.endpoint.hostname,
+                                port=backend.endpoint.port,
+                                raw_path=(path + (f"?{request.url.query.decode()}"
+                                                  if request.url.query else "")).encode())
+    headers = httpx.Headers(request.headers)
+    headers["api-key"] = backend.api_key
+    headers["host"] = backend.endpoint.netloc
+    return httpx.Request(request.method, url, headers=headers,
+                         content=request.content, extensions=request.extensions)
+
+
+class PooledTransportBase:
+    """Routing logic shared by the async and sync pooled transports."""
+
+    def __init__(self, pool: EndpointPool):
+        self.pool = pool
+
+    def plan(self, request: httpx.Request) -> tuple:
+        match = deployment_pattern.search(request.url.path)
+        if not match:
+            return None, [self.pool.backends[0]]
+        model = match.group(1)
+        return model, self.pool.candidates(model)
+
+    def prepare(self, request: httpx.Request, backend: Backend, model: Optional[str]) -> httpx.Request:
+        backend.requests += 1
+        if model is None:
+            return request
+        return route_request(request, backend, model)
+
+    def should_fail_over(self, response: httpx.Response, backend: Backend, latency: float) -> bool:
+        if response.status_code == 429:
+            self.pool.record_throttle(backend, parse_retry_after(response))
+            return True
+        if response.status_code >= 500:
+            self.pool.record_failure(backend)
+            return True
+        self.pool.record_success(backend, latency)
+        return False
+
+
+class PooledAsyncTransport(PooledTransportBase, httpx.AsyncBaseTransport):
+    """httpx transport that spreads Azure OpenAI requests over an endpoint pool.
+
+    A throttled (429) or failing backend is skipped immediately and the request
+    is retried on the next candidate; the last response is returned when every
+    backend refused it, so the OpenAI client's own retry logic still applies.
+    """
+
+    def __init__(self, pool: EndpointPool, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(pool)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, backends = self.plan(request)
+        last_error: Optional[Exception] = None
+        response: Optional[httpx.Response] = None
+
+        for attempt, backend in enumerate(backends):
+            if attempt:
+                self.pool.failovers += 1
+            if response is not None:
+                await response.aclose()
+            started = time.perf_counter()
+            try:
+                response = await self.transport.handle_async_request(
+                    self.prepare(request, backend, model))
+            except httpx.TransportError as e:
+                self.pool.record_failure(backend)
+                last_error, response = e, None
+                continue
+            if not self.should_fail_over(response, backend, time.perf_counter() - started):
+                return response
+
+        if response is not None:
+            return response
+        raise last_error or httpx.ConnectError("No backend available.")
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class PooledTransport(PooledTransportBase, httpx.BaseTransport):
+    """Synchronous counterpart of PooledAsyncTransport for the embedding and summarization clients."""
+
+    def __init__(self, pool: EndpointPool, transport: Optional[httpx.BaseTransport] = None):
+        super().__init__(pool)
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, backends = self.plan(request)
+        last_error: Optional[Exception] = None
+        response: Optional[httpx.Response] = None
+
+        for attempt, backend in enumerate(backends):
+            if attempt:
+                self.pool.failovers += 1
+            if response is not None:
+                response.close()
+            started = time.perf_counter()
+            try:
+                response = self.transport.handle_request(
+                    self.prepare(request, backend, model))
+            except httpx.TransportError as e:
+                self.pool.record_failure(backend)
+                last_error, response = e, None
+                continue
+            if not self.should_fail_over(response, backend, time.perf_counter() - started):
+                return response
+
+        if response is not None:
+            return response
+        raise last_error or httpx.ConnectError("No backend available.")
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+# Global instance
+endpoint_pool = EndpointPool.from_env()
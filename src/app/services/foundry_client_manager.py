@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from azure.core.credentials import AccessToken
+from azure.identity.aio import DefaultAzureCredential
+from semantic_kernel.agents import AzureAIAgent
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CachedTokenCredential:
+    """Async token credential that reuses tokens until shortly before they expire."""
+
+    def __init__(self, credential, refresh_margin: int = 300):
+        self.credential = credential
+        self.refresh_margin = refresh_margin
+        self.tokens: dict[tuple, AccessToken] = {}
+        self.lock = asyncio.Lock()
+        self.fetches = 0
+        self.reuses = 0
+
+    def _cached(self, key: tuple) -> Optional[AccessToken]:
+        token = self.tokens.get(key)
+        if token and token.expires_on - self.refresh_margin > time.time():
+            return token
+        return None
+
+    async def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+        key = (scopes, kwargs.get("tenant_id"), kwargs.get("claims"))
+        if token := self._cached(key):
+            self.reuses += 1
+            return token
+        async with self.lock:
+            if token := self._cached(key):
+                self.reuses += 1
+                return token
+            token = await self.credential.get_token(*scopes, **kwargs)
+            self.tokens[key] = token
+            self.fetches += 1
+            return token
+
+    async def close(self) -> None:
+        await self.credential.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+class FoundryClientManager:
+    """Long-lived AI Foundry client shared by the Foundry-agent plugins.
+
+    Creates the credential and the agents client once, memoizes agent
+    definitions by id, and records how long the cold setup took so the
+    per-call savings of reusing them can be reported.
+    """
+
+    def __init__(self, endpoint: Optional[str]):
+        self.endpoint = endpoint
+        self.credential: Optional[CachedTokenCredential] = None
+        self.client = None
+        self.agents: dict[str, AzureAIAgent] = {}
+        self.lock = asyncio.Lock()
+        self.timings = {"credential": 0.0, "client": 0.0, "definitions": 0.0}
+        self.calls = 0
+
+    async def get_client(self):
+        """Return the shared agents client, creating it on first use."""
+        if self.client is None:
+            async with self.lock:
+                if self.client is None:
+                    start = time.perf_counter()
+                    self.credential = CachedTokenCredential(
+                        DefaultAzureCredential())
+                    self.timings["credential"] = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    self.client = AzureAIAgent.create_client(
+                        credential=self.credential,
+                        endpoint=self.endpoint)
+                    self.timings["client"] = time.perf_counter() - start
+        return self.client
+
+    async def get_agent(self, agent_id: str) -> AzureAIAgent:
+        """Return the agent for the id, fetching its definition only once."""
+        self.calls += 1
+        if agent_id not in self.agents:
+            client = await self.get_client()
+            start = time.perf_counter()
+            definition = await client.agents.get_agent(agent_id=agent_id)
+            self.timings["definitions"] += time.perf_counter() - start
+            self.agents[agent_id] = AzureAIAgent(
+                client=client, definition=definition)
+        return self.agents[agent_id]
+
+    async def close(self) -> None:
+        """Close the shared client and credential, e.g. on app shutdown."""
+        if self.client is not None:
+            await self.client.close()
+        if self.credential is not None:
+            await self.credential.close()
+        self.client = None
+        self.credential = None
+        self.agents.clear()
+
+    def get_stats(self) -> dict:
+        """Break down the cold setup cost and the time saved by reusing it."""
+        definitions = len(self.agents)
+        setup = self.timings["credential"] + self.timings["client"]
+        definition_cost = self.timings["definitions"] / definitions if definitions else 0.0
+        reused_calls = max(self.calls - 1, 0)
+        return {
+            "calls": self.calls,
+            "credential_seconds": round(self.timings["credential"], 3),
+            "client_seconds": round(self.timings["client"], 3),
+            "definition_seconds": round(definition_cost, 3),
+            "token_fetches": self.credential.fetches if self.credential else 0,
+            "token_reuses": self.credential.reuses if self.credential else 0,
+            # Every reused call skips the setup, and every call after the first
+            # for an agent skips its definition fetch
+            "saved_seconds": round(reused_calls * setup
+                                   + max(self.calls - definitions, 0) * definition_cost, 3),
+        }
+
+
+# Global instance
+foundry_client_manager = FoundryClientManager(
+    os.getenv("AI_FOUNDRY_PROJECT_ENDPOINT"))
@@ -1,9 +1,12 @@
 import os
-from openai import AzureOpenAI
+import asyncio
+from openai import AzureOpenAI, DefaultHttpxClient
 from openai.types import CreateEmbeddingResponse
 import json
 import logging
 from dotenv import load_dotenv
+from .endpoint_pool import PooledTransport, endpoint_pool
+from .admission_controller import admission_controller, estimate_tokens
 
 # Load environment variables from .env file
 load_dotenv(override=True)
@@ -14,7 +17,12 @@ logger = logging.getLogger(__name__)
 
 
 class FoundryService:
-    """Service to interact with Azure OpenAI Foundry for embeddings and chat completions."""
+    """Service to interact with Azure OpenAI Foundry for embeddings and chat completions.
+
+    The synchronous methods call Azure OpenAI directly; async code uses their
+    _async variants, or admits the call itself, so every call goes through the
+    admission controller.
+    """
 
     def __init__(self):
         self.endpoint = os.environ.get('AZURE_OPENAI_ENDPOINT')
@@ -27,33 +35,90 @@ class FoundryService:
             raise EnvironmentError(
                 "Azure OpenAI credentials are not set in environment variables.")
 
+        # Both clients spread their requests over the endpoint pool
         self.embedding_client = AzureOpenAI(
             azure_endpoint=self.endpoint,
             azure_deployment=self.embedding_model,
             api_version=self.api_version,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=DefaultHttpxClient(
+                transport=PooledTransport(endpoint_pool))
         )
+        # Clients of other embedding deployments, e.g. of a model a container was migrated to
+        self.embedding_clients = {self.embedding_model: self.embedding_client}
 
         self.chat_client = AzureOpenAI(
             azure_endpoint=self.endpoint,
             azure_deployment=self.chat_model,
             api_version=self.api_version,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=DefaultHttpxClient(
+                transport=PooledTransport(endpoint_pool))
         )
 
-    def generate_embedding(self, text: str) -> list:
+    def get_embedding_client(self, model: str) -> AzureOpenAI:
+        """Return the client of an embedding deployment, named after its model."""
+        if model not in self.embedding_clients:
+            self.embedding_clients[model] = AzureOpenAI(
+                azure_endpoint=self.endpoint,
+                azure_deployment=model,
+                api_version=self.api_version,
+                api_key=self.api_key,
+                http_client=DefaultHttpxClient(
+                    transport=PooledTransport(endpoint_pool))
+            )
+        return self.embedding_clients[model]
+
+    def generate_embedding(self, text: str, model: str = None, dimensions: int = 1536) -> list:
         """Get the embedding for a given text."""
         if not text:
             return []
 
-        response: CreateEmbeddingResponse = self.embedding_client.embeddings.create(
+        model = model or self.embedding_model
+        response: CreateEmbeddingResponse = self.get_embedding_client(model).embeddings.create(
             input=text,
-            model=self.embedding_model,
+            model=model,
             encoding_format="float",
-            dimensions=1536,
+            dimensions=dimensions,
         )
         return response.data[0].embedding if response.data else []
 
+    def generate_embeddings(self, texts: list[str], model: str = None, dimensions: int = 1536) -> list[list]:
+        """Get the embeddings for several texts in one batched request."""
+        if not texts:
+            return []
+
+        model = model or self.embedding_model
+        response: CreateEmbeddingResponse = self.get_embedding_client(model).embeddings.create(
+            input=texts,
+            model=model,
+            encoding_format="float",
+            dimensions=dimensions,
+        )
+        # The response items carry the index of their input
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def generate_embedding_async(self, text: str, model: str = None, dimensions: int = 1536) -> list:
+        """Get the embedding for a given text off the event loop, once the admission controller admits it."""
+        model = model or self.embedding_model
+        async with admission_controller.admit(deployment=model, tokens=estimate_tokens(text)):
+            return await asyncio.to_thread(self.generate_embedding, text, model, dimensions)
+
+    async def generate_embeddings_async(self, texts: list[str], model: str = None,
+                                        dimensions: int = 1536) -> list[list]:
+        """Get the embeddings for several texts off the event loop, once the admission controller admits them."""
+        model = model or self.embedding_model
+        async with admission_controller.admit(
+                deployment=model, tokens=sum(estimate_tokens(text) for text in texts)):
+            return await asyncio.to_thread(self.generate_embeddings, texts, model, dimensions)
+
+    async def summarize_and_generate_keywords_async(self, text: str) -> tuple:
+        """Summarize text off the event loop, once the admission controller admits the completion."""
+        # The prompt plus the completion's max_tokens, as the admission transport estimates chat requests
+        async with admission_controller.admit(
+                deployment=self.chat_model, tokens=estimate_tokens(text) + 4096):
+            return await asyncio.to_thread(self.summarize_and_generate_keywords, text)
+
     def summarize_and_generate_keywords(self, text: str) -> tuple:
         """Summarize the given text using a GPT model and extract keywords.
 
@@ -0,0 +1,146 @@
+import logging
+import re
+from typing import Optional
+from .admission_controller import estimate_tokens
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class TierPolicy:
+    """Model tiers of an agent, cheapest first, with its latency target in seconds."""
+
+    def __init__(self, tiers: list[str], latency_target: float):
+        self.tiers = tiers
+        self.latency_target = latency_target
+
+
+class TierMetrics:
+    """Latency and token figures of one agent/model tier."""
+
+    smoothing = 0.2
+
+    def __init__(self):
+        self.turns = 0
+        self.escalations = 0
+        self.latency: Optional[float] = None  # Exponentially weighted, in seconds
+        self.latencies: list[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, latency: float, prompt_tokens: int, completion_tokens: int, escalated: bool) -> None:
+        self.turns += 1
+        self.escalations += int(escalated)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency = latency if self.latency is None else \
+            self.latency + self.smoothing * (latency - self.latency)
+        self.latencies = (self.latencies + [latency])[-200:]
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "turns": self.turns,
+            "escalations": self.escalations,
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+# The last tier of each agent is the model it used before tiering
+tier_policies = {
+    "microsoft_docs_agent": TierPolicy(["gpt-4.1-mini", "gpt-4.1"], latency_target=10.0),
+    "explainer_agent": TierPolicy(["gpt-4.1-mini", "gpt-4.1"], latency_target=12.0),
+    "github_agent": TierPolicy(["gpt-4.1-nano", "gpt-4.1-mini"], latency_target=6.0),
+    "blog_posts_agent": TierPolicy(["gpt-4.1-nano", "gpt-4.1-mini"], latency_target=6.0),
+    "seismic_agent": TierPolicy(["gpt-4.1-nano", "gpt-4.1-mini"], latency_target=6.0),
+    "aws_docs_agent": TierPolicy(["gpt-4.1-nano", "gpt-4.1-mini"], latency_target=8.0),
+}
+
+complex_keywords = [
+    "architecture", "architect", "design", "compare", "comparison", "versus", " vs ",
+    "trade-off", "tradeoff", "migrate", "migration", "troubleshoot", "why", "explain",
+    "best practice", "step by step", "pros and cons", "difference between",
+]
+
+failed_answer_phrases = [
+    "i don't know", "i do not know", "i couldn't find", "i could not find",
+    "no results found", "i'm not sure", "i am not sure", "unable to",
+    "could not retrieve", "i can't help", "i cannot help",
+]
+
+
+class ModelTieringService:
+    """Service for picking the cheapest model tier that can answer a turn.
+
+    Short or simple turns start on the cheaper, faster tier and are escalated to
+    the larger model when the answer looks like a failure. Complex turns start on
+    the largest tier that still meets the agent's latency target.
+    """
+
+    def __init__(self, policies: Optional[dict[str, TierPolicy]] = None):
+        self.policies = tier_policies if policies is None else policies
+        self.metrics: dict[tuple, TierMetrics] = {}
+
+    @staticmethod
+    def classify(message: str) -> float:
+        """Return a complexity score between 0 (trivial) and 1 (complex) for a message."""
+        text = (message or "").lower()
+        words = len(re.findall(r"\w+", text))
+        score = min(words / 60, 0.5)
+        if "```" in text or "\n" in text.strip():
+            score += 0.2
+        if text.count("?") > 1:
+            score += 0.15
+        if any(keyword in text for keyword in complex_keywords):
+            score += 0.35
+        return min(score, 1.0)
+
+    def get_metrics(self, agent_name: str, model_name: str) -> TierMetrics:
+        return self.metrics.setdefault((agent_name, model_name), TierMetrics())
+
+    def plan(self, agent_name: str, message: str) -> list[str]:
+        """Return the models to try for the turn, starting tier first, then escalations."""
+        policy = self.policies.get(agent_name)
+        if not policy:
+            return []
+
+        start = 0
+        if self.classify(message) >= 0.5:
+            # Start on the largest tier whose observed latency meets the target
+            start = len(policy.tiers) - 1
+            while start > 0:
+                latency = self.get_metrics(agent_name, policy.tiers[start]).latency
+                if latency is None or latency <= policy.latency_target:
+                    break
+                start -= 1
+        return policy.tiers[start:]
+
+    @staticmethod
+    def should_escalate(answer: str) -> bool:
+        """Return True if the answer looks like the tier failed to handle the turn."""
+        text = (answer or "").strip().lower()
+        if len(text) < 40:
+            return True
+        return any(phrase in text[:300] for phrase in failed_answer_phrases)
+
+    def record(self, agent_name: str, model_name: str, message: str, answer: str,
+               latency: float, escalated: bool) -> None:
+        """Record latency and token usage of one attempt on a tier."""
+        self.get_metrics(agent_name, model_name).record(
+            latency=latency,
+            prompt_tokens=estimate_tokens(message),
+            completion_tokens=estimate_tokens(answer),
+            escalated=escalated)
+
+    def get_stats(self) -> dict:
+        """Return per-tier latency and token metrics keyed by 'agent/model'."""
+        return {f"{agent}/{model}": metrics.to_dict()
+                for (agent, model), metrics in self.metrics.items()}
+
+
+# Global instance
+model_tiering_service = ModelTieringService()
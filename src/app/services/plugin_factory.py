@@ -1,12 +1,16 @@
+import asyncio
 import os
-from contextlib import asynccontextmanager
+from typing import Annotated, Optional
 from semantic_kernel.functions import kernel_function
 from semantic_kernel.connectors.mcp import MCPStreamableHttpPlugin, TextContent
 from semantic_kernel.contents import ChatMessageContent
-from azure.identity.aio import DefaultAzureCredential
-from semantic_kernel.agents import AzureAIAgent
 import chainlit as cl
 from .cosmos_db_service import cosmos_db_service
+from .foundry_client_manager import foundry_client_manager
+from .prefetch_service import prefetch_service
+from .singleflight import search_flight
+from .resilience import ToolGuard
+from .tool_output import tool_output_formatter
 import json
 from mcp import ClientSession, types
 from mcp.client.streamable_http import streamablehttp_client
@@ -31,6 +35,20 @@ if github_docs_search_agent_id:
 else:
     print("GitHub Docs Search Agent ID not set - GitHub docs search will be disabled")
 
+# Resilience guards for the external tool endpoints
+tool_guards = {
+    "microsoft_docs_search": ToolGuard("Microsoft Docs", latency_budget=15.0),
+    "aws_docs_search": ToolGuard("AWS Docs", latency_budget=15.0),
+    # Foundry agent runs are too costly to hedge
+    "bing_search": ToolGuard("Bing Search", latency_budget=30.0, hedge=False),
+    "github_docs_search": ToolGuard("GitHub Docs", latency_budget=30.0, hedge=False),
+}
+
+
+def is_valid_result(result: str) -> bool:
+    """Return False for the error messages the tools return instead of results."""
+    return not result.startswith("Could not retrieve results")
+
 
 class GitHubPlugin:
     """A plugin to search GitHub repositories."""
@@ -38,15 +56,35 @@ class GitHubPlugin:
     @kernel_function(name="github_repository_search",
                      description="Search for relevant GitHub repositories for a given topic.")
     @cl.step(type="tool", name="GitHub Repository Search")
-    async def github_repository_search(self, input: str) -> list:
+    async def github_repository_search(self, input: str) -> str:
         """Search for relevant GitHub repositories."""
-        results = cosmos_db_service.hybrid_search(
+        results = await cosmos_db_service.hybrid_search_async(
             search_terms=input,
             container_name="github-repos",
             fields=["name", "url", "description",
                     "stars_count", "archived", "updated_at"],
-            top_count=10)
-        return results
+            top_count=10,
+            exclude_removed=True,
+            exclude_duplicates=True)
+        return tool_output_formatter.format("github_repository_search", results)
+
+    @kernel_function(name="github_repository_search_many",
+                     description="Search GitHub repositories for several topics or reformulations at once. Returns one ranking fused across the queries.")
+    @cl.step(type="tool", name="GitHub Repository Search (Batch)")
+    async def github_repository_search_many(self, queries: list[str]) -> str:
+        """Search for relevant GitHub repositories for several queries at once."""
+        results = await cosmos_db_service.hybrid_search_many(
+            queries=queries,
+            container_name="github-repos",
+            fields=["name", "url", "description",
+                    "stars_count", "archived", "updated_at"],
+            top_count=10,
+            fuse=True,
+            exclude_removed=True,
+            exclude_duplicates=True)
+        # Only the fused ranking: the per-query results repeat its items, which are dropped as duplicates
+        return tool_output_formatter.format("github_repository_search_many",
+                                            {"fused": results["fused"]})
 
 class GitHubDocsPlugin:
     """A plugin to search GitHub documentation."""
@@ -58,18 +96,25 @@ class GitHubDocsPlugin:
         """Search for relevant GitHub documentation."""
         if not github_docs_search_agent_id:
             return "GitHub documentation search is currently unavailable. The agent needs to be configured."
-        
-        async with get_ai_foundry_client() as client:
-            agent_definition = await client.agents.get_agent(agent_id=github_docs_search_agent_id)
-            agent = AzureAIAgent(client=client, definition=agent_definition)
-            structured_message: ChatMessageContent = ChatMessageContent(
-                role="user",
-                content=input
-            )
-            response = await agent.get_response(messages=[structured_message])
-            if not response:
-                return "Could not retrieve results from GitHub Docs Portal."
-            return str(response)
+
+        return await tool_guards["github_docs_search"].call(
+            key=search_flight.normalize(input),
+            fn=lambda: self.fetch_docs(input),
+            fallback_message="Could not retrieve results from GitHub Docs Portal.",
+            is_valid=is_valid_result)
+
+    async def fetch_docs(self, input: str) -> str:
+        """Run the GitHub Docs Search Foundry agent."""
+        # Reuse the shared client and the memoized agent definition
+        agent = await foundry_client_manager.get_agent(github_docs_search_agent_id)
+        structured_message: ChatMessageContent = ChatMessageContent(
+            role="user",
+            content=input
+        )
+        response = await agent.get_response(messages=[structured_message])
+        if not response:
+            return "Could not retrieve results from GitHub Docs Portal."
+        return tool_output_formatter.format("github_docs_search", str(response))
 
 
 class MicrosoftDocsPlugin:
@@ -81,6 +126,25 @@ class MicrosoftDocsPlugin:
     async def microsoft_docs_search(self, input: str) -> str:
         """Search for relevant Microsoft documentation."""
 
+        # Reuse the result prefetched while the questioner agent was running
+        prefetched = await prefetch_service.consume(input)
+        if prefetched is not None:
+            return prefetched
+
+        return await self.search(input)
+
+    async def search(self, input: str) -> str:
+        """Search the docs through request coalescing and the resilience guard."""
+        key = ("microsoft_docs_search", search_flight.normalize(input))
+        return await search_flight.do(key, lambda: tool_guards["microsoft_docs_search"].call(
+            key=key,
+            fn=lambda: self.fetch_docs(input),
+            fallback_message="Could not retrieve results from Microsoft Docs Portal.",
+            is_valid=is_valid_result))
+
+    async def fetch_docs(self, input: str) -> str:
+        """Call the Microsoft Docs MCP server and aggregate the results."""
+
         async with streamablehttp_client("https://learn.microsoft.com/api/mcp") as (
             read_stream,
             write_stream,
@@ -101,7 +165,9 @@ class MicrosoftDocsPlugin:
                 if response.isError or not response.content or not response.content[0] or not response.content[0].text:
                     return "Could not retrieve results from Microsoft Docs Portal."
 
-                data = json.loads(response.content[0].text)
+                # Drop passages that repeat each other before they are aggregated
+                data = tool_output_formatter.deduplicate(
+                    json.loads(response.content[0].text), "content")
 
                 aggregated = {}
 
@@ -122,7 +188,7 @@ class MicrosoftDocsPlugin:
                     for title, contents in aggregated.items()
                 ]
 
-                return json.dumps(aggregated_results, indent=2, ensure_ascii=False)
+                return tool_output_formatter.format("microsoft_docs_search", aggregated_results)
 
 
 class BlogPostsPlugin:
@@ -131,31 +197,65 @@ class BlogPostsPlugin:
     @kernel_function(name="blog_posts_search",
                      description="Search for relevant blog posts for a given topic.")
     @cl.step(type="tool", name="Blog Posts Search")
-    async def blog_posts_search(self, input: str) -> list:
+    async def blog_posts_search(self, input: str) -> str:
         """Search for relevant blog posts."""
-        results = cosmos_db_service.hybrid_search(
+        results = await cosmos_db_service.hybrid_search_async(
             search_terms=input,
             container_name="blog-posts",
             fields=["title", "description", "published_date", "url"],
-            top_count=5)
-        return results
+            top_count=5,
+            exclude_duplicates=True)
+        return tool_output_formatter.format("blog_posts_search", results)
+
+
+class RelatedContentPlugin:
+    """A plugin to find content related to a search result, precomputed across sources."""
+
+    @kernel_function(name="related_content",
+                     description="Find the GitHub repositories, blog posts and Seismic content related to "
+                                 "a GitHub repository, blog post or Seismic content, given its URL. "
+                                 "Use it instead of new searches for material related to a result.")
+    @cl.step(type="tool", name="Related Content")
+    async def related_content(self,
+                              url: Annotated[str, "The URL of the repository, blog post or Seismic content."],
+                              source: Annotated[Optional[str], "Only return related items of this source: "
+                                                               "github-repos, blog-posts or seismic-contents."] = None) -> str:
+        """Look up the related items of a result with one point read."""
+        related = await asyncio.to_thread(cosmos_db_service.get_related_content, url)
+        if related is None:
+            return "No related content found. The item may be too new, search instead."
+        if source:
+            related = {source: related.get(source, [])}
+        return tool_output_formatter.format("related_content", related)
 
 
 class SeismicPlugin:
     """A plugin to search seismic data."""
 
     @kernel_function(name="seismic_search",
-                     description="Search for relevant Seismic data for a given topic.")
+                     description="Search for relevant Seismic data for a given topic. "
+                                 "Use the optional filters instead of filtering the results yourself.")
     @cl.step(type="tool", name="Seismic Data Search")
-    async def seismic_search(self, input: str) -> list:
-        """Search for relevant Seismic data."""
-        results = cosmos_db_service.hybrid_search(
+    async def seismic_search(self,
+                             input: Annotated[str, "The topic to search for."],
+                             level: Annotated[Optional[str], "Exact content level, e.g. 300."] = None,
+                             solution_area: Annotated[Optional[str], "Exact solution area."] = None,
+                             format: Annotated[Optional[str], "Exact file format, e.g. PPTX."] = None,
+                             confidentiality: Annotated[Optional[str], "Exact confidentiality label."] = None,
+                             include_expired: Annotated[bool, "Also return expired content."] = False) -> str:
+        """Search for relevant Seismic data, filtered in the query."""
+        results = await cosmos_db_service.hybrid_search_async(
             search_terms=input,
             container_name="seismic-contents",
             fields=["name", "url", "description", "last_update", "expiration_date",
                     "level", "solution_area", "format", "size", "confidentiality"],
-            top_count=10)
-        return results
+            top_count=10,
+            filters={"level": level,
+                     "solution_area": solution_area,
+                     "format": format,
+                     "confidentiality": confidentiality},
+            not_expired_field=None if include_expired else "expiration_date")
+        return tool_output_formatter.format("seismic_search", results)
 
 
 class BingPlugin:
@@ -167,18 +267,25 @@ class BingPlugin:
         """Perform a Bing search."""
         if not bing_search_agent_id:
             return "Bing search is currently unavailable. The service is being migrated to use Bing Search Grounding."
-        
-        async with get_ai_foundry_client() as client:
-            agent_definition = await client.agents.get_agent(agent_id=bing_search_agent_id)
-            agent = AzureAIAgent(client=client, definition=agent_definition)
-            structured_message: ChatMessageContent = ChatMessageContent(
-                role="user",
-                content=input
-            )
-            response = await agent.get_response(messages=[structured_message])
-            if not response:
-                return "Could not retrieve results from Bing Search."
-            return str(response)
+
+        return await tool_guards["bing_search"].call(
+            key=search_flight.normalize(input),
+            fn=lambda: self.fetch_results(input),
+            fallback_message="Could not retrieve results from Bing Search.",
+            is_valid=is_valid_result)
+
+    async def fetch_results(self, input: str) -> str:
+        """Run the Bing Search Foundry agent."""
+        # Reuse the shared client and the memoized agent definition
+        agent = await foundry_client_manager.get_agent(bing_search_agent_id)
+        structured_message: ChatMessageContent = ChatMessageContent(
+            role="user",
+            content=input
+        )
+        response = await agent.get_response(messages=[structured_message])
+        if not response:
+            return "Could not retrieve results from Bing Search."
+        return tool_output_formatter.format("bing_search", str(response))
 
 
 class AWSDocsPlugin:
@@ -189,6 +296,15 @@ class AWSDocsPlugin:
     @cl.step(type="tool", name="AWS Documentation Search")
     async def aws_docs_search(self, input: str) -> str:
         """Search for relevant AWS documentation."""
+        key = ("aws_docs_search", search_flight.normalize(input))
+        return await search_flight.do(key, lambda: tool_guards["aws_docs_search"].call(
+            key=key,
+            fn=lambda: self.fetch_docs(input),
+            fallback_message="Could not retrieve results from AWS Docs Portal.",
+            is_valid=is_valid_result))
+
+    async def fetch_docs(self, input: str) -> str:
+        """Call the AWS Knowledge MCP server and return the results."""
 
         async with streamablehttp_client("https://knowledge-mcp.global.api.aws") as (
             read_stream,
@@ -220,19 +336,8 @@ class AWSDocsPlugin:
                         data = json.loads(content.text)
                         results = data["response"]["payload"]["content"]["result"]
 
-                return json.dumps(results, indent=2, ensure_ascii=False)
-
+                return tool_output_formatter.format("aws_docs_search", results)
 
-@asynccontextmanager
-async def get_ai_foundry_client():
-    async with (
-        DefaultAzureCredential() as creds,
-        AzureAIAgent.create_client(
-            credential=creds,
-            endpoint=ai_foundry_project_endpoint,
-        ) as client
-    ):
-        yield client
 
 # Global instances
 github_plugin = GitHubPlugin()
@@ -240,5 +345,6 @@ github_docs_plugin = GitHubDocsPlugin()
 microsoft_docs_plugin = MicrosoftDocsPlugin()
 blog_posts_plugin = BlogPostsPlugin()
 seismic_plugin = SeismicPlugin()
+related_content_plugin = RelatedContentPlugin()
 bing_plugin = BingPlugin()
 aws_docs_plugin = AWSDocsPlugin()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Optional
+import chainlit as cl
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Session key under which the pending prefetch is kept
+PREFETCH_SESSION_KEY = "docs_prefetch"
+
+# Words that do not tell a topic apart, including those of a reply confirming or correcting a question
+STOP_WORDS = frozenset("""
+    a about actually am an and any are as at be but by can correct could do does exactly for from
+    get how i if in is it just like me mean meant my need no not of ok okay on or please right so
+    sure that the there this to use using want was what when where which who why will with would
+    yeah yep yes you your
+""".split())
+
+
+class PrefetchEntry:
+    """A speculative search started ahead of the agent that will need it."""
+
+    def __init__(self, query: str, task: asyncio.Task):
+        self.query = query
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, _task: asyncio.Task) -> None:
+        self.finished_at = time.perf_counter()
+
+
+class PrefetchService:
+    """Service for speculatively prefetching Microsoft Docs results.
+
+    The turn after `questioner_agent` is always routed to `microsoft_docs_agent`,
+    so the docs search for the original query can run while the clarifying
+    question is streamed and the user is typing the reply.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.5):
+        # Share of the shorter query's topic words that the other one must contain
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self.refinements = 0
+        self.time_saved = 0.0
+
+    @staticmethod
+    def _tokenize(text: str) -> set:
+        """Return the topic words of a text, without stop words and plural endings."""
+        words = re.findall(r"\w+", (text or "").lower())
+        return {word[:-1] if len(word) > 3 and word.endswith("s") else word
+                for word in words if len(word) > 1 and word not in STOP_WORDS}
+
+    @classmethod
+    def similarity(cls, first: str, second: str) -> float:
+        """Share of the topic words of the shorter text that the other one contains.
+
+        A rewritten search query or a clarifying reply is usually much shorter
+        than the question, so it matches when its words are about the same topic
+        whatever its length.
+        """
+        first_tokens = cls._tokenize(first)
+        second_tokens = cls._tokenize(second)
+        if not first_tokens or not second_tokens:
+            return 0.0
+        return len(first_tokens & second_tokens) / min(len(first_tokens), len(second_tokens))
+
+    def start(self, query: str, fetch: Callable[[str], Awaitable[str]]) -> None:
+        """Start a background search for the query and keep it in the session."""
+        self.discard()
+        task = asyncio.create_task(fetch(query))
+        cl.user_session.set(PREFETCH_SESSION_KEY, PrefetchEntry(query, task))
+        logger.info(f"Started docs prefetch for: {query}")
+
+    def refine(self, reply: str, fetch: Callable[[str], Awaitable[str]]) -> None:
+        """Reuse the pending prefetch or restart it for the clarified query."""
+        entry: Optional[PrefetchEntry] = cl.user_session.get(
+            PREFETCH_SESSION_KEY)
+        if not entry:
+            return
+
+        # A reply without topic words only confirms the question, e.g. "yes, exactly"
+        if not self._tokenize(reply) or \
+                self.similarity(entry.query, reply) >= self.similarity_threshold:
+            return
+
+        # The reply is about another topic, e.g. "no, I meant Cosmos DB", search again with it
+        self.refinements += 1
+        self.start(f"{entry.query} {reply}", fetch)
+
+    async def consume(self, query: str) -> Optional[str]:
+        """Return the prefetched result if it matches the query, else None."""
+        entry: Optional[PrefetchEntry] = cl.user_session.get(
+            PREFETCH_SESSION_KEY)
+        if not entry:
+            return None
+        cl.user_session.set(PREFETCH_SESSION_KEY, None)
+
+        if self.similarity(entry.query, query) < self.similarity_threshold:
+            entry.task.cancel()
+            self.misses += 1
+            return None
+
+        requested_at = time.perf_counter()
+        try:
+            result = await entry.task
+        except Exception as e:
+            logger.warning(f"Docs prefetch failed, searching again: {e}")
+            self.misses += 1
+            return None
+
+        # Time saved is the part of the search that ran before it was needed
+        finished_at = entry.finished_at or time.perf_counter()
+        self.time_saved += max(
+            0.0, min(finished_at, requested_at) - entry.started_at)
+        self.hits += 1
+        return result
+
+    def discard(self) -> None:
+        """Cancel any pending prefetch in the current session."""
+        entry: Optional[PrefetchEntry] = cl.user_session.get(
+            PREFETCH_SESSION_KEY)
+        if entry:
+            entry.task.cancel()
+            cl.user_session.set(PREFETCH_SESSION_KEY, None)
+
+    def get_stats(self) -> dict:
+        """Return the prefetch hit rate and the total time saved."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refinements": self.refinements,
+            "hit_rate": self.hits / total if total else 0.0,
+            "time_saved_seconds": round(self.time_saved, 3),
+        }
+
+
+# Global instance
+prefetch_service = PrefetchService()
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Hashable, Optional
+from .turn_scope import remaining_time
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Circuit breaker that stops sending traffic to a failing dependency for a while.
+
+    After reset_timeout, a single trial call goes through while the others keep
+    failing fast; its success closes the breaker and its failure opens it again.
+    A trial call that never reports back, e.g. because it was cancelled, lets
+    another one through after probe_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 probe_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started_at: Optional[float] = None
+        self.times_opened = 0
+        # Also used by the pooled transport of synchronous clients, from worker threads
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a call may go through (closed, or the half-open trial call)."""
+        with self.lock:
+            state = self.state
+            if state != "half_open":
+                return state == "closed"
+            now = time.monotonic()
+            if self.probe_started_at is not None and now - self.probe_started_at < self.probe_timeout:
+                return False
+            self.probe_started_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.state == "half_open":
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self.probe_started_at = None
+
+
+class ToolGuard:
+    """Resilience guard for one external tool endpoint.
+
+    Each call gets a latency budget. When a call runs past the tool's observed
+    p95 latency, a second hedged request is sent and the first answer wins. A
+    circuit breaker fails fast while the dependency is down. Failed, timed-out
+    or short-circuited calls fall back to the last good result for the same
+    key, marked as stale.
+    """
+
+    def __init__(self, name: str,
+                 latency_budget: float,
+                 hedge: bool = True,
+                 hedge_quantile: float = 0.95,
+                 min_samples: int = 20,
+                 stale_ttl: float = 24 * 3600,
+                 max_stale_entries: int = 256,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.latency_budget = latency_budget
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.stale_ttl = stale_ttl
+        self.max_stale_entries = max_stale_entries
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: deque = deque(maxlen=200)
+        self.last_good: OrderedDict = OrderedDict()  # key -> (result, timestamp)
+        self.stats = {"calls": 0, "hedged": 0, "timeouts": 0, "failures": 0,
+                      "short_circuited": 0, "stale_served": 0}
+
+    def hedge_after(self) -> Optional[float]:
+        """Return the observed latency quantile after which to hedge, if known."""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_quantile))]
+
+    async def _hedged(self, fn: Callable[[], Awaitable]):
+        start = time.perf_counter()
+        first = asyncio.ensure_future(fn())
+        tasks = {first}
+        try:
+            threshold = self.hedge_after()
+            if threshold is not None and threshold < self.latency_budget:
+                done, _ = await asyncio.wait(tasks, timeout=threshold)
+                if not done:
+                    self.stats["hedged"] += 1
+                    tasks.add(asyncio.ensure_future(fn()))
+
+            # Return the first successful answer, or the last error
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.append(time.perf_counter() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _fallback(self, key: Hashable, reason: str, fallback_message: str) -> str:
+        cached = self.last_good.get(key)
+        if cached and time.time() - cached[1] <= self.stale_ttl:
+            self.stats["stale_served"] += 1
+            age_minutes = int((time.time() - cached[1]) / 60)
+            return (f"[Stale result from {age_minutes} minutes ago: {self.name} is currently "
+                    f"unavailable ({reason}).]\n{cached[0]}")
+        return fallback_message
+
+    async def call(self, key: Hashable,
+                   fn: Callable[[], Awaitable[str]],
+                   fallback_message: str,
+                   is_valid: Callable[[str], bool] = lambda result: True,
+                   latency_budget: Optional[float] = None) -> str:
+        """Call the tool through the breaker, budget and hedging, falling back to stale results."""
+        self.stats["calls"] += 1
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            return self._fallback(key, "circuit open", fallback_message)
+
+        try:
+            # The budget never outlives the deadline of the turn making the call
+            result = await asyncio.wait_for(
+                self._hedged(fn), timeout=remaining_time(latency_budget or self.latency_budget))
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.breaker.record_failure()
+            return self._fallback(key, "timed out", fallback_message)
+        except Exception as e:
+            logger.warning(f"{self.name} call failed: {e}")
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            return self._fallback(key, "error", fallback_message)
+
+        if not is_valid(result):
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            return self._fallback(key, "error", result)
+
+        self.breaker.record_success()
+        self.last_good[key] = (result, time.time())
+        self.last_good.move_to_end(key)
+        while len(self.last_good) > self.max_stale_entries:
+            self.last_good.popitem(last=False)
+        return result
+
+    def get_stats(self) -> dict:
+        """Return call outcome counters and the current breaker state."""
+        return {**self.stats, "breaker": self.breaker.state,
+                "hedge_after_seconds": self.hedge_after()}
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+import numpy as np
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CachePolicy:
+    """Caching rules of one agent.
+
+    Answers of agents backed by a crawled container expire when the next hourly
+    run of its crawler has had time to land, at crawl_minute past the hour plus
+    crawl_duration, so they never outlive the data they cite by more than that.
+    """
+
+    def __init__(self, ttl: timedelta, crawl_minute: Optional[int] = None,
+                 crawl_duration: timedelta = timedelta(minutes=15)):
+        self.ttl = ttl
+        self.crawl_minute = crawl_minute
+        self.crawl_duration = crawl_duration
+
+    def expires_at(self, now: datetime) -> datetime:
+        expires_at = now + self.ttl
+        if self.crawl_minute is not None:
+            # The end of the crawl in progress, or else of the next one
+            crawl_landed = now.replace(minute=self.crawl_minute, second=0, microsecond=0) \
+                + self.crawl_duration - timedelta(hours=1)
+            while crawl_landed <= now:
+                crawl_landed += timedelta(hours=1)
+            expires_at = min(expires_at, crawl_landed)
+        return expires_at
+
+
+class CacheEntry:
+    def __init__(self, query: str, row: int, answer: str, expires_at: datetime):
+        self.query = query
+        self.row = row
+        self.answer = answer
+        self.expires_at = expires_at
+
+
+class AgentCache:
+    """The entries of one agent, with their embeddings as rows of a float32 matrix."""
+
+    def __init__(self, max_entries: int, dimensions: int):
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.matrix = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.used = np.zeros(max_entries, dtype=bool)
+        self.queries: list[Optional[str]] = [None] * max_entries
+        self.free_rows = list(range(max_entries - 1, -1, -1))
+
+    def remove(self, query: str) -> None:
+        entry = self.entries.pop(query)
+        self.used[entry.row] = False
+        self.queries[entry.row] = None
+        self.free_rows.append(entry.row)
+
+
+# Stateless specialist agents only receive the user message, not the history
+cache_policies = {
+    # The crawler triggers run hourly, GitHub on the hour and blogs at half past
+    "blog_posts_agent": CachePolicy(timedelta(hours=24), crawl_minute=30),
+    "github_agent": CachePolicy(timedelta(hours=24), crawl_minute=0),
+    "aws_docs_agent": CachePolicy(timedelta(hours=12)),
+    "explainer_agent": CachePolicy(timedelta(days=7)),
+}
+
+
+def normalize_vector(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Semantic answer cache keyed per agent.
+
+    Stores the normalized query embedding with the final answer and serves it
+    for later queries whose cosine similarity is above the threshold, found
+    with one product of the agent's embedding matrix. Each agent keeps at most
+    max_entries answers and evicts the least recently used one. Embeddings of
+    another size than dimensions are rejected with a ValueError.
+    lookup_async embeds with embed_async when given, e.g. an admitted call.
+    """
+
+    def __init__(self,
+                 embed: Callable[[str], list[float]],
+                 embed_async: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+                 policies: Optional[dict[str, CachePolicy]] = None,
+                 similarity_threshold: float = 0.95,
+                 max_entries: int = 500,
+                 dimensions: int = 1536):
+        self.embed = embed
+        self.embed_async = embed_async
+        self.policies = cache_policies if policies is None else policies
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.caches: dict[str, AgentCache] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lookup_time = 0.0
+
+    def is_cacheable(self, agent_name: str) -> bool:
+        return agent_name in self.policies
+
+    def lookup(self, agent_name: str, query: str) -> tuple[Optional[str], np.ndarray]:
+        """Return the cached answer for a similar query (or None) and the query embedding."""
+        start = time.perf_counter()
+        return self.match(agent_name, self.embed(query), start)
+
+    def check_embedding(self, embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if embedding.shape != (self.dimensions,):
+            raise ValueError(
+                f"Expected an embedding of {self.dimensions} dimensions, got shape {embedding.shape}")
+        return embedding
+
+    def match(self, agent_name: str, embedding: list[float],
+              start: float) -> tuple[Optional[str], np.ndarray]:
+        """Return the cached answer closest to a query embedding (or None) and the normalized embedding."""
+        embedding = normalize_vector(self.check_embedding(embedding))
+        cache = self.caches.get(agent_name)
+        now = datetime.now(timezone.utc)
+
+        best_key, best_similarity = None, 0.0
+        if cache is not None:
+            for key in [key for key, entry in cache.entries.items() if entry.expires_at <= now]:
+                cache.remove(key)
+            if cache.entries:
+                similarities = cache.matrix @ embedding
+                similarities[~cache.used] = -1.0
+                row = int(np.argmax(similarities))
+                if cache.used[row]:
+                    best_similarity = float(similarities[row])
+                    best_key = cache.queries[row]
+
+        self.lookup_time += time.perf_counter() - start
+        if best_key is not None and best_similarity >= self.similarity_threshold:
+            cache.entries.move_to_end(best_key)
+            self.hits += 1
+            return cache.entries[best_key].answer, embedding
+
+        self.misses += 1
+        return None, embedding
+
+    def store(self, agent_name: str, query: str, embedding: list[float], answer: str) -> None:
+        """Store the final answer of an agent for the query embedding."""
+        embedding = self.check_embedding(embedding)
+        cache = self.caches.get(agent_name)
+        if cache is None:
+            cache = self.caches[agent_name] = AgentCache(self.max_entries, self.dimensions)
+        if query in cache.entries:
+            cache.remove(query)
+        while len(cache.entries) >= self.max_entries:
+            cache.remove(next(iter(cache.entries)))
+            self.evictions += 1
+
+        row = cache.free_rows.pop()
+        cache.matrix[row] = embedding
+        cache.used[row] = True
+        cache.queries[row] = query
+        expires_at = self.policies[agent_name].expires_at(
+            datetime.now(timezone.utc))
+        cache.entries[query] = CacheEntry(query, row, answer, expires_at)
+
+    async def lookup_async(self, agent_name: str, query: str) -> tuple[Optional[str], np.ndarray]:
+        """Run lookup without blocking the event loop, since it makes an embedding call."""
+        if self.embed_async is None:
+            return await asyncio.to_thread(self.lookup, agent_name, query)
+        start = time.perf_counter()
+        return self.match(agent_name, await self.embed_async(query), start)
+
+    def get_stats(self) -> dict:
+        """Return the hit ratio, entry count and average lookup latency."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": sum(len(cache.entries) for cache in self.caches.values()),
+            "evictions": self.evictions,
+            "average_lookup_seconds": self.lookup_time / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import re
+from typing import Any, Awaitable, Callable, Hashable
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share the same key into one in-flight task.
+
+    Callers that arrive while a task for their key is running await that task
+    instead of starting their own, and all of them receive the same result.
+    """
+
+    def __init__(self):
+        self.in_flight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize free-text search input so trivial variations share a key."""
+        return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for the key, or join the call already in flight for it."""
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        # Shield the shared task so one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> dict:
+        """Return the number of calls, backend executions and coalesced calls."""
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight),
+        }
+
+
+# Global instance shared by the Cosmos DB service and the plugins
+search_flight = SingleFlight()
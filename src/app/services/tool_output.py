@@ -0,0 +1,259 @@
+import json
+import logging
+import re
+import time
+from typing import Optional, Union
+from .admission_controller import estimate_tokens
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ToolOutputPolicy:
+    """How the output of one tool is shaped before it reaches the model.
+
+    Results keep only keep_fields (all but drop_fields when not set). Results
+    with the same unique_field value, or else near-duplicate content_field
+    passages, are removed, and the output is trimmed to token_budget tokens by
+    cutting content_field. legacy_format names how the output was rendered
+    before shaping ("json" or "repr"), to report the tokens saved.
+    """
+
+    def __init__(self, token_budget: int,
+                 content_field: Optional[str] = None,
+                 unique_field: Optional[str] = None,
+                 keep_fields: Optional[list[str]] = None,
+                 drop_fields: Optional[list[str]] = None,
+                 legacy_format: str = "json"):
+        self.token_budget = token_budget
+        self.content_field = content_field
+        self.unique_field = unique_field
+        self.keep_fields = keep_fields
+        self.drop_fields = drop_fields or []
+        self.legacy_format = legacy_format
+
+
+class ToolOutputMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.measured = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.duplicates_removed = 0
+        self.truncated = 0
+        self.format_time = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "tokens_before_per_call": self.tokens_before / self.measured if self.measured else 0.0,
+            "tokens_after_per_call": self.tokens_after / self.measured if self.measured else 0.0,
+            "duplicates_removed": self.duplicates_removed,
+            "truncated": self.truncated,
+            "average_format_seconds": self.format_time / self.calls if self.calls else 0.0,
+        }
+
+
+# The Cosmos DB plugins used to return Python lists, which reached the model as their repr
+tool_output_policies = {
+    "microsoft_docs_search": ToolOutputPolicy(6000, content_field="content"),
+    "aws_docs_search": ToolOutputPolicy(4000, content_field="context",
+                                        keep_fields=["title", "url", "context"]),
+    "github_repository_search": ToolOutputPolicy(2500, content_field="description", unique_field="url",
+                                                 drop_fields=["similarity_score"],
+                                                 legacy_format="repr"),
+    "github_repository_search_many": ToolOutputPolicy(4000, content_field="description", unique_field="url",
+                                                      drop_fields=["similarity_score"],
+                                                      legacy_format="repr"),
+    "blog_posts_search": ToolOutputPolicy(2000, content_field="description", unique_field="url",
+                                          drop_fields=["similarity_score"],
+                                          legacy_format="repr"),
+    "seismic_search": ToolOutputPolicy(3000, content_field="description", unique_field="url",
+                                       drop_fields=["similarity_score"],
+                                       legacy_format="repr"),
+    "related_content": ToolOutputPolicy(3000, content_field="description", unique_field="url",
+                                        drop_fields=["id", "score"]),
+    "bing_search": ToolOutputPolicy(3000),
+    "github_docs_search": ToolOutputPolicy(3000),
+}
+
+
+class ToolOutputFormatter:
+    """Shared output-shaping layer of the plugins.
+
+    Serializes results as compact JSON, drops fields the agent prompts never
+    use, removes near-duplicate passages and trims the output to the tool's
+    token budget, counted with the models' tokenizer. The tokens saved are
+    measured on one call in measure_every per tool, as rendering the output
+    the old way and tokenizing it costs more than shaping it.
+    """
+
+    def __init__(self,
+                 policies: Optional[dict[str, ToolOutputPolicy]] = None,
+                 encoding_name: str = "o200k_base",
+                 similarity_threshold: float = 0.9,
+                 measure_every: int = 20):
+        self.policies = tool_output_policies if policies is None else policies
+        self.encoding_name = encoding_name
+        self.similarity_threshold = similarity_threshold
+        self.measure_every = measure_every
+        self.encoding = None
+        self.encoding_loaded = False
+        self.metrics: dict[str, ToolOutputMetrics] = {}
+
+    def get_encoding(self):
+        """Load the tokenizer once; fall back to estimates if it is unavailable."""
+        if not self.encoding_loaded:
+            self.encoding_loaded = True
+            try:
+                import tiktoken
+                self.encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(
+                    f"Tokenizer {self.encoding_name} unavailable, estimating tokens instead: {e}")
+        return self.encoding
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self.get_encoding()
+        if encoding is None:
+            return estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to max_tokens tokens, marking the cut."""
+        if max_tokens <= 0:
+            return ""
+        encoding = self.get_encoding()
+        if encoding is None:
+            return text if len(text) <= max_tokens * 4 else text[:max_tokens * 4] + "…"
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]) + "…"
+
+    @staticmethod
+    def shingles(text: str) -> set:
+        words = re.findall(r"\w+", (text or "").lower())
+        if len(words) < 3:
+            return set(words)
+        return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def is_duplicate(self, signature: set, seen: list) -> bool:
+        for other in seen:
+            if not isinstance(other, set):
+                continue
+            union = len(signature | other)
+            if union and len(signature & other) / union >= self.similarity_threshold:
+                return True
+        return False
+
+    def deduplicate(self, items: list, field: Optional[str] = None,
+                    seen: Optional[list] = None, unique_field: Optional[str] = None) -> list:
+        """Remove items whose field (or whole content) nearly repeats an earlier one.
+
+        With a unique_field, items are duplicates only if that field is equal.
+        """
+        seen = [] if seen is None else seen
+        unique = []
+        for item in items:
+            if unique_field and isinstance(item, dict) and item.get(unique_field):
+                if item[unique_field] in seen:
+                    continue
+                seen.append(item[unique_field])
+                unique.append(item)
+                continue
+            text = item.get(field) if field and isinstance(item, dict) else None
+            signature = self.shingles(text if isinstance(text, str) else compact_json(item))
+            if signature and self.is_duplicate(signature, seen):
+                continue
+            seen.append(signature)
+            unique.append(item)
+        return unique
+
+    def select_fields(self, item: dict, policy: ToolOutputPolicy) -> dict:
+        if policy.keep_fields is not None:
+            return {field: item[field] for field in policy.keep_fields if field in item}
+        return {field: value for field, value in item.items() if field not in policy.drop_fields}
+
+    def fit(self, items: list, policy: ToolOutputPolicy, state: dict) -> list:
+        """Keep items in order while they fit the remaining budget, cutting the last one."""
+        fitted = []
+        for item in items:
+            tokens = self.count_tokens(compact_json(item)) + 1
+            if tokens <= state["remaining"]:
+                fitted.append(item)
+                state["remaining"] -= tokens
+                continue
+
+            # Cut the content of the item that overflows, if enough of it fits
+            content = item.get(policy.content_field) \
+                if policy.content_field and isinstance(item, dict) else None
+            if isinstance(content, str):
+                overhead = self.count_tokens(compact_json({**item, policy.content_field: ""})) + 1
+                room = state["remaining"] - overhead
+                if room >= 50:
+                    fitted.append({**item, policy.content_field: self.truncate(content, room)})
+                    state["remaining"] = 0
+            state["truncated"] = True
+            break
+        return fitted
+
+    def shape(self, output, policy: ToolOutputPolicy, state: dict):
+        """Shape a list of results, or a dict of them, with a shared budget and dedupe."""
+        if isinstance(output, dict):
+            return {key: self.shape(value, policy, state) for key, value in output.items()}
+        if isinstance(output, list):
+            items = [self.select_fields(item, policy) if isinstance(item, dict) else item
+                     for item in output]
+            unique = self.deduplicate(items, policy.content_field, state["seen"],
+                                      policy.unique_field)
+            state["duplicates"] += len(items) - len(unique)
+            return self.fit(unique, policy, state)
+        return output
+
+    def format(self, tool_name: str, output: Union[str, list, dict]) -> str:
+        """Shape a tool's output and serialize it for the model."""
+        start = time.perf_counter()
+        policy = self.policies.get(tool_name) or ToolOutputPolicy(4000)
+        metrics = self.metrics.setdefault(tool_name, ToolOutputMetrics())
+
+        if isinstance(output, str):
+            formatted = self.truncate(output, policy.token_budget)
+            metrics.truncated += int(formatted != output)
+        else:
+            state = {"remaining": policy.token_budget, "seen": [],
+                     "duplicates": 0, "truncated": False}
+            formatted = compact_json(self.shape(output, policy, state))
+            metrics.duplicates_removed += state["duplicates"]
+            metrics.truncated += int(state["truncated"])
+
+        metrics.format_time += time.perf_counter() - start
+        if metrics.calls % self.measure_every == 0:
+            self.measure(metrics, policy, output, formatted)
+        metrics.calls += 1
+        return formatted
+
+    def measure(self, metrics: ToolOutputMetrics, policy: ToolOutputPolicy,
+                output: Union[str, list, dict], formatted: str) -> None:
+        """Count the tokens of the output as it was rendered before shaping, and after."""
+        if isinstance(output, str):
+            before = output
+        else:
+            before = str(output) if policy.legacy_format == "repr" else \
+                json.dumps(output, indent=2, ensure_ascii=False, default=str)
+        metrics.measured += 1
+        metrics.tokens_before += self.count_tokens(before)
+        metrics.tokens_after += self.count_tokens(formatted)
+
+    def get_stats(self) -> dict:
+        """Return per-tool token counts before and after shaping, keyed by tool name."""
+        return {tool: metrics.to_dict() for tool, metrics in self.metrics.items()}
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+# Global instance
+tool_output_formatter = ToolOutputFormatter()
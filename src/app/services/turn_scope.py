@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from .admission_controller import estimate_tokens
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class TurnCancelledError(Exception):
+    """Raised out of a turn scope when the turn was cancelled by the app."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Turn cancelled: {reason}")
+        self.reason = reason
+
+
+class TurnScope:
+    """Cancellation scope and deadline of one chat turn."""
+
+    def __init__(self, deadline_seconds: float):
+        self.task = asyncio.current_task()
+        self.deadline = asyncio.get_running_loop().time() + deadline_seconds
+        self.agent_name: Optional[str] = None
+        self.streamed_tokens = 0
+        self.cancel_reason: Optional[str] = None
+
+    def remaining(self) -> float:
+        """Return the seconds left before the turn deadline."""
+        return max(self.deadline - asyncio.get_running_loop().time(), 0.0)
+
+    def record_tokens(self, text: str) -> None:
+        self.streamed_tokens += estimate_tokens(text)
+
+    def cancel(self, reason: str) -> None:
+        """Cancel the turn task, and with it the agent stream and nested tool calls."""
+        if self.cancel_reason is None and self.task and not self.task.done():
+            self.cancel_reason = reason
+            self.task.cancel()
+
+
+# The turn the current task belongs to, inherited by nested tool calls
+current_turn: ContextVar[Optional[TurnScope]] = ContextVar(
+    "current_turn", default=None)
+
+
+def remaining_time(default: float) -> float:
+    """Return the default timeout, capped by the current turn's remaining time."""
+    turn = current_turn.get()
+    return min(default, turn.remaining()) if turn else default
+
+
+class TurnManager:
+    """Tracks the running turn of every session so it can be cancelled.
+
+    A new or edited message, a stop request or a disconnect cancels the running
+    turn. The tokens the cancelled stream would still have produced, estimated
+    from the agent's average answer length, are reported as wasted tokens avoided.
+    """
+
+    smoothing = 0.2
+
+    def __init__(self, deadline_seconds: float = 120.0):
+        self.deadline_seconds = deadline_seconds
+        self.turns: dict[str, TurnScope] = {}
+        self.expected_tokens: dict[str, float] = {}
+        self.cancelled = {}
+        self.wasted_tokens_avoided = 0
+
+    def cancel(self, session_id: str, reason: str) -> None:
+        """Cancel the running turn of the session, if any."""
+        turn = self.turns.get(session_id)
+        if turn:
+            turn.cancel(reason)
+
+    def _record_completed(self, turn: TurnScope) -> None:
+        if not turn.agent_name:
+            return
+        expected = self.expected_tokens.get(turn.agent_name)
+        self.expected_tokens[turn.agent_name] = turn.streamed_tokens if expected is None else \
+            expected + self.smoothing * (turn.streamed_tokens - expected)
+
+    def _record_cancelled(self, turn: TurnScope) -> None:
+        self.cancelled[turn.cancel_reason] = self.cancelled.get(
+            turn.cancel_reason, 0) + 1
+        expected = self.expected_tokens.get(turn.agent_name or "", 0.0)
+        self.wasted_tokens_avoided += int(max(expected - turn.streamed_tokens, 0))
+
+    @asynccontextmanager
+    async def scope(self, session_id: str, deadline_seconds: Optional[float] = None):
+        """Run a turn of the session, cancelling the previous one still running."""
+        self.cancel(session_id, "superseded")
+        turn = TurnScope(deadline_seconds or self.deadline_seconds)
+        self.turns[session_id] = turn
+        token = current_turn.set(turn)
+        deadline_handle = asyncio.get_running_loop().call_at(
+            turn.deadline, turn.cancel, "deadline")
+        try:
+            yield turn
+            self._record_completed(turn)
+        except asyncio.CancelledError:
+            if turn.cancel_reason is None:
+                raise
+            # Our own cancellation: stop it here and tell the caller why
+            turn.task.uncancel()
+            self._record_cancelled(turn)
+            logger.info(f"Turn of session {session_id} cancelled: {turn.cancel_reason}")
+            raise TurnCancelledError(turn.cancel_reason)
+        finally:
+            deadline_handle.cancel()
+            current_turn.reset(token)
+            if self.turns.get(session_id) is turn:
+                del self.turns[session_id]
+
+    def get_stats(self) -> dict:
+        """Return cancelled turn counts per reason and the wasted tokens avoided."""
+        return {
+            **{f"cancelled_{reason}": count for reason, count in self.cancelled.items()},
+            "wasted_tokens_avoided": self.wasted_tokens_avoided,
+        }
+
+
+# Global instance
+turn_manager = TurnManager()
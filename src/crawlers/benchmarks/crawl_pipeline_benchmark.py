@@ -0,0 +1,76 @@
+"""
+Compare a sequential crawl with the pipelined crawl, on simulated stage latencies.
+
+Each item goes through the stages of a GitHub crawl: listing (one page of
+--page-size items per --list latency), README fetch, summarization, embedding
+and write. Sequentially, a page is listed, then each of its items goes through
+every stage before the next page. Pipelined, the stages run at the same time
+with CrawlPipeline, with the crawler's worker counts. Latencies are in
+milliseconds and vary by +-50%.
+
+Run from src/crawlers:
+    python -m benchmarks.crawl_pipeline_benchmark --items 200 --workers 4
+"""
+import argparse
+import random
+import time
+from crawl_pipeline import CrawlPipeline
+
+
+def simulated(milliseconds: float, seed: int):
+    rng = random.Random(seed)
+
+    def stage(item):
+        time.sleep(milliseconds / 1000 * rng.uniform(0.5, 1.5))
+        return item
+    return stage
+
+
+def listing(count: int, page_size: int, milliseconds: float):
+    page = simulated(milliseconds, 0)
+    for index in range(count):
+        if index % page_size == 0:
+            page(None)
+        yield index
+
+
+def main(count: int, page_size: int, workers: int, latencies: dict):
+    stages = [(name, milliseconds) for name, milliseconds in latencies.items() if name != "list"]
+
+    start = time.perf_counter()
+    functions = [simulated(milliseconds, seed) for seed, (_, milliseconds) in enumerate(stages, 1)]
+    for item in listing(count, page_size, latencies["list"]):
+        for function in functions:
+            item = function(item)
+    sequential = time.perf_counter() - start
+
+    pipeline = CrawlPipeline("benchmark")
+    for seed, (name, milliseconds) in enumerate(stages, 1):
+        pipeline.add_stage(name, simulated(milliseconds, seed),
+                           workers=2 if name == "write" else workers)
+    stats = pipeline.run(listing(count, page_size, latencies["list"]))
+
+    print(f"{count} items, pages of {page_size}, {workers} workers per stage")
+    print(f"sequential: {sequential:7.2f}s  {count / sequential:7.2f} items/s")
+    print(f"pipelined:  {stats['seconds']:7.2f}s  {count / stats['seconds']:7.2f} items/s "
+          f"({sequential / stats['seconds']:.1f}x)")
+    for name, _ in stages:
+        print(f"  {name:10} utilization {stats[name]['utilization']:4.0%} "
+              f"max queue {stats[name]['max_queue_depth']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--list", type=float, default=800.0, help="Latency of a listing page")
+    parser.add_argument("--fetch", type=float, default=150.0, help="Latency of a README fetch")
+    parser.add_argument("--summarize", type=float, default=1500.0, help="Latency of a summarization")
+    parser.add_argument("--embed", type=float, default=200.0, help="Latency of an embedding")
+    parser.add_argument("--write", type=float, default=30.0, help="Latency of a Cosmos DB upsert")
+    args = parser.parse_args()
+    main(args.items, args.page_size, args.workers,
+         {"list": args.list, "fetch": args.fetch, "summarize": args.summarize,
+          "embed": args.embed, "write": args.write})
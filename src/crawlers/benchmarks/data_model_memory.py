@@ -0,0 +1,104 @@
+"""
+Measure the memory held by crawler items with embeddings, old and new models.
+
+Builds the given number of repository items with a 1536 dimension embedding
+each, as the crawler holds them, and reports the traced memory per item:
+- dict-backed: the previous RepositoryInfo, a plain object whose embedding is
+  the list of floats parsed from the API's JSON response
+- slots: the RepositoryInfo dataclass with a float32 embedding decoded from
+  the API's base64 response
+
+Also reports the time and size of serializing an item for Cosmos DB.
+
+Run from src/crawlers:
+    python -m benchmarks.data_model_memory --items 50000
+"""
+import argparse
+import base64
+import gc
+import json
+import time
+import tracemalloc
+import numpy as np
+from data_models import RepositoryInfo
+
+dimensions = 1536
+
+
+class DictRepositoryInfo:
+    """RepositoryInfo as it was before, with a __dict__ per instance."""
+
+    def __init__(self, id, organization, name, url, updated_at, stars_count, archived,
+                 description=None, tags=None, embedding=None, pushed_at=None):
+        self.id = id
+        self.organization = organization
+        self.name = name
+        self.url = url
+        self.description = description
+        self.tags = tags
+        self.updated_at = updated_at
+        self.stars_count = stars_count
+        self.archived = archived
+        self.embedding = embedding
+        self.pushed_at = pushed_at
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "organization": self.organization, "name": self.name,
+                "url": self.url, "description": self.description, "tags": self.tags,
+                "updated_at": self.updated_at, "stars_count": self.stars_count,
+                "archived": self.archived, "pushed_at": self.pushed_at,
+                "embedding": self.embedding}
+
+
+def build(model, index: int, embedding) -> object:
+    return model(id=str(index), organization="Azure-Samples", name=f"repo-{index}",
+                 url=f"https://github.com/Azure-Samples/repo-{index}",
+                 updated_at="2025-08-01T10:00:00Z", stars_count=index, archived=False,
+                 description="A sample repository", tags="azure, sample",
+                 embedding=embedding, pushed_at="2025-07-30T08:00:00Z")
+
+
+def measure(label: str, count: int, make) -> list:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = [make(index) for index in range(count)]
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:12} {size / count / 1024:8.1f} KB/item {size / 2**20:10.1f} MB total "
+          f"(built in {seconds:.1f}s)")
+    return items
+
+
+def serialize(label: str, items: list) -> None:
+    start = time.perf_counter()
+    sizes = [len(json.dumps(item.to_dict(), separators=(",", ":"))) for item in items[:1000]]
+    seconds = time.perf_counter() - start
+    print(f"{label:12} {seconds / len(sizes) * 1000:8.3f} ms/item to serialize, "
+          f"{sum(sizes) / len(sizes) / 1024:.1f} KB on the wire")
+
+
+def main(count: int):
+    rng = np.random.default_rng(5)
+    vector = rng.normal(0, 0.03, dimensions).astype(np.float32)
+    # The API's responses: float32 values, as JSON text or base64
+    json_payload = json.dumps([float(f"{value:.9g}") for value in vector])
+    base64_payload = base64.b64encode(vector.tobytes()).decode()
+
+    items = measure("dict-backed", count, lambda index: build(
+        DictRepositoryInfo, index, json.loads(json_payload)))
+    serialize("dict-backed", items)
+    del items
+
+    items = measure("slots", count, lambda index: build(
+        RepositoryInfo, index,
+        np.frombuffer(base64.b64decode(base64_payload), dtype="<f4").astype(np.float32)))
+    serialize("slots", items)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.items)
@@ -0,0 +1,155 @@
+"""
+Compare the requests and wall time of the REST and GraphQL GitHub crawl paths.
+
+Both paths list an organization's repositories updated on the crawl day and
+fetch their READMEs, as a daily crawl does, without Cosmos DB or LLM calls:
+- REST: pages of 100 repositories, then raw README requests per repository
+- GraphQL: queries of 100 repositories, then README blobs of 100 per query
+
+record runs both paths against GitHub (GH_PAT must be set) and saves every
+response with its latency. replay serves the recorded responses with the
+recorded latencies, so the paths can be compared offline and repeatably.
+
+Run from src/crawlers:
+    python -m benchmarks.github_graphql_vs_rest record Azure-Samples fixtures.json
+    python -m benchmarks.github_graphql_vs_rest replay fixtures.json
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date
+import requests
+import github_crawler
+from github_crawler import GitHubCrawler
+
+
+def request_key(method: str, url: str, body) -> str:
+    return json.dumps([method, url, body], sort_keys=True)
+
+
+class RecordedResponse:
+    def __init__(self, record: dict):
+        self.status_code = record["status_code"]
+        self.headers = record["headers"]
+        self.text = record["text"]
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordingSession:
+    """A requests session that records every response and its latency."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.records = {}
+
+    def request(self, method: str, url: str, json=None, **kwargs):
+        start = time.perf_counter()
+        response = self.session.request(method, url, json=json, **kwargs)
+        self.records[request_key(method, url, json)] = {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "text": response.text,
+            "seconds": time.perf_counter() - start,
+        }
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+class ReplayingSession:
+    """A requests session that answers with recorded responses after their recorded latency."""
+
+    def __init__(self, records: dict):
+        self.records = records
+
+    def request(self, method: str, url: str, json=None, **kwargs):
+        record = self.records.get(request_key(method, url, json))
+        if record is None:
+            raise KeyError(f"No recorded response for {method} {url}")
+        time.sleep(record["seconds"])
+        return RecordedResponse(record)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+def crawl(crawler: GitHubCrawler, organization: str) -> int:
+    """List the repositories updated on the crawl day and fetch their READMEs."""
+    repos = crawler.fetch_org_repositories(organization)
+    if crawler.use_graphql:
+        readmes = crawler.fetch_readmes_graphql(organization, repos)
+        missing = [repo for repo in repos if repo.id not in readmes]
+    else:
+        missing = repos
+    for repo in missing:
+        crawler.fetch_readme_content(repo)
+    return len(repos)
+
+
+def run_paths(session_factory, organization: str) -> dict:
+    results = {}
+    for label, use_graphql in [("rest", False), ("graphql", True)]:
+        crawler = GitHubCrawler(cosmos_db_service=None, foundry_service=None,
+                                use_graphql=use_graphql)
+        crawler.session = session_factory()
+        start = time.perf_counter()
+        repos = crawl(crawler, organization)
+        results[label] = {"repos": repos, "seconds": time.perf_counter() - start,
+                          **crawler.api_calls, "session": crawler.session}
+    return results
+
+
+def report(results: dict) -> None:
+    for label, result in results.items():
+        requests_count = result["rest"] + result["raw"] + result["graphql"]
+        print(f"{label:8} {result['repos']:5} repos  {requests_count:6} requests "
+              f"(rest {result['rest']}, raw {result['raw']}, graphql {result['graphql']}, "
+              f"graphql cost {result['graphql_cost']})  {result['seconds']:7.1f}s")
+
+
+def record(organization: str, path: str) -> None:
+    if not os.getenv("GH_PAT"):
+        raise EnvironmentError("GH_PAT must be set to record the GraphQL path.")
+    results = run_paths(RecordingSession, organization)
+    records = {}
+    for result in results.values():
+        records.update(result["session"].records)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({"organization": organization, "date": date.today().isoformat(),
+                   "records": records}, file)
+    report(results)
+
+
+def replay(path: str) -> None:
+    with open(path, 'r', encoding='utf-8') as file:
+        fixtures = json.load(file)
+
+    # The listings stop at the repositories not updated on the recorded day
+    class RecordedDate(date):
+        @classmethod
+        def today(cls):
+            return date.fromisoformat(fixtures["date"])
+
+    github_crawler.date = RecordedDate
+    os.environ.setdefault("GH_PAT", "replay")
+    report(run_paths(lambda: ReplayingSession(fixtures["records"]), fixtures["organization"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("organization")
+    record_parser.add_argument("fixtures")
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("fixtures")
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.organization, args.fixtures)
+    else:
+        replay(args.fixtures)
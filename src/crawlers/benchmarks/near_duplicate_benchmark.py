@@ -0,0 +1,65 @@
+"""
+Measure how well the MinHash LSH index finds near-duplicate texts, and how fast.
+
+Generates distinct synthetic articles, then copies of some of them with a
+given share of their words changed, as cross-posted blog posts and template
+clone READMEs are. Reports the duplicates found, the false matches between
+distinct articles, and the time to compute and look up the signature of an item.
+
+Run from src/crawlers:
+    python -m benchmarks.near_duplicate_benchmark --items 5000 --copies 20 --edit 5
+"""
+import argparse
+import random
+import time
+from near_duplicates import NearDuplicateIndex
+
+vocabulary = [f"word{index}" for index in range(5000)]
+
+
+def article(rng: random.Random, length: int) -> list[str]:
+    return [rng.choice(vocabulary) for _ in range(length)]
+
+
+def edited(rng: random.Random, words: list[str], percent: float) -> list[str]:
+    copy = list(words)
+    for position in rng.sample(range(len(copy)), int(len(copy) * percent / 100)):
+        copy[position] = rng.choice(vocabulary)
+    return copy
+
+
+def main(count: int, copies_percent: float, edit_percent: float, threshold: float):
+    rng = random.Random(7)
+    originals = [article(rng, rng.randint(150, 600)) for _ in range(count)]
+    copies = [(index, edited(rng, originals[index], edit_percent))
+              for index in rng.sample(range(count), int(count * copies_percent / 100))]
+
+    index = NearDuplicateIndex(threshold=threshold)
+    start = time.perf_counter()
+    false_matches = 0
+    for item_id, words in enumerate(originals):
+        canonical_id, signature = index.check(str(item_id), " ".join(words))
+        false_matches += canonical_id is not None
+        index.add(str(item_id), index.from_wire(signature))
+
+    found = 0
+    for original_id, words in copies:
+        canonical_id, _ = index.check(f"copy-{original_id}", " ".join(words))
+        found += canonical_id == str(original_id)
+    seconds = time.perf_counter() - start
+
+    print(f"{count} articles, {len(copies)} copies with {edit_percent:g}% of words changed, "
+          f"threshold {threshold:g}")
+    print(f"copies found:  {found}/{len(copies)} ({found / max(len(copies), 1):.1%})")
+    print(f"false matches: {false_matches}/{count}")
+    print(f"{seconds / (count + len(copies)) * 1000:.2f} ms per item")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--copies", type=float, default=20.0, help="Percent of articles copied")
+    parser.add_argument("--edit", type=float, default=5.0, help="Percent of words changed in a copy")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity")
+    args = parser.parse_args()
+    main(args.items, args.copies, args.edit, args.threshold)
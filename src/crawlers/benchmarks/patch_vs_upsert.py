@@ -0,0 +1,82 @@
+"""
+Compare a metadata-only patch with the full upsert of a GitHub repository document.
+
+Always reports the request body size of both writes for a typical document: a
+2000 character summary, five tags and a 1536 dimension embedding. With
+--container it also writes a scratch document to that container and reports the
+measured request charge (RU) of each, then deletes the document again. Use a
+test container, the benchmark does not touch real repositories.
+
+Run from src/crawlers:
+    python -m benchmarks.patch_vs_upsert [--container github-repos-test --repeat 10]
+"""
+import argparse
+import json
+import random
+import statistics
+from dotenv import load_dotenv
+from data_models import RepositoryInfo
+
+
+def sample_repository() -> RepositoryInfo:
+    random.seed(7)
+    return RepositoryInfo(
+        id="patch-vs-upsert-benchmark",
+        organization="Azure-Samples",
+        name="azure-search-openai-demo",
+        url="https://github.com/Azure-Samples/azure-search-openai-demo",
+        updated_at="2025-08-01T10:00:00Z",
+        stars_count=6500,
+        archived=False,
+        description="x" * 2000,
+        tags="rag, azure openai, search, python, sample",
+        embedding=[random.uniform(-0.1, 0.1) for _ in range(1536)],
+        pushed_at="2025-07-30T08:00:00Z")
+
+
+def patch_fields(repo: RepositoryInfo) -> dict:
+    repo.stars_count += 1
+    repo.updated_at = "2025-08-02T10:00:00Z"
+    return {field: getattr(repo, field) for field in ["updated_at", "stars_count"]}
+
+
+def request_charge(container) -> float:
+    return float(container.client_connection.last_response_headers.get("x-ms-request-charge", 0))
+
+
+def main(container_name: str, repeat: int):
+    repo = sample_repository()
+    upsert_body = json.dumps(repo.to_dict())
+    patch_body = json.dumps({"operations": [{"op": "set", "path": f"/{field}", "value": value}
+                                            for field, value in patch_fields(repo).items()]})
+    print(f"upsert body: {len(upsert_body):>8} bytes")
+    print(f"patch body:  {len(patch_body):>8} bytes "
+          f"({len(upsert_body) / len(patch_body):.0f}x smaller)")
+    if not container_name:
+        return
+
+    load_dotenv(override=True)
+    from cosmos_db_service import CosmosDBService
+    cosmos_db_service = CosmosDBService()
+    container = cosmos_db_service.get_container(container_name)
+    upsert_charges, patch_charges = [], []
+    try:
+        for _ in range(repeat):
+            item = cosmos_db_service.upsert_item(repo.to_dict(), container_name)
+            upsert_charges.append(request_charge(container))
+            cosmos_db_service.patch_item(repo.id, patch_fields(repo), container_name,
+                                         etag=item.get("_etag"))
+            patch_charges.append(request_charge(container))
+    finally:
+        container.delete_item(item=repo.id, partition_key=repo.id)
+
+    print(f"upsert RU:   {statistics.mean(upsert_charges):8.2f}")
+    print(f"patch RU:    {statistics.mean(patch_charges):8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--container", help="Scratch container to measure request charges in")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    main(args.container, args.repeat)
@@ -0,0 +1,51 @@
+"""
+Measure the blocked top-k similarity join of the related content job.
+
+Generates random unit embeddings for a source and a target container and
+times RelatedContent.nearest, which multiplies blocks of source rows with the
+target matrix, against the exact top-k of the full similarity matrix on a
+sample of rows.
+
+Run from src/crawlers:
+    python -m benchmarks.related_content_benchmark --sources 50000 --targets 20000
+"""
+import argparse
+import time
+import numpy as np
+from related_content import RelatedContent
+
+
+def main(sources: int, targets: int, dimensions: int, top_k: int, block_mb: int):
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((sources, dimensions), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    matrix = rng.standard_normal((targets, dimensions), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    job = RelatedContent(cosmos_db_service=None, top_k=top_k,
+                         block_elements=block_mb * 2 ** 20 // 4)
+    start = time.perf_counter()
+    indices, scores = job.nearest(queries, matrix)
+    seconds = time.perf_counter() - start
+
+    sample = rng.choice(sources, size=min(200, sources), replace=False)
+    exact = np.argsort(-(queries[sample] @ matrix.T), axis=1)[:, :top_k]
+    matches = np.mean([set(exact[row]) == set(indices[index]) for row, index in enumerate(sample)])
+
+    print(f"{sources} x {targets} embeddings of {dimensions} dimensions, top {top_k}, "
+          f"{block_mb} MB blocks")
+    print(f"join: {seconds:.2f}s ({sources / seconds:,.0f} items/s), "
+          f"matrices {(queries.nbytes + matrix.nbytes) // 2 ** 20} MB")
+    print(f"exact top-k on {len(sample)} sampled rows: {matches:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=50000)
+    parser.add_argument("--targets", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--block-mb", type=int, default=64)
+    args = parser.parse_args()
+    main(args.sources, args.targets, args.dimensions, args.top_k, args.block_mb)
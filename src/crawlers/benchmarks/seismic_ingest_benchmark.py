@@ -0,0 +1,110 @@
+"""
+Compare rows/sec of the per-object and columnar Seismic ingest paths.
+
+Generates a synthetic Seismic export, then times both paths up to the write
+stage, without Cosmos DB or embedding calls:
+- per object: SeismicContent.from_dict, tags, to_dict and an md5 hash per row
+- columnar: load_table, normalize_table and changed_rows against stored hashes
+
+The stored hashes come from a first columnar pass with --changed percent of
+the rows modified afterwards, so the columnar path only emits those rows.
+
+Run from src/crawlers:
+    python -m benchmarks.seismic_ingest_benchmark --rows 50000 --changed 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from data_models import SeismicContent
+from seismic_crawler import SeismicCrawler
+
+
+def synthetic_export(count: int) -> list[dict]:
+    random.seed(3)
+    rows = []
+    for index in range(count):
+        day = random.randint(1, 28)
+        rows.append({
+            "id": f"seismic-{index}",
+            "name": f"Azure pitch deck {index}",
+            "url": f"https://seismic.example.com/content/{index}",
+            "version": "1",
+            "version_creation_date": f"Jul {day}, 2025 at 11:26 PM",
+            "last_update": f"Aug {day}, 2025 at 09:15 AM",
+            "creation_date": f"Jan {day}, 2024 at 10:00 AM",
+            "expiration_date": random.choice([f"Dec {day}, 2026 at 12:00 AM", "--"]),
+            "description": "Customer facing presentation " * 5,
+            "size": "2.4 MB",
+            "format": random.choice(["PPTX", "PDF", "DOCX"]),
+            "confidentiality": random.choice(["Internal", "Customer Ready"]),
+            "audience": "Technical",
+            "level": random.choice(["200", "300", "400"]),
+            "language": "English",
+            "segment": "Enterprise",
+            "content_sub_type": "Presentation",
+            "solution_area": random.choice(["AI Business Solutions", "Cloud and AI Platforms", "Security"]),
+            "content_group": "Pitch",
+            "products": random.choice(["Azure OpenAI, Azure AI Search", "--"]),
+        })
+    return rows
+
+
+def per_object(path: str) -> int:
+    with open(path, 'r', encoding='utf-8') as file:
+        items = [SeismicContent.from_dict(item) for item in json.load(file)]
+    hashes = {}
+    for item in items:
+        if item.products and item.products != "--":
+            item.tags = item.products
+        document = item.to_dict()
+        hashes[item.id] = hashlib.md5(json.dumps(document, sort_keys=True).encode()).hexdigest()
+    return len(hashes)
+
+
+def columnar(crawler: SeismicCrawler, stored_hashes: dict) -> int:
+    table = crawler.normalize_table(crawler.load_table())
+    return len(crawler.changed_rows(crawler.drop_expired(table), stored_hashes))
+
+
+def main(count: int, changed: float):
+    rows = synthetic_export(count)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "seismic.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file)
+        crawler = SeismicCrawler(cosmos_db_service=None, foundry_service=None,
+                                 data_source_path=path)
+
+        # Hashes as stored by a previous run, then change some rows
+        table = crawler.normalize_table(crawler.load_table())
+        stored_hashes = dict(zip(table["id"], table["content_hash"]))
+        for row in random.sample(rows, int(count * changed / 100)):
+            row["description"] += " (updated)"
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file)
+
+        start = time.perf_counter()
+        per_object(path)
+        per_object_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        emitted = columnar(crawler, stored_hashes)
+        columnar_seconds = time.perf_counter() - start
+
+    print(f"per object: {count / per_object_seconds:>10,.0f} rows/sec ({per_object_seconds:.2f}s), "
+          f"emits all {count} rows")
+    print(f"columnar:   {count / columnar_seconds:>10,.0f} rows/sec ({columnar_seconds:.2f}s), "
+          f"emits {emitted} changed rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--changed", type=float, default=5.0,
+                        help="Percent of rows changed since the previous run")
+    args = parser.parse_args()
+    main(args.rows, args.changed)
@@ -0,0 +1,70 @@
+"""
+Measure the size and speed of Parquet snapshots against a JSON export.
+
+Fills a LocalCosmosStore with items shaped like blog posts, with random
+embeddings as Cosmos DB stores them, exports it with SnapshotExporter,
+compares the snapshot's size with the same items as JSON lines, and times
+loading the snapshot back into a new store.
+
+Run from src/crawlers:
+    python -m benchmarks.snapshot_benchmark --items 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from data_models import embedding_to_wire
+from local_cosmos_store import LocalCosmosStore
+from snapshots import SnapshotExporter, system_fields
+
+container_name = "blog-posts"
+
+
+def main(items: int, dimensions: int):
+    rng = np.random.default_rng(7)
+    store = LocalCosmosStore()
+    store.ensure_container(container_name)
+    for index in range(items):
+        store.upsert_item({
+            "id": f"post-{index}",
+            "title": f"Post {index}",
+            "url": f"https://example.com/posts/{index}",
+            "description": "A summary of the post. " * 20,
+            "published_date": "2026-01-01T00:00:00+00:00",
+            "embedding": embedding_to_wire(rng.standard_normal(dimensions, dtype=np.float32)),
+        }, container_name)
+
+    with tempfile.TemporaryDirectory() as path:
+        json_path = os.path.join(path, "items.jsonl")
+        with open(json_path, "w") as file:
+            for item in store.iter_items("SELECT * FROM c", container_name):
+                file.write(json.dumps({key: value for key, value in item.items()
+                                       if key not in system_fields}) + "\n")
+        json_size = os.path.getsize(json_path)
+
+        start = time.perf_counter()
+        manifest = SnapshotExporter(store, os.path.join(path, "snapshot")).run([container_name])
+        export_seconds = time.perf_counter() - start
+        parquet_size = sum(os.path.getsize(os.path.join(path, "snapshot", part["file"]))
+                           for part in manifest["containers"][container_name]["parts"])
+
+        start = time.perf_counter()
+        LocalCosmosStore().load_snapshot(os.path.join(path, "snapshot"))
+        import_seconds = time.perf_counter() - start
+
+    print(f"{items} items with {dimensions}-dimension embeddings")
+    print(f"JSON lines: {json_size / 2 ** 20:.1f} MB, Parquet: {parquet_size / 2 ** 20:.1f} MB "
+          f"({json_size / parquet_size:.1f}x smaller)")
+    print(f"export: {export_seconds:.2f}s ({items / export_seconds:,.0f} items/s), "
+          f"import into a local store: {import_seconds:.2f}s ({items / import_seconds:,.0f} items/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+    main(args.items, args.dimensions)
@@ -1,11 +1,16 @@
 import logging
 import time
 import hashlib
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional
 import feedparser
 from data_models import BlogItem
 from cosmos_db_service import CosmosDBService
 from foundry_service import FoundryService
+from text_preprocessor import TextPreprocessor
+from near_duplicates import NearDuplicateIndex
+from crawl_scheduler import CrawlScheduler
+from embedding_profiles import EmbeddingProfiles
 
 
 # Configure logging
@@ -29,22 +34,59 @@ class BlogsCrawler:
 
     def __init__(self,
                  cosmos_db_service: CosmosDBService,
-                 foundry_service: FoundryService):
-        """Initialize the Blogs Crawler."""
+                 foundry_service: FoundryService,
+                 scheduler: Optional[CrawlScheduler] = None):
+        """Initialize the Blogs Crawler.
+
+        With a scheduler, only the feeds it has due are crawled.
+        """
         self.cosmos_db_service = cosmos_db_service
         self.foundry_service = foundry_service
+        self.scheduler = scheduler
+        self.text_preprocessor = TextPreprocessor()
+        self.near_duplicates = NearDuplicateIndex()
+        self.embedding_profiles = EmbeddingProfiles(cosmos_db_service)
 
     def generate_blog_id(self, url: str, published_date: str) -> str:
         """Generate a unique ID for a blog post based on URL and published date."""
         content = f"{url}_{published_date}"
         return hashlib.md5(content.encode()).hexdigest()
 
+    def link_duplicate(self, blog_item: BlogItem, canonical_id: str) -> bool:
+        """Save a cross-posted copy of a blog post with the canonical post's summary and no embedding.
+
+        Returns False if the canonical post no longer exists.
+        """
+        canonical = self.cosmos_db_service.read_item(
+            item_id=canonical_id, container_name=cosmosdb_container_name)
+        if not canonical:
+            return False
+        blog_item.description = canonical.get("description")
+        blog_item.tags = canonical.get("tags")
+        blog_item.canonical_id = canonical_id
+        # Also replacing its copies, which the app may be searching
+        self.embedding_profiles.upsert_item(
+            item=blog_item.to_dict(),
+            container_name=cosmosdb_container_name
+        )
+        logger.info(
+            f"Blog post '{blog_item.title}' is a near duplicate of {canonical.get('url')}")
+        return True
+
     def process_blog_item(self, blog_item: BlogItem) -> None:
         """Process a blog item: generate embeddings and save to CosmosDB."""
         try:
-            # Prepare content for embedding generation
-            summary, tags = self.foundry_service.summarize_and_generate_tags(
-                blog_item.description)
+            # Prepare content for embedding generation, from the post's text rather than its HTML
+            text = self.text_preprocessor.prepare(blog_item.description, content_type="html")
+
+            # Cross-posted copies are linked to the first copy instead of summarized again
+            canonical_id, blog_item.minhash = self.near_duplicates.check(
+                blog_item.id, f"{blog_item.title}\n\n{text}",
+                tokens=self.text_preprocessor.count_tokens(text))
+            if canonical_id and self.link_duplicate(blog_item, canonical_id):
+                return
+
+            summary, tags = self.foundry_service.summarize_and_generate_tags(text)
             blog_item.description = summary
             blog_item.tags = tags
             embedding_content = f"{blog_item.title}\n\n{blog_item.description}"
@@ -53,11 +95,15 @@ class BlogsCrawler:
             blog_item.embedding = self.foundry_service.generate_embedding(
                 embedding_content)
 
-            # Save blog item to CosmosDB
-            self.cosmos_db_service.upsert_item(
+            # Save blog item to CosmosDB, with the embeddings of a model migration if there is one
+            self.embedding_profiles.upsert_item(
                 item=blog_item.to_dict(),
-                container_name=cosmosdb_container_name
+                container_name=cosmosdb_container_name,
+                text=embedding_content,
+                foundry_service=self.foundry_service
             )
+            if blog_item.minhash:
+                self.near_duplicates.add(blog_item.id, self.near_duplicates.from_wire(blog_item.minhash))
 
             logger.info(f"Successfully processed blog post: {blog_item.title}")
 
@@ -65,9 +111,10 @@ class BlogsCrawler:
             logger.error(
                 f"Error processing blog item '{blog_item.title}': {e}")
 
-    def process_blog_items(self, blog_items: List[BlogItem]) -> None:
-        """Process a list of blog items."""
+    def process_blog_items(self, blog_items: List[BlogItem]) -> List[str]:
+        """Process a list of blog items, and return the published dates of the new ones."""
         logger.info(f"Processing {len(blog_items)} blog items")
+        published_dates = []
 
         for blog_item in blog_items:
             try:
@@ -80,6 +127,7 @@ class BlogsCrawler:
                     continue
 
                 # Process each blog item
+                published_dates.append(blog_item.published_date)
                 self.process_blog_item(blog_item)
 
                 # Rate limiting
@@ -90,6 +138,7 @@ class BlogsCrawler:
                 continue
 
         logger.info(f"Finished processing {len(blog_items)} blog items")
+        return published_dates
 
     def rss_feed_to_json(self, feed_url: str) -> List[BlogItem]:
         """Fetch RSS feed from the given URL and convert items to JSON serializable dicts."""
@@ -123,14 +172,39 @@ class BlogsCrawler:
     def run(self):
         """Main function to run the Blogs crawler."""
         logger.info("Blogs crawler started.")
+        self.text_preprocessor.reset_stats()
+        self.near_duplicates.reset_stats()
+        try:
+            self.near_duplicates.load(self.cosmos_db_service, cosmosdb_container_name)
+        except Exception as e:
+            logger.error(f"Error loading blog post signatures, only posts of this run are compared: {e}")
+        self.embedding_profiles.load(cosmosdb_container_name)
+
+        feed_urls = blog_feed_urls
+        scheduler = self.scheduler
+        if scheduler:
+            try:
+                scheduler.load()
+                feed_urls = scheduler.due_sources(blog_feed_urls)
+            except Exception as e:
+                logger.error(f"Error loading the crawl schedule, crawling every feed: {e}")
+                scheduler = None
 
-        for feed_url in blog_feed_urls:
+        for feed_url in feed_urls:
             try:
                 logger.info(f"Processing feed: {feed_url}")
+                started_at = datetime.now(timezone.utc)
                 blog_items = self.rss_feed_to_json(feed_url)
-                self.process_blog_items(blog_items)
+                published_dates = self.process_blog_items(blog_items)
+                if scheduler:
+                    # One request fetches the feed
+                    scheduler.record(feed_url, published_dates, api_calls=1, now=started_at)
 
             except Exception as e:
                 logger.error(f"Error processing feed '{feed_url}': {e}")
 
+        self.text_preprocessor.log_stats("Blogs crawler")
+        self.near_duplicates.log_stats("Blogs crawler")
+        if scheduler:
+            scheduler.log_stats()
         logger.info("Blogs crawler finished.")
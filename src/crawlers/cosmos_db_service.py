@@ -1,6 +1,18 @@
 
 import os
-from azure.cosmos import CosmosClient, ContainerProxy, CosmosDict, exceptions
+from typing import Iterator, List, Optional
+from azure.core import MatchConditions
+from azure.cosmos import CosmosClient, ContainerProxy, CosmosDict, PartitionKey, exceptions
+
+# Container properties that copies of a container need, e.g. for vector and full-text search,
+# and the keyword create_container_if_not_exists takes them as
+container_settings = {
+    "indexingPolicy": "indexing_policy",
+    "vectorEmbeddingPolicy": "vector_embedding_policy",
+    "fullTextPolicy": "full_text_policy",
+    "defaultTtl": "default_ttl",
+}
+
 
 class CosmosDBService:
     """Service to interact with Azure CosmosDB"""
@@ -19,10 +31,33 @@ class CosmosDBService:
     def get_container(self, container_name: str) -> ContainerProxy:
         return self.database.get_container_client(container_name)
 
+    def ensure_container(self, container_name: str, settings: Optional[dict] = None) -> ContainerProxy:
+        """Return the container, creating it partitioned by id if it does not exist.
+
+        A new container gets the policies of settings, as read_container_settings
+        returns them. An existing container is left as it is.
+        """
+        return self.database.create_container_if_not_exists(
+            id=container_name, partition_key=PartitionKey(path="/id"),
+            **{keyword: settings[key] for key, keyword in container_settings.items()
+               if settings and settings.get(key) is not None})
+
+    def read_container_settings(self, container_name: str) -> dict:
+        """Return the indexing, vector embedding and full-text policies and default TTL of a container."""
+        properties = self.get_container(container_name=container_name).read()
+        return {key: properties[key] for key in container_settings if key in properties}
+
     def upsert_item(self, item: dict, container_name: str) -> CosmosDict:
         container = self.get_container(container_name=container_name)
         return container.upsert_item(body=item)
     
+    def read_item(self, item_id: str, container_name: str) -> Optional[CosmosDict]:
+        container = self.get_container(container_name=container_name)
+        try:
+            return container.read_item(item=item_id, partition_key=item_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
     def check_item_exists(self, item_id: str, container_name: str) -> bool:
         container = self.get_container(container_name=container_name)
         try:
@@ -30,4 +65,60 @@ class CosmosDBService:
             return True
         except exceptions.CosmosResourceNotFoundError:
             return False
-    
\ No newline at end of file
+
+    def query_items(self, query: str, container_name: str, parameters: list = None) -> list:
+        container = self.get_container(container_name=container_name)
+        return list(container.query_items(
+            query=query,
+            parameters=parameters or [],
+            enable_cross_partition_query=True
+        ))
+
+    def iter_items(self, query: str, container_name: str, parameters: list = None,
+                   page_size: int = 1000, feed_range: Optional[dict] = None) -> Iterator[dict]:
+        """Yield the results of a query page by page, without holding them all in memory.
+
+        With a feed range, only the items of that range are queried, so several
+        ranges can be read in parallel.
+        """
+        container = self.get_container(container_name=container_name)
+        return iter(container.query_items(
+            query=query,
+            parameters=parameters or [],
+            enable_cross_partition_query=True,
+            max_item_count=page_size,
+            **({"feed_range": feed_range} if feed_range else {})
+        ))
+
+    def feed_ranges(self, container_name: str) -> List[dict]:
+        """Return the feed ranges of a container, one per physical partition."""
+        container = self.get_container(container_name=container_name)
+        return list(container.read_feed_ranges())
+
+    def patch_item(self, item_id: str, fields: dict, container_name: str,
+                   etag: Optional[str] = None, remove: Optional[List[str]] = None) -> CosmosDict:
+        """Set only the given fields of an item, and remove those of remove, with a partial document update.
+
+        With an etag, the patch only applies if the item was not modified since
+        it was read, and raises CosmosAccessConditionFailedError otherwise.
+        """
+        remove = remove or []
+        if len(fields) + len(remove) > 10:
+            raise ValueError("Cosmos DB accepts at most 10 patch operations per request.")
+        container = self.get_container(container_name=container_name)
+        return container.patch_item(
+            item=item_id,
+            partition_key=item_id,
+            patch_operations=[{"op": "set", "path": f"/{field}", "value": value}
+                              for field, value in fields.items()]
+            + [{"op": "remove", "path": f"/{field}"} for field in remove],
+            etag=etag,
+            match_condition=MatchConditions.IfNotModified if etag else None)
+
+    def delete_item(self, item_id: str, container_name: str) -> bool:
+        container = self.get_container(container_name=container_name)
+        try:
+            container.delete_item(item=item_id, partition_key=item_id)
+            return True
+        except exceptions.CosmosResourceNotFoundError:
+            return False
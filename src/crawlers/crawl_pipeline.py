@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# Marks the end of a stage's input
+end_of_input = object()
+
+
+class PipelineStage:
+    """A pipeline stage: worker threads applying a function to the items of an input queue.
+
+    The function returns the item for the next stage, or None to drop it. With a
+    batch_size, it gets a list of up to batch_size items and returns a list.
+    """
+
+    def __init__(self, name: str, function: Callable, workers: int = 1,
+                 batch_size: int = 1, queue_size: int = 20):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.batch_size = batch_size
+        self.input = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def put(self, item) -> None:
+        """Queue an item, blocking while the queue is full."""
+        self.input.put(item)
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.input.qsize())
+
+    def take_batch(self) -> list:
+        """Take up to batch_size items, waiting for the first one only."""
+        batch = [self.input.get()]
+        while len(batch) < self.batch_size and batch[-1] is not end_of_input:
+            try:
+                batch.append(self.input.get(timeout=1.0))
+            except queue.Empty:
+                break
+        return batch
+
+    def work(self, next_stage: Optional['PipelineStage']) -> None:
+        while True:
+            batch = self.take_batch()
+            done = batch[-1] is end_of_input
+            items = [item for item in batch if item is not end_of_input]
+            if items:
+                start = time.perf_counter()
+                try:
+                    results = self.function(items) if self.batch_size > 1 else [self.function(items[0])]
+                except Exception as e:
+                    logger.error(f"Pipeline stage {self.name} failed on {str(items[0])[:120]}: {e}")
+                    results = []
+                    with self.lock:
+                        self.errors += len(items)
+                results = [result for result in results if result is not None]
+                with self.lock:
+                    self.items_in += len(items)
+                    self.items_out += len(results)
+                    self.busy_seconds += time.perf_counter() - start
+                if next_stage:
+                    for result in results:
+                        next_stage.put(result)
+            if done:
+                # Let the other workers of this stage see the end too
+                self.input.put(end_of_input)
+                return
+
+    def get_stats(self, seconds: float) -> dict:
+        with self.lock:
+            return {
+                "items_in": self.items_in,
+                "items_out": self.items_out,
+                "errors": self.errors,
+                "items_per_second": self.items_in / seconds if seconds else 0.0,
+                # Share of the run the workers were busy; near 1 means the stage is the bottleneck
+                "utilization": self.busy_seconds / (seconds * self.workers) if seconds else 0.0,
+                "queue_depth": self.input.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+
+class CrawlPipeline:
+    """Runs crawl stages at the same time, connected by bounded queues.
+
+    A source iterable feeds the first stage from its own thread. Each stage's
+    output queues into the next stage, and full queues block the stage before
+    them, so a slow stage holds back the listing instead of letting items pile
+    up in memory.
+    """
+
+    def __init__(self, name: str, queue_size: int = 20):
+        self.name = name
+        self.queue_size = queue_size
+        self.stages: List[PipelineStage] = []
+        self.source_items = 0
+        self.source_error: Optional[Exception] = None
+        self.seconds = 0.0
+
+    def add_stage(self, name: str, function: Callable, workers: int = 1,
+                  batch_size: int = 1) -> 'CrawlPipeline':
+        self.stages.append(PipelineStage(name, function, workers, batch_size,
+                                         max(self.queue_size, batch_size)))
+        return self
+
+    def feed(self, source: Iterable) -> None:
+        try:
+            for item in source:
+                self.stages[0].put(item)
+                self.source_items += 1
+        except Exception as e:
+            # Items already listed still go through the pipeline
+            logger.error(f"Pipeline {self.name} source failed after {self.source_items} items: {e}")
+            self.source_error = e
+        finally:
+            self.stages[0].put(end_of_input)
+
+    def run(self, source: Iterable) -> dict:
+        """Run the source through all stages and return the per-stage stats."""
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self.feed, args=(source,), name=f"{self.name}-source")]
+        stage_threads = []
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            stage_threads.append([
+                threading.Thread(target=stage.work, args=(next_stage,), name=f"{self.name}-{stage.name}-{worker}")
+                for worker in range(stage.workers)])
+        for thread in threads + [thread for group in stage_threads for thread in group]:
+            thread.start()
+
+        threads[0].join()
+        for index, group in enumerate(stage_threads):
+            for thread in group:
+                thread.join()
+            # All workers of a stage are done, so is the input of the next one
+            if index + 1 < len(self.stages):
+                self.stages[index + 1].put(end_of_input)
+
+        self.seconds = time.perf_counter() - start
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "source_items": self.source_items,
+            **{stage.name: stage.get_stats(self.seconds) for stage in self.stages},
+        }
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        logger.info(f"Pipeline {self.name}: {stats['source_items']} items listed in {stats['seconds']:.1f}s")
+        for stage in self.stages:
+            stage_stats = stats[stage.name]
+            logger.info(
+                f"  {stage.name:10} in {stage_stats['items_in']:5} out {stage_stats['items_out']:5} "
+                f"errors {stage_stats['errors']:3} {stage_stats['items_per_second']:7.2f}/s "
+                f"utilization {stage_stats['utilization']:4.0%} "
+                f"max queue {stage_stats['max_queue_depth']}/{stage.input.maxsize}")
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from cosmos_db_service import CosmosDBService
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# CosmosDB configuration
+schedule_container_name = "crawl-schedule"
+
+
+def parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class CrawlScheduler:
+    """Crawls each source (GitHub organization, blog feed) as often as it changes.
+
+    Every crawl records the changes found in a source since its previous crawl.
+    The source's change rate, in changes per hour, is smoothed with an
+    exponentially weighted moving average, and the source is due again once
+    target_changes are expected, within min_interval_hours and
+    max_interval_hours. A frequent trigger crawls only the due sources.
+
+    The state of each source is a document of the crawl-schedule container,
+    which also keeps the API calls of the last days and the freshness lag: how
+    long changes waited to be crawled. The next crawl lists the changes since
+    the oldest change the previous one failed to process, so none is missed.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 crawler: str,
+                 smoothing: float = 0.3,
+                 target_changes: float = 3.0,
+                 min_interval_hours: float = 1.0,
+                 max_interval_hours: float = 72.0,
+                 history_days: int = 7):
+        self.cosmos_db_service = cosmos_db_service
+        self.crawler = crawler
+        self.smoothing = smoothing
+        self.target_changes = target_changes
+        self.min_interval_hours = min_interval_hours
+        self.max_interval_hours = max_interval_hours
+        self.history_days = history_days
+        self.states: dict[str, dict] = {}
+        self.skipped = 0
+        self.recorded: List[dict] = []
+
+    def state_id(self, source: str) -> str:
+        # Feed URLs contain characters that Cosmos DB ids cannot
+        return hashlib.md5(f"{self.crawler}:{source}".encode()).hexdigest()
+
+    def load(self) -> None:
+        """Load the state of the crawler's sources."""
+        self.cosmos_db_service.ensure_container(schedule_container_name)
+        states = self.cosmos_db_service.query_items(
+            query="SELECT * FROM c WHERE c.crawler = @crawler",
+            container_name=schedule_container_name,
+            parameters=[{"name": "@crawler", "value": self.crawler}])
+        self.states = {state["source"]: state for state in states}
+        self.skipped = 0
+        self.recorded = []
+
+    def is_due(self, source: str, now: Optional[datetime] = None) -> bool:
+        state = self.states.get(source)
+        if not state:
+            return True
+        return (now or datetime.now(timezone.utc)) >= parse_time(state["next_due_at"])
+
+    def due_sources(self, sources: Iterable[str], now: Optional[datetime] = None) -> List[str]:
+        """Return the sources due for a crawl, and count the others as skipped."""
+        sources = list(sources)
+        due = [source for source in sources if self.is_due(source, now)]
+        self.skipped += len(sources) - len(due)
+        return due
+
+    def since(self, source: str) -> Optional[datetime]:
+        """Return the time the source's changes are processed up to, None if it was never crawled."""
+        state = self.states.get(source)
+        if not state:
+            return None
+        return parse_time(state.get("crawled_through") or state["last_crawled_at"])
+
+    def record(self, source: str, changed_at: List[str], api_calls: int,
+               now: Optional[datetime] = None, failed_at: Optional[List[str]] = None) -> dict:
+        """Record a crawl of a source and schedule its next one.
+
+        changed_at are the change times (e.g. updated_at, published_date) of
+        the changes the crawl found, and api_calls the requests it sent.
+        failed_at are the change times of the changes it failed to process,
+        which the next crawl lists again.
+        """
+        now = now or datetime.now(timezone.utc)
+        crawled_through = now
+        for value in failed_at or []:
+            try:
+                crawled_through = min(crawled_through, parse_time(value))
+            except (TypeError, ValueError):
+                # Without its time, the failed change is listed again from the previous crawl on
+                crawled_through = min(crawled_through, self.since(source) or now)
+        state = self.states.get(source) or {
+            "id": self.state_id(source),
+            "crawler": self.crawler,
+            "source": source,
+            "calls_by_day": {},
+        }
+
+        # The first crawl covers the changes of about a day
+        hours = (now - parse_time(state["last_crawled_at"])).total_seconds() / 3600 \
+            if "last_crawled_at" in state else 24.0
+        observed_rate = len(changed_at) / max(hours, self.min_interval_hours)
+        rate = observed_rate if "change_rate" not in state else \
+            self.smoothing * observed_rate + (1 - self.smoothing) * state["change_rate"]
+
+        interval = self.max_interval_hours if rate <= 0 else \
+            min(max(self.target_changes / rate, self.min_interval_hours), self.max_interval_hours)
+
+        lags = []
+        for value in changed_at:
+            try:
+                lags.append(max((now - parse_time(value)).total_seconds() / 3600, 0.0))
+            except (TypeError, ValueError):
+                # Feeds without a usable date still count as changes
+                continue
+        freshness_lag = sum(lags) / len(lags) if lags else None
+
+        day = now.date().isoformat()
+        calls_by_day = {key: value for key, value in state["calls_by_day"].items()
+                        if key > (now - timedelta(days=self.history_days)).date().isoformat()}
+        calls_by_day[day] = calls_by_day.get(day, 0) + api_calls
+
+        state.update({
+            "last_crawled_at": now.isoformat(),
+            "crawled_through": crawled_through.isoformat(),
+            "last_failures": len(failed_at or []),
+            # Due a little early, so an hourly trigger does not wait a whole hour more
+            "next_due_at": (now + timedelta(hours=interval) - timedelta(minutes=5)).isoformat(),
+            "change_rate": rate,
+            "interval_hours": interval,
+            "last_changes": len(changed_at),
+            "freshness_lag_hours": freshness_lag,
+            "calls_by_day": calls_by_day,
+        })
+        self.cosmos_db_service.upsert_item(state, schedule_container_name)
+        self.states[source] = state
+        self.recorded.append(state)
+        return state
+
+    def get_stats(self) -> dict:
+        """Return the freshness lag of this run's changes and the API calls per day of all sources."""
+        changes = sum(state["last_changes"] for state in self.recorded)
+        lag = sum(state["freshness_lag_hours"] * state["last_changes"]
+                  for state in self.recorded if state["freshness_lag_hours"] is not None)
+        calls_by_day: dict[str, int] = {}
+        for state in self.states.values():
+            for day, calls in state.get("calls_by_day", {}).items():
+                calls_by_day[day] = calls_by_day.get(day, 0) + calls
+        return {
+            "crawled": len(self.recorded),
+            "skipped": self.skipped,
+            "changes": changes,
+            "freshness_lag_hours": lag / changes if changes else 0.0,
+            "api_calls_per_day": sum(calls_by_day.values()) / len(calls_by_day) if calls_by_day else 0.0,
+            "calls_by_day": dict(sorted(calls_by_day.items())),
+        }
+
+    def log_stats(self) -> None:
+        for state in self.recorded:
+            lag = state["freshness_lag_hours"]
+            logger.info(
+                f"{self.crawler} source {state['source']}: {state['last_changes']} changes, "
+                f"{state['change_rate']:.2f}/hour, next crawl in {state['interval_hours']:.1f} hours"
+                + (f", freshness lag {lag:.1f} hours" if lag is not None else ""))
+        stats = self.get_stats()
+        logger.info(
+            f"{self.crawler} schedule: {stats['crawled']} sources crawled, {stats['skipped']} not due, "
+            f"freshness lag {stats['freshness_lag_hours']:.1f} hours over {stats['changes']} changes, "
+            f"{stats['api_calls_per_day']:.0f} API calls per day ({stats['calls_by_day']})")
@@ -1,20 +1,46 @@
+from dataclasses import dataclass
 from typing import Dict, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import numpy as np
 
 
+def to_embedding(values) -> Optional[np.ndarray]:
+    """Hold an embedding as a float32 buffer instead of a list of boxed floats."""
+    if values is None or isinstance(values, np.ndarray) and values.dtype == np.float32:
+        return values
+    return np.asarray(values, dtype=np.float32)
+
+
+def embedding_to_wire(embedding: Optional[np.ndarray]) -> Optional[list]:
+    """Convert an embedding to the JSON list Cosmos DB stores.
+
+    Nine significant digits are enough to round-trip any float32 value, however
+    small, while serializing each value as short as the API returned it,
+    instead of its full float64 expansion.
+    """
+    if embedding is None:
+        return None
+    return [float(f"{value:.9g}") for value in np.asarray(embedding, dtype=np.float32).tolist()]
+
+
+# Items compare by identity: a generated __eq__ would compare the ndarray embeddings,
+# which raises instead of returning a bool
+@dataclass(slots=True, eq=False)
 class BlogItem:
     """Data class to hold blog post information"""
 
-    def __init__(self, id: str, title: str, url: str, published_date: str,
-                 description: Optional[str] = None, tags: Optional[str] = None,
-                 embedding: Optional[float] = None):
-        self.id = id  # Unique identifier for the blog post
-        self.title = title
-        self.url = url
-        self.description = description
-        self.tags = tags
-        self.published_date = published_date
-        self.embedding = embedding
+    id: str  # Unique identifier for the blog post
+    title: str
+    url: str
+    published_date: str
+    description: Optional[str] = None
+    tags: Optional[str] = None
+    embedding: Optional[np.ndarray] = None
+    minhash: Optional[str] = None  # MinHash signature of the text, to find near duplicates
+    canonical_id: Optional[str] = None  # Set on near duplicates, which are not embedded
+
+    def __post_init__(self):
+        self.embedding = to_embedding(self.embedding)
 
     def to_dict(self) -> Dict:
         """Convert the blog item to a dictionary for saving to CosmosDB"""
@@ -25,7 +51,9 @@ class BlogItem:
             "description": self.description,
             "tags": self.tags,
             "published_date": self.published_date,
-            "embedding": self.embedding
+            "embedding": embedding_to_wire(self.embedding),
+            **({"minhash": self.minhash} if self.minhash else {}),
+            **({"canonical_id": self.canonical_id} if self.canonical_id else {})
         }
 
     @staticmethod
@@ -38,27 +66,33 @@ class BlogItem:
             description=data.get("description"),
             tags=data.get("tags"),
             published_date=data.get("published_date"),
-            embedding=data.get("embedding")
+            embedding=data.get("embedding"),
+            minhash=data.get("minhash"),
+            canonical_id=data.get("canonical_id")
         )
 
 
+@dataclass(slots=True, eq=False)
 class RepositoryInfo:
     """Data class to hold repository information"""
 
-    def __init__(self, id: str, organization: str, name: str, url: str,
-                 updated_at: str, stars_count: int, archived: bool,
-                 description: Optional[str] = None, tags: Optional[str] = None,
-                 embedding: Optional[float] = None):
-        self.id = id  # Unique identifier for the repository
-        self.organization = organization
-        self.name = name
-        self.url = url
-        self.description = description
-        self.tags = tags
-        self.updated_at = updated_at
-        self.stars_count = stars_count
-        self.archived = archived
-        self.embedding = embedding
+    id: str  # Unique identifier for the repository
+    organization: str
+    name: str
+    url: str
+    updated_at: str
+    stars_count: int
+    archived: bool
+    description: Optional[str] = None
+    tags: Optional[str] = None
+    embedding: Optional[np.ndarray] = None
+    pushed_at: Optional[str] = None  # Last push, which is when the README can change
+    minhash: Optional[str] = None  # MinHash signature of the README, to find template clones
+    canonical_id: Optional[str] = None  # Set on near duplicates, which are not embedded
+    default_branch: Optional[str] = None  # Where the README is fetched from, not stored
+
+    def __post_init__(self):
+        self.embedding = to_embedding(self.embedding)
 
     def to_dict(self) -> Dict:
         """Convert the repository info to a dictionary for saving to CosmosDB"""
@@ -72,7 +106,10 @@ class RepositoryInfo:
             "updated_at": self.updated_at,
             "stars_count": self.stars_count,
             "archived": self.archived,
-            "embedding": self.embedding
+            "pushed_at": self.pushed_at,
+            "embedding": embedding_to_wire(self.embedding),
+            **({"minhash": self.minhash} if self.minhash else {}),
+            **({"canonical_id": self.canonical_id} if self.canonical_id else {})
         }
 
     @staticmethod
@@ -88,10 +125,14 @@ class RepositoryInfo:
             updated_at=data.get("updated_at"),
             stars_count=data.get("stars_count", 0),
             archived=data.get("archived", False),
-            embedding=data.get("embedding")
+            embedding=data.get("embedding"),
+            pushed_at=data.get("pushed_at"),
+            minhash=data.get("minhash"),
+            canonical_id=data.get("canonical_id")
         )
 
 
+@dataclass(slots=True, eq=False)
 class SeismicContent:
     """Data class to hold Seismic content information"""
 
@@ -106,40 +147,67 @@ class SeismicContent:
         except Exception:
             return date_str
 
-    def __init__(self, id: str, name: str, url: str, version: str, version_creation_date: str, last_update: str, creation_date: str,
-                 expiration_date: str, description: str, size: str, format: str, confidentiality: str, sales_stage: str,
-                 audience: str, competitor: str, level: str, language: str, industry: str, initiative: str, segment: str,
-                 content_sub_type: str, industry_sub_vertical: str, solution_area: str, content_group: str, products: str,
-                 solution_play: str, industry_vertical: str, tags: Optional[str] = None, embedding: Optional[float] = None):
-        self.id = id
-        self.name = name
-        self.url = url
-        self.version = version
-        self.version_creation_date = self._to_iso_date(version_creation_date)
-        self.last_update = self._to_iso_date(last_update)
-        self.creation_date = self._to_iso_date(creation_date)
-        self.expiration_date = self._to_iso_date(expiration_date)
-        self.description = description
-        self.size = size
-        self.format = format
-        self.confidentiality = confidentiality
-        self.sales_stage = sales_stage
-        self.audience = audience
-        self.competitor = competitor
-        self.level = level
-        self.language = language
-        self.industry = industry
-        self.initiative = initiative
-        self.segment = segment
-        self.content_sub_type = content_sub_type
-        self.industry_sub_vertical = industry_sub_vertical
-        self.solution_area = solution_area
-        self.content_group = content_group
-        self.products = products
-        self.solution_play = solution_play
-        self.industry_vertical = industry_vertical
-        self.tags = tags
-        self.embedding = embedding
+    @staticmethod
+    def _seconds_left(expiration_date: Optional[str]) -> Optional[float]:
+        """Return the seconds until an ISO expiration date, or None if it has none."""
+        if not expiration_date or not isinstance(expiration_date, str):
+            return None
+        try:
+            expires_at = datetime.fromisoformat(expiration_date.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+    @staticmethod
+    def _ttl_seconds(expiration_date: Optional[str]) -> Optional[int]:
+        """Return the TTL of an item with an ISO expiration date, or None if it has none."""
+        seconds = SeismicContent._seconds_left(expiration_date)
+        # Cosmos DB needs a positive TTL
+        return None if seconds is None else max(int(seconds), 1)
+
+    def is_expired(self) -> bool:
+        """Return True if the content's expiration date has passed."""
+        seconds = self._seconds_left(self.expiration_date)
+        return seconds is not None and seconds <= 0
+
+    id: str
+    name: str
+    url: str
+    version: str
+    version_creation_date: str
+    last_update: str
+    creation_date: str
+    expiration_date: str
+    description: str
+    size: str
+    format: str
+    confidentiality: str
+    sales_stage: str
+    audience: str
+    competitor: str
+    level: str
+    language: str
+    industry: str
+    initiative: str
+    segment: str
+    content_sub_type: str
+    industry_sub_vertical: str
+    solution_area: str
+    content_group: str
+    products: str
+    solution_play: str
+    industry_vertical: str
+    tags: Optional[str] = None
+    embedding: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.version_creation_date = self._to_iso_date(self.version_creation_date)
+        self.last_update = self._to_iso_date(self.last_update)
+        self.creation_date = self._to_iso_date(self.creation_date)
+        self.expiration_date = self._to_iso_date(self.expiration_date)
+        self.embedding = to_embedding(self.embedding)
 
     def to_dict(self) -> Dict:
         """Convert the SeismicContent to a dictionary for saving to CosmosDB"""
@@ -172,7 +240,9 @@ class SeismicContent:
             "solution_play": self.solution_play,
             "industry_vertical": self.industry_vertical,
             "tags": self.tags,
-            "embedding": self.embedding
+            "embedding": embedding_to_wire(self.embedding),
+            # Cosmos DB deletes the item when it expires
+            **({"ttl": ttl} if (ttl := self._ttl_seconds(self.expiration_date)) else {})
         }
 
     @staticmethod
@@ -183,13 +253,10 @@ class SeismicContent:
             name=data.get("name"),
             url=data.get("url"),
             version=data.get("version"),
-            version_creation_date=SeismicContent._to_iso_date(
-                data.get("version_creation_date")),
-            last_update=SeismicContent._to_iso_date(data.get("last_update")),
-            creation_date=SeismicContent._to_iso_date(
-                data.get("creation_date")),
-            expiration_date=SeismicContent._to_iso_date(
-                data.get("expiration_date")),
+            version_creation_date=data.get("version_creation_date"),
+            last_update=data.get("last_update"),
+            creation_date=data.get("creation_date"),
+            expiration_date=data.get("expiration_date"),
             description=data.get("description"),
             size=data.get("size"),
             format=data.get("format"),
@@ -0,0 +1,273 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from azure.cosmos import exceptions
+from cosmos_db_service import CosmosDBService
+from foundry_service import FoundryService
+from data_models import embedding_to_wire
+from embedding_profiles import EmbeddingProfiles, profiles_container_name
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# The fields of the stored text each crawler embeds, joined by blank lines
+embedding_texts = {
+    "github-repos": ["description"],
+    "blog-posts": ["title", "description"],
+    "seismic-contents": ["name"],
+}
+
+
+class EmbeddingBackfill:
+    """Re-embeds the stored text of a container's items for its migration's shadow spec.
+
+    Items are read in pages ordered by id, and their summaries, not their
+    sources, are embedded again in batches by a bounded number of workers, so
+    a migration needs no crawl and no summarization. The last id written is
+    checkpointed after each page, so a stopped backfill resumes where it was.
+    A pass ends with the items written during it, which later passes catch up
+    on, until none are left and the container can be cut over.
+
+    Vectors go to a shadow field of the items, patched only if the item did not
+    change since it was read, or to copies of the items in a shadow container.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 foundry_service: FoundryService,
+                 container_name: str,
+                 batch_size: int = 64,
+                 workers: int = 4,
+                 page_size: int = 1000,
+                 max_passes: int = 5):
+        self.cosmos_db_service = cosmos_db_service
+        self.foundry_service = foundry_service
+        self.container_name = container_name
+        self.text_fields = embedding_texts[container_name]
+        self.batch_size = batch_size
+        self.workers = workers
+        self.page_size = page_size
+        self.max_passes = max_passes
+        self.profiles = EmbeddingProfiles(cosmos_db_service)
+
+    def get_spec(self) -> dict:
+        spec = self.profiles.read(self.container_name).get("shadow")
+        if not spec:
+            raise ValueError(f"{self.container_name} has no migration, start one first")
+        return spec
+
+    def checkpoint_id(self, spec: dict) -> str:
+        target = spec.get("container") or self.container_name
+        return f"backfill-{self.container_name}-{target}-{spec['field']}-{spec['model']}-{spec['dimensions']}"
+
+    def load_checkpoint(self, spec: dict) -> dict:
+        checkpoint = self.cosmos_db_service.read_item(
+            item_id=self.checkpoint_id(spec), container_name=profiles_container_name)
+        return checkpoint or {
+            "id": self.checkpoint_id(spec),
+            "container": self.container_name,
+            "spec": spec,
+            "pass": 1,
+            "after": "",
+            # Leave a minute for clock skew with Cosmos DB's _ts
+            "pass_started_ts": int(time.time()) - 60,
+            "previous_pass_started_ts": None,
+            "embedded": 0,
+            "skipped": 0,
+            "failed": 0,
+            "pass_failed": 0,
+            "completed": False,
+        }
+
+    def save_checkpoint(self, checkpoint: dict) -> None:
+        checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.cosmos_db_service.upsert_item(item=checkpoint, container_name=profiles_container_name)
+
+    def pending_clause(self, spec: dict, checkpoint: dict) -> Tuple[str, list]:
+        """Return the condition of the items a pass still has to write."""
+        if not spec.get("container"):
+            return f"NOT IS_DEFINED(c.{spec['field']})", []
+        if checkpoint["previous_pass_started_ts"] is None:
+            # The first pass, or one after failures, copies every item
+            return "true", []
+        # Copies are up to date unless the item was written since the previous pass started
+        return "c._ts >= @since", [{"name": "@since", "value": checkpoint["previous_pass_started_ts"]}]
+
+    def fetch_page(self, spec: dict, checkpoint: dict) -> List[dict]:
+        clause, parameters = self.pending_clause(spec, checkpoint)
+        fields = "*" if spec.get("container") else \
+            ", ".join(["c.id", "c._etag"] + [f"c.{field}" for field in self.text_fields])
+        # Near duplicates are stored without an embedding and need none
+        return self.cosmos_db_service.query_items(
+            query=f"SELECT TOP @page_size {fields} FROM c "
+                  f"WHERE IS_ARRAY(c.embedding) AND c.id > @after AND {clause} ORDER BY c.id",
+            container_name=self.container_name,
+            parameters=[{"name": "@page_size", "value": self.page_size},
+                        {"name": "@after", "value": checkpoint["after"]}, *parameters])
+
+    def count_pending(self, spec: dict, checkpoint: dict) -> int:
+        """Count the items the next pass has to write."""
+        if spec.get("container"):
+            # Failed copies are not found by their _ts
+            clause, parameters = "c._ts >= @since", [{"name": "@since", "value": checkpoint["pass_started_ts"]}]
+        else:
+            clause, parameters = self.pending_clause(spec, checkpoint)
+        result = self.cosmos_db_service.query_items(
+            query=f"SELECT VALUE COUNT(1) FROM c WHERE IS_ARRAY(c.embedding) AND {clause}",
+            container_name=self.container_name,
+            parameters=parameters)
+        return (result[0] if result else 0) + (checkpoint["pass_failed"] if spec.get("container") else 0)
+
+    def text(self, item: dict) -> str:
+        return "\n\n".join(item.get(field) or "" for field in self.text_fields).strip()
+
+    def write_batch(self, spec: dict, items: List[dict]) -> dict:
+        """Embed a batch of items in one request and write their vectors."""
+        counts = {"embedded": 0, "skipped": 0, "failed": 0}
+        try:
+            texts = [self.text(item) for item in items]
+            # Items without text get an empty vector, as the crawlers store them
+            embeddings = iter(self.foundry_service.generate_embeddings(
+                [text for text in texts if text], model=spec["model"], dimensions=spec["dimensions"]))
+            vectors = [embedding_to_wire(next(embeddings)) if text else [] for text in texts]
+        except Exception as e:
+            logger.error(f"Error embedding {len(items)} items of {self.container_name}: {e}")
+            counts["failed"] = len(items)
+            return counts
+
+        for item, vector in zip(items, vectors):
+            try:
+                if spec.get("container"):
+                    copy = {key: value for key, value in item.items() if not key.startswith("_")}
+                    copy[spec["field"]] = vector
+                    self.cosmos_db_service.upsert_item(item=copy, container_name=spec["container"])
+                else:
+                    self.cosmos_db_service.patch_item(
+                        item_id=item["id"], fields={spec["field"]: vector},
+                        container_name=self.container_name, etag=item["_etag"])
+                counts["embedded"] += 1
+            except exceptions.CosmosAccessConditionFailedError:
+                # Written by a crawler since it was read; it wrote the shadow field, or the next pass does
+                counts["skipped"] += 1
+            except Exception as e:
+                logger.error(f"Error writing the embedding of item {item['id']}: {e}")
+                counts["failed"] += 1
+        return counts
+
+    def run(self, max_seconds: Optional[float] = None) -> dict:
+        """Backfill from the checkpoint until done, or until max_seconds have passed."""
+        spec = self.get_spec()
+        checkpoint = self.load_checkpoint(spec)
+        if checkpoint["completed"]:
+            logger.info(f"Backfill of {self.container_name} to {spec} already completed")
+            return checkpoint
+        started = time.monotonic()
+        logger.info(f"Backfill of {self.container_name} to {spec} from pass {checkpoint['pass']}, "
+                    f"after id '{checkpoint['after']}'")
+
+        passes = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Items failing every time do not keep a run going
+            while passes < self.max_passes:
+                if max_seconds is not None and time.monotonic() - started > max_seconds:
+                    logger.info(f"Backfill of {self.container_name} stopped after {max_seconds:.0f}s, "
+                                f"resumes after id '{checkpoint['after']}'")
+                    break
+
+                page = self.fetch_page(spec, checkpoint)
+                if page:
+                    batches = [page[start:start + self.batch_size]
+                               for start in range(0, len(page), self.batch_size)]
+                    for counts in executor.map(lambda batch: self.write_batch(spec, batch), batches):
+                        for key, value in counts.items():
+                            checkpoint[key] += value
+                        checkpoint["pass_failed"] += counts["failed"]
+                    # The whole page is written, so the backfill resumes after it
+                    checkpoint["after"] = page[-1]["id"]
+                    self.save_checkpoint(checkpoint)
+                    logger.info(f"Backfill of {self.container_name}: pass {checkpoint['pass']}, "
+                                f"{checkpoint['embedded']} embedded, {checkpoint['skipped']} skipped, "
+                                f"{checkpoint['failed']} failed")
+                    continue
+
+                # End of a pass: catch up on what was written or failed during it
+                pending = self.count_pending(spec, checkpoint)
+                if pending == 0:
+                    checkpoint["completed"] = True
+                    checkpoint["completed_at"] = datetime.now(timezone.utc).isoformat()
+                    self.save_checkpoint(checkpoint)
+                    logger.info(f"Backfill of {self.container_name} completed, ready to cut over")
+                    break
+                logger.info(f"Backfill of {self.container_name}: {pending} items left after pass {checkpoint['pass']}")
+                checkpoint.update({
+                    "pass": checkpoint["pass"] + 1,
+                    "after": "",
+                    "previous_pass_started_ts": None if checkpoint["pass_failed"] else checkpoint["pass_started_ts"],
+                    "pass_started_ts": int(time.time()) - 60,
+                    "pass_failed": 0,
+                })
+                self.save_checkpoint(checkpoint)
+                passes += 1
+        return checkpoint
+
+    def status(self) -> dict:
+        spec = self.get_spec()
+        checkpoint = self.load_checkpoint(spec)
+        return {**checkpoint, "pending": self.count_pending(spec, checkpoint)}
+
+    def cut_over(self, force: bool = False) -> dict:
+        """Switch the container's vector search to the backfilled spec, once the backfill completed."""
+        spec = self.get_spec()
+        checkpoint = self.load_checkpoint(spec)
+        if not force and not checkpoint["completed"]:
+            raise ValueError(f"The backfill of {self.container_name} has not completed")
+        return self.profiles.cut_over(self.container_name)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("azure.cosmos").setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(
+        description="Re-embed the items of a container for an embedding model migration.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    start_parser = subparsers.add_parser("start", help="Set the spec to migrate to")
+    start_parser.add_argument("--model", required=True)
+    start_parser.add_argument("--dimensions", type=int, default=1536)
+    start_parser.add_argument("--field", default="embedding_next")
+    start_parser.add_argument("--target-container", help="Write copies of the items to this container")
+    run_parser = subparsers.add_parser("run", help="Backfill from the checkpoint")
+    run_parser.add_argument("--batch-size", type=int, default=64)
+    run_parser.add_argument("--workers", type=int, default=4)
+    run_parser.add_argument("--max-seconds", type=float)
+    subparsers.add_parser("status", help="Show the checkpoint and the items left")
+    cutover_parser = subparsers.add_parser("cutover", help="Switch vector search to the new spec")
+    cutover_parser.add_argument("--force", action="store_true", help="Cut over before the backfill completed")
+    subparsers.add_parser("finish", help="Stop writing the previous spec, which rules out rolling back")
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("container", choices=sorted(embedding_texts))
+    args = parser.parse_args()
+
+    cosmos_db_service = CosmosDBService()
+    if args.command == "start":
+        spec = {"model": args.model, "dimensions": args.dimensions, "field": args.field}
+        if args.target_container:
+            spec["container"] = args.target_container
+        print(EmbeddingProfiles(cosmos_db_service).start_migration(args.container, spec))
+    elif args.command == "finish":
+        print(EmbeddingProfiles(cosmos_db_service).finish_migration(args.container))
+    else:
+        backfill = EmbeddingBackfill(cosmos_db_service, FoundryService(), args.container,
+                                     **({"batch_size": args.batch_size, "workers": args.workers}
+                                        if args.command == "run" else {}))
+        if args.command == "run":
+            print(backfill.run(args.max_seconds))
+        elif args.command == "status":
+            print(backfill.status())
+        else:
+            print(backfill.cut_over(args.force))
@@ -0,0 +1,152 @@
+import logging
+from typing import Dict, List, Optional
+from azure.cosmos import exceptions
+from cosmos_db_service import CosmosDBService
+from foundry_service import FoundryService
+from data_models import embedding_to_wire
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# CosmosDB configuration
+profiles_container_name = "embedding-profiles"
+
+# What the crawlers embed and where they store it, unless a profile says otherwise
+default_profile = {"model": "text-embedding-3-small", "dimensions": 1536, "field": "embedding"}
+
+
+def profile_id(container_name: str) -> str:
+    return f"profile-{container_name}"
+
+
+class EmbeddingProfiles:
+    """The embedding model, dimensions and location each container's vector search uses.
+
+    A container's profile document has an active spec, which hybrid_search
+    queries, and during a migration a shadow spec that the backfill fills. A
+    spec stores its vectors in its field of the container's items, or in its
+    field of copies of them in another container. Cutting over swaps the two
+    specs in one write, so the app switches model and location at once.
+
+    The crawlers keep writing their default embedding, and also write the
+    embeddings of the active and shadow specs that differ from it, so that
+    items crawled during or after a migration need no backfill, and cutting
+    back stays possible. Their other writes, patches and deletes also go
+    through here, so the copies the app may be searching stay the same as the
+    items.
+    """
+
+    def __init__(self, cosmos_db_service: CosmosDBService):
+        self.cosmos_db_service = cosmos_db_service
+        self.profiles: Dict[str, dict] = {}
+
+    def read(self, container_name: str) -> dict:
+        """Read a container's profile; a container without one uses the default spec."""
+        profile = self.cosmos_db_service.read_item(
+            item_id=profile_id(container_name), container_name=profiles_container_name)
+        return profile or {"id": profile_id(container_name), "container": container_name,
+                           "active": dict(default_profile), "shadow": None}
+
+    def load(self, container_name: str) -> dict:
+        """Load a container's profile for the crawl; without profiles, only the default embedding is written."""
+        try:
+            self.profiles[container_name] = self.read(container_name)
+        except Exception as e:
+            logger.error(f"Error loading the embedding profile of {container_name}: {e}")
+            self.profiles.pop(container_name, None)
+        return self.profiles.get(container_name)
+
+    def extra_specs(self, container_name: str) -> List[dict]:
+        """Return the specs of a container's profile that the default embedding does not cover."""
+        profile = self.profiles.get(container_name)
+        if not profile:
+            return []
+        specs = [profile.get("active"), profile.get("shadow")]
+        return [spec for spec in specs
+                if spec and ({**default_profile, **spec} != default_profile or spec.get("container"))]
+
+    def copy_containers(self, container_name: str) -> List[str]:
+        """Return the containers that keep copies of a container's items, as its loaded profile says."""
+        return list(dict.fromkeys(spec["container"] for spec in self.extra_specs(container_name)
+                                  if spec.get("container")))
+
+    def upsert_item(self, item: dict, container_name: str, text: Optional[str] = None,
+                    foundry_service: Optional[FoundryService] = None) -> None:
+        """Upsert an item, with the embeddings of the extra specs of its container's profile.
+
+        Without text, e.g. for a near duplicate stored without an embedding,
+        the item is upserted to the copy containers as it is.
+        """
+        items = {container_name: item}
+        for spec in self.extra_specs(container_name):
+            target = spec.get("container") or container_name
+            target_item = items.setdefault(target, dict(item))
+            if text is not None:
+                target_item[spec["field"]] = embedding_to_wire(foundry_service.generate_embedding(
+                    text, model=spec["model"], dimensions=spec["dimensions"]))
+        for target, target_item in items.items():
+            self.cosmos_db_service.upsert_item(item=target_item, container_name=target)
+
+    def patch_item(self, item_id: str, fields: dict, container_name: str,
+                   etag: Optional[str] = None, remove: Optional[List[str]] = None) -> dict:
+        """Patch an item, and its copies in other containers.
+
+        The etag applies to the item only. Copies not made yet are skipped, as
+        the backfill copies the patched item with its new _ts.
+        """
+        patched = self.cosmos_db_service.patch_item(
+            item_id=item_id, fields=fields, container_name=container_name, etag=etag, remove=remove)
+        for target in self.copy_containers(container_name):
+            try:
+                self.cosmos_db_service.patch_item(
+                    item_id=item_id, fields=fields, container_name=target, remove=remove)
+            except exceptions.CosmosResourceNotFoundError:
+                continue
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code != 400 or not remove:
+                    raise
+                # A field to remove is missing from the copy, e.g. a copy made before the field was set
+                copy = self.cosmos_db_service.read_item(item_id=item_id, container_name=target) or {}
+                self.cosmos_db_service.patch_item(
+                    item_id=item_id, fields=fields, container_name=target,
+                    remove=[field for field in remove if field in copy])
+        return patched
+
+    def delete_item(self, item_id: str, container_name: str) -> bool:
+        """Delete an item and its copies in other containers. Returns False if the item did not exist."""
+        deleted = self.cosmos_db_service.delete_item(item_id=item_id, container_name=container_name)
+        for target in self.copy_containers(container_name):
+            self.cosmos_db_service.delete_item(item_id=item_id, container_name=target)
+        return deleted
+
+    def start_migration(self, container_name: str, spec: dict) -> dict:
+        """Set the shadow spec a backfill fills, e.g. a new model in a new field."""
+        self.cosmos_db_service.ensure_container(profiles_container_name)
+        profile = self.read(container_name)
+        if profile.get("shadow") and profile["shadow"] != spec:
+            raise ValueError(f"{container_name} is already migrating to {profile['shadow']}")
+        profile["shadow"] = spec
+        self.cosmos_db_service.upsert_item(item=profile, container_name=profiles_container_name)
+        return profile
+
+    def cut_over(self, container_name: str, keep_shadow: bool = True) -> dict:
+        """Make the shadow spec active in one write.
+
+        The previous active spec becomes the shadow, so the crawlers keep it
+        fresh and cutting over again rolls back.
+        """
+        profile = self.read(container_name)
+        if not profile.get("shadow"):
+            raise ValueError(f"{container_name} has no migration to cut over to")
+        profile["active"], profile["shadow"] = profile["shadow"], \
+            profile["active"] if keep_shadow else None
+        self.cosmos_db_service.upsert_item(item=profile, container_name=profiles_container_name)
+        logger.info(f"Cut {container_name} vector search over to {profile['active']}")
+        return profile
+
+    def finish_migration(self, container_name: str) -> dict:
+        """Drop the shadow spec, so the crawlers stop writing it and a new migration can start."""
+        profile = self.read(container_name)
+        profile["shadow"] = None
+        self.cosmos_db_service.upsert_item(item=profile, container_name=profiles_container_name)
+        return profile
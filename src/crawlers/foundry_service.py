@@ -1,8 +1,11 @@
+import base64
 import os
+import numpy as np
 from openai import AzureOpenAI
 from openai.types import CreateEmbeddingResponse
 import json
 import logging
+from typing import List, Optional
 
 # Configure logging
 logger = logging.getLogger("azure.functions")
@@ -28,6 +31,8 @@ class FoundryService:
             api_version=self.api_version,
             api_key=self.api_key
         )
+        # Clients of other embedding deployments, e.g. of a model being migrated to
+        self.embedding_clients = {self.embedding_model: self.embedding_client}
 
         self.chat_client = AzureOpenAI(
             azure_endpoint=self.endpoint,
@@ -36,18 +41,42 @@ class FoundryService:
             api_key=self.api_key
         )
 
-    def generate_embedding(self, text: str) -> list:
-        """Get the embedding for a given text."""
+    def get_embedding_client(self, model: str) -> AzureOpenAI:
+        """Return the client of an embedding deployment, named after its model."""
+        if model not in self.embedding_clients:
+            self.embedding_clients[model] = AzureOpenAI(
+                azure_endpoint=self.endpoint,
+                azure_deployment=model,
+                api_version=self.api_version,
+                api_key=self.api_key
+            )
+        return self.embedding_clients[model]
+
+    def generate_embedding(self, text: str, model: Optional[str] = None,
+                           dimensions: int = 1536) -> np.ndarray:
+        """Get the embedding for a given text as a float32 buffer."""
         if not text:
+            return np.empty(0, dtype=np.float32)
+        embeddings = self.generate_embeddings([text], model, dimensions)
+        return embeddings[0] if embeddings else np.empty(0, dtype=np.float32)
+
+    def generate_embeddings(self, texts: List[str], model: Optional[str] = None,
+                            dimensions: int = 1536) -> List[np.ndarray]:
+        """Get the embeddings for several texts in one batched request, as float32 buffers."""
+        if not texts:
             return []
-
-        response: CreateEmbeddingResponse = self.embedding_client.embeddings.create(
-            input=text,
-            model=self.embedding_model,
-            encoding_format="float",
-            dimensions=1536,
+        model = model or self.embedding_model
+
+        # Base64 decodes straight into the buffer, without a list of boxed floats
+        response: CreateEmbeddingResponse = self.get_embedding_client(model).embeddings.create(
+            input=texts,
+            model=model,
+            encoding_format="base64",
+            dimensions=dimensions,
         )
-        return response.data[0].embedding if response.data else []
+        # The response items carry the index of their input
+        return [np.frombuffer(base64.b64decode(item.embedding), dtype="<f4").astype(np.float32)
+                for item in sorted(response.data, key=lambda item: item.index)]
 
     def summarize_and_generate_tags(self, text: str) -> tuple:
         """Summarize the given text using a GPT model and extract tags.
@@ -19,32 +19,66 @@ cosmos_db_service = CosmosDBService()
 foundry_service = FoundryService()
 
 
-@app.timer_trigger(schedule="0 0 0 * * *",  # Run every day at midnight
+@app.timer_trigger(schedule="0 0 * * * *",  # Run every hour, for the organizations due
                    arg_name="timer_request",
                    run_on_startup=False,
                    use_monitor=False)
 def github_crawler_func(timer_request: func.TimerRequest) -> None:
     logging.info('GitHub crawler function started.')
     from github_crawler import GitHubCrawler
+    from crawl_scheduler import CrawlScheduler
     github_crawler = GitHubCrawler(cosmos_db_service=cosmos_db_service,
-                                   foundry_service=foundry_service)
+                                   foundry_service=foundry_service,
+                                   scheduler=CrawlScheduler(cosmos_db_service, "github"))
     github_crawler.run()
     logging.info('GitHub crawler function finished.')
 
 
-@app.timer_trigger(schedule="0 0 0 * * *",  # Run every day at midnight
+@app.timer_trigger(schedule="0 30 * * * *",  # Run every hour, for the feeds due
                    arg_name="timer_request",
                    run_on_startup=False,
                    use_monitor=False)
 def blogs_crawler_func(timer_request: func.TimerRequest) -> None:
     logging.info('Blogs crawler function started.')
     from blogs_crawler import BlogsCrawler
+    from crawl_scheduler import CrawlScheduler
+    # Feeds only list their latest posts, so each is crawled at least daily
     blogs_crawler = BlogsCrawler(cosmos_db_service=cosmos_db_service,
-                                 foundry_service=foundry_service)
+                                 foundry_service=foundry_service,
+                                 scheduler=CrawlScheduler(cosmos_db_service, "blogs",
+                                                          max_interval_hours=24))
     blogs_crawler.run()
     logging.info('Blogs crawler function finished.')
 
 
+@app.timer_trigger(schedule="0 0 3 * * 0",  # Run every Sunday at 3 AM, after the crawlers
+                   arg_name="timer_request",
+                   run_on_startup=False,
+                   use_monitor=False)
+def index_hygiene_func(timer_request: func.TimerRequest) -> None:
+    logging.info('Index hygiene function started.')
+    from github_crawler import GitHubCrawler
+    from index_hygiene import IndexHygiene
+    github_crawler = GitHubCrawler(cosmos_db_service=cosmos_db_service,
+                                   foundry_service=foundry_service)
+    index_hygiene = IndexHygiene(cosmos_db_service=cosmos_db_service,
+                                 github_crawler=github_crawler)
+    index_hygiene.run()
+    logging.info('Index hygiene function finished.')
+
+
+@app.timer_trigger(schedule="0 0 2 * * *",  # Run every night at 2 AM
+                   arg_name="timer_request",
+                   run_on_startup=False,
+                   use_monitor=False)
+def related_content_func(timer_request: func.TimerRequest) -> None:
+    logging.info('Related content function started.')
+    from related_content import RelatedContent
+    related_content = RelatedContent(cosmos_db_service=cosmos_db_service)
+    related_content.run()
+    logging.info('Related content function finished.')
+
+
 # @app.timer_trigger(schedule="0 0 0 1 1 *",  # Run every year on January 1st
 #                    arg_name="timer_request",
 #                    run_on_startup=False,
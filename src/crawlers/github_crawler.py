@@ -1,14 +1,22 @@
 
 import os
 import logging
-import time
+import threading
 import requests
-from typing import List
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+from azure.cosmos import exceptions
 from data_models import RepositoryInfo
 from cosmos_db_service import CosmosDBService
 from foundry_service import FoundryService
+from text_preprocessor import TextPreprocessor
+from near_duplicates import NearDuplicateIndex
+from github_rate_limiter import GitHubRateLimiter, GitHubRateLimitError, github_rate_limiter
+from crawl_scheduler import CrawlScheduler
+from embedding_profiles import EmbeddingProfiles
+from crawl_pipeline import CrawlPipeline
 import json
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 
 # Configure logging
 logging.getLogger().setLevel(logging.INFO)
@@ -28,57 +36,265 @@ github_organizations = [
 # CosmosDB configuration
 cosmosdb_container_name = "github-repos"
 
+# Fields that change without a push, refreshed without re-summarizing or re-embedding
+metadata_fields = ["updated_at", "stars_count", "archived"]
+
+readme_filenames = [
+    "README.md", "readme.md",
+    "README.text", "readme.text",
+    "README.txt", "readme.txt",
+    # "README", "readme"
+]
+
+graphql_url = "https://api.github.com/graphql"
+
+# GitHub returns at most 100 nodes per connection
+graphql_page_size = 100
+
+repositories_query = """
+query($organization: String!, $pageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining resetAt }
+  organization(login: $organization) {
+    repositories(first: $pageSize, after: $cursor, privacy: PUBLIC,
+                 orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId name url description updatedAt pushedAt stargazerCount isArchived
+        defaultBranchRef { name }
+      }
+    }
+  }
+}
+"""
+
 
 class GitHubCrawler:
     """GitHub Crawler to fetch repositories and their README files."""
 
     def __init__(self,
                  cosmos_db_service: CosmosDBService,
-                 foundry_service: FoundryService):
-        """Initialize the GitHub Crawler."""
+                 foundry_service: FoundryService,
+                 use_graphql: Optional[bool] = None,
+                 rate_limiter: GitHubRateLimiter = github_rate_limiter,
+                 workers: int = 4,
+                 queue_size: int = 20,
+                 scheduler: Optional[CrawlScheduler] = None):
+        """Initialize the GitHub Crawler.
+
+        The GraphQL API needs a token, so it is used by default when GH_PAT is set.
+        workers is the number of threads of the README, summarization and embedding
+        stages, and queue_size bounds the repositories waiting between stages.
+        With a scheduler, only the organizations it has due are crawled, each for
+        the repositories updated since its previous crawl.
+        """
         self.cosmos_db_service = cosmos_db_service
         self.foundry_service = foundry_service
+        self.text_preprocessor = TextPreprocessor()
+        self.near_duplicates = NearDuplicateIndex()
+        self.embedding_profiles = EmbeddingProfiles(cosmos_db_service)
+        self.use_graphql = bool(os.getenv("GH_PAT")) if use_graphql is None else use_graphql
+        # One session keeps the connections to GitHub open across requests
+        self.session = requests.Session()
+        self.api_calls = {"rest": 0, "raw": 0, "graphql": 0, "graphql_cost": 0}
+        self.rate_limiter = rate_limiter
+        self.workers = workers
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.pipeline_stats: Dict[str, dict] = {}
+        # Repositories summarized but not written yet, that clones wait for before linking to them
+        self.in_flight: Dict[str, threading.Event] = {}
+        self.scheduler = scheduler
+
+    def count_call(self, api: str, count: int = 1) -> None:
+        with self.lock:
+            self.api_calls[api] += count
+
+    def count_requests(self) -> int:
+        with self.lock:
+            return self.api_calls["rest"] + self.api_calls["raw"] + self.api_calls["graphql"]
+
+    def listing_cutoff(self, since: Optional[datetime]) -> datetime:
+        """Return the update time at which the listing stops: today's start by default.
+
+        GitHub's times are parsed as naive UTC, so is the cutoff.
+        """
+        if since is None:
+            return datetime.strptime(date.today().isoformat(), "%Y-%m-%d")
+        return since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def github_request(self, method: str, url: str, resource: str, **kwargs) -> requests.Response:
+        """Send a GitHub API request when its rate limit allows, retrying when GitHub throttles it.
+
+        A waiting request only holds up its own pipeline stage, the other stages keep running.
+        """
+        while True:
+            self.rate_limiter.acquire(resource)
+            response = self.session.request(method, url, **kwargs)
+            if not self.rate_limiter.record_response(resource, response):
+                return response
+
+    def graphql(self, query: str, variables: Optional[dict] = None) -> Optional[dict]:
+        """Run a GraphQL query, accounting for its rate limit cost.
+
+        Returns the data, which can be partial if some fields failed, or None.
+        """
+        while True:
+            response = self.github_request(
+                "POST", graphql_url, "graphql",
+                json={"query": query, "variables": variables or {}},
+                headers={
+                    'User-Agent': 'GitHubCrawler/1.0',
+                    'Authorization': f'bearer {os.getenv("GH_PAT")}',
+                })
+            self.count_call("graphql")
+            if response.status_code != 200:
+                logger.error(f"GitHub GraphQL request failed: {response.status_code}")
+                return None
+
+            body = response.json()
+            errors = body.get("errors") or []
+            # An exhausted GraphQL budget is an error of a successful response
+            if any(error.get("type") == "RATE_LIMITED" for error in errors):
+                continue
+            break
+
+        for error in errors:
+            logger.warning(f"GitHub GraphQL error: {error.get('message')}")
+        data = body.get("data")
+        rate_limit = (data or {}).get("rateLimit")
+        if rate_limit:
+            self.count_call("graphql_cost", rate_limit["cost"])
+            logger.info(
+                f"GitHub GraphQL query cost {rate_limit['cost']}, "
+                f"{rate_limit['remaining']} points remaining until {rate_limit['resetAt']}")
+        return data
+
+    def iter_org_repositories_graphql(self, organization: str, full_listing: bool = False,
+                                      since: Optional[datetime] = None) -> Iterator[RepositoryInfo]:
+        """Fetch repositories for a given organization, 100 per GraphQL query."""
+
+        logger.info(f"Fetching repositories for organization with GraphQL: {organization}")
+        cutoff_dt = self.listing_cutoff(since)
+        cursor = None
+
+        while True:
+            data = self.graphql(repositories_query, {
+                "organization": organization,
+                "pageSize": graphql_page_size,
+                "cursor": cursor,
+            })
+            if not data or not data.get("organization"):
+                logger.error(f"Failed to fetch repositories for {organization} with GraphQL")
+                break
+
+            repositories = data["organization"]["repositories"]
+            for repo in repositories["nodes"]:
+                # Results are sorted by update, so the first older repository ends the listing
+                repo_updated = datetime.strptime(repo["updatedAt"], "%Y-%m-%dT%H:%M:%SZ")
+                if not full_listing and repo_updated < cutoff_dt:
+                    logger.info(
+                        "Encountered repo older than cutoff date. Stopping pagination.")
+                    return
+
+                yield RepositoryInfo(
+                    id=str(repo["databaseId"]),
+                    organization=organization,
+                    name=repo["name"],
+                    description=repo.get("description"),
+                    url=repo["url"],
+                    updated_at=repo["updatedAt"],
+                    stars_count=repo["stargazerCount"],
+                    archived=repo["isArchived"],
+                    pushed_at=repo.get("pushedAt"),
+                    default_branch=(repo.get("defaultBranchRef") or {}).get("name")
+                )
 
-    def fetch_org_repositories(self, organization: str) -> List[RepositoryInfo]:
-        """Fetch repositories for a given organization from GitHub API in a paginated manner."""
+            logger.info(
+                f"Fetched {len(repositories['nodes'])} repositories from {organization} with GraphQL")
+            if not repositories["pageInfo"]["hasNextPage"]:
+                break
+            cursor = repositories["pageInfo"]["endCursor"]
+
+    def readmes_query(self, organization: str, repos: List[RepositoryInfo]) -> str:
+        """Build a query for the README blobs of several repositories, one alias per repository."""
+        blobs = " ".join(
+            f'readme{index}: object(expression: "HEAD:{filename}") {{ ... on Blob {{ text }} }}'
+            for index, filename in enumerate(readme_filenames))
+        # Repository names are safe GraphQL strings once JSON-quoted
+        repositories = " ".join(
+            f'repo{index}: repository(owner: {json.dumps(organization)}, name: {json.dumps(repo.name)}) '
+            f'{{ {blobs} }}'
+            for index, repo in enumerate(repos))
+        return f"query {{ rateLimit {{ cost remaining resetAt }} {repositories} }}"
+
+    def fetch_readmes_graphql(self, organization: str, repos: List[RepositoryInfo]) -> Dict[str, str]:
+        """Fetch the README text of the default branch of up to 100 repositories per query.
+
+        Returns the README (empty if there is none) by repository id. Repositories
+        of failed queries, or of queries the GraphQL rate limit left unsent, are
+        left out, so their README is fetched the REST way.
+        """
+        readmes: Dict[str, str] = {}
+        batches = [repos[start:start + graphql_page_size]
+                   for start in range(0, len(repos), graphql_page_size)]
+        while batches:
+            batch = batches.pop()
+            try:
+                data = self.graphql(self.readmes_query(organization, batch))
+            except GitHubRateLimitError as e:
+                logger.warning(f"Fetching {sum(map(len, batches)) + len(batch)} READMEs the REST way: {e}")
+                break
+            if data is None:
+                # Large READMEs can time the query out, retry in halves
+                if len(batch) > 1:
+                    middle = len(batch) // 2
+                    batches.extend([batch[:middle], batch[middle:]])
+                continue
+
+            for index, repo in enumerate(batch):
+                blobs = data.get(f"repo{index}") or {}
+                readmes[repo.id] = next(
+                    (blob["text"] for blob in blobs.values() if blob and blob.get("text")), "")
+        return readmes
+
+    def fetch_org_repositories(self, organization: str, full_listing: bool = False,
+                               since: Optional[datetime] = None) -> List[RepositoryInfo]:
+        """Fetch repositories for a given organization from GitHub API in a paginated manner.
+
+        By default only repositories updated today, or since a given time, are
+        fetched. A full listing fetches every repository, e.g. to find the ones
+        that disappeared.
+        """
+        return list(self.iter_org_repositories(organization, full_listing, since))
+
+    def iter_org_repositories(self, organization: str, full_listing: bool = False,
+                              since: Optional[datetime] = None) -> Iterator[RepositoryInfo]:
+        """Yield the repositories of an organization page by page, as fetch_org_repositories lists them."""
+        if self.use_graphql:
+            yield from self.iter_org_repositories_graphql(organization, full_listing, since)
+            return
 
         logger.info(f"Fetching repositories for organization: {organization}")
 
         # Fetch repositories for the organization in paginated manner
         page = 1
         page_size = 100  # Increased page size for efficiency
-        org_repos: List[RepositoryInfo] = []
         #cutoff_dt = datetime.strptime("2025-08-01", "%Y-%m-%d")
-        current_date_str = date.today().isoformat()
-        cutoff_dt = datetime.strptime(current_date_str, "%Y-%m-%d")
+        cutoff_dt = self.listing_cutoff(since)
 
         headers = {
             'User-Agent': 'GitHubCrawler/1.0',
             'Accept': 'application/vnd.github.v3+json',
-            # 'Authorization': f'token {os.getenv("GH_PAT")}'
         }
+        # Authenticated requests get a much higher rate limit, which full listings need
+        if os.getenv("GH_PAT"):
+            headers['Authorization'] = f'token {os.getenv("GH_PAT")}'
 
         while True:  # Pagination loop
             url = f"https://api.github.com/orgs/{organization}/repos?type=public&per_page={page_size}&page={page}&sort=updated&direction=desc"
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 403:
-                # Check for rate limit
-                remaining = response.headers.get("X-RateLimit-Remaining")
-                reset = response.headers.get("X-RateLimit-Reset")
-                if remaining == "0" and reset:
-                    reset_time = int(reset)
-                    wait_seconds = max(reset_time - int(time.time()), 1)
-                    logger.warning(
-                        f"Rate limit reached for {organization}. Waiting {wait_seconds} seconds before retrying."
-                    )
-                    time.sleep(wait_seconds)
-                    continue  # Retry the same page after sleeping
-                else:
-                    logger.error(
-                        f"Failed to fetch repositories for {organization}: {response.status_code} (possibly forbidden)"
-                    )
-                    break
+            # Rate limits are paced and retried by the rate limiter
+            response = self.github_request("GET", url, "core", headers=headers)
+            self.count_call("rest")
 
             if response.status_code != 200:
                 logger.error(
@@ -98,7 +314,7 @@ class GitHubCrawler:
                 repo_updated = datetime.strptime(
                     repo["updated_at"], "%Y-%m-%dT%H:%M:%SZ")
 
-                if repo_updated < cutoff_dt:
+                if not full_listing and repo_updated < cutoff_dt:
                     logger.info(
                         "Encountered repo older than cutoff date. Stopping pagination.")
                     stop_pagination = True
@@ -113,9 +329,11 @@ class GitHubCrawler:
                     url=repo['html_url'],
                     updated_at=repo['updated_at'],
                     stars_count=repo['stargazers_count'],
-                    archived=repo['archived']
+                    archived=repo['archived'],
+                    pushed_at=repo.get('pushed_at'),
+                    default_branch=repo.get('default_branch')
                 )
-                org_repos.append(repo_info)
+                yield repo_info
 
             logger.info(
                 f"Fetched {len(repos)} repositories from {organization} (Page {page})")
@@ -124,29 +342,20 @@ class GitHubCrawler:
                 break
 
             page += 1
-            time.sleep(0.5)  # Rate limiting
 
             # If we got fewer repos than the page size, we've reached the end
             # if len(repos) < page_size:
             #     break
 
-        return org_repos
-
     def generate_readme_urls(self, repo: RepositoryInfo) -> list:
         """
         Generate possible README file URLs for a given repository.
         """
-        branches = ["master", "main"]
-        filenames = [
-            "README.md", "readme.md",
-            "README.text", "readme.text",
-            "README.txt", "readme.txt",
-            # "README", "readme"
-        ]
+        branches = [repo.default_branch] if repo.default_branch else ["master", "main"]
         urls = [
             f"https://raw.githubusercontent.com/{repo.organization}/{repo.name}/refs/heads/{branch}/{filename}"
             for branch in branches
-            for filename in filenames
+            for filename in readme_filenames
         ]
         return urls
 
@@ -161,7 +370,8 @@ class GitHubCrawler:
         }
 
         for url in readme_urls:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
+            self.count_call("raw")
             if response.status_code == 200:
                 readme_content = response.text
                 break  # Stop after first successful fetch
@@ -171,75 +381,276 @@ class GitHubCrawler:
                 f"No README found for {repo.name} in {repo.organization}")
         return readme_content or ""
 
-    def process_repository(self, repo: RepositoryInfo) -> None:
-        """Process a repository: fetch README, generate embeddings, and save to CosmosDB."""
+    def link_duplicate(self, repo: RepositoryInfo, canonical_id: str) -> bool:
+        """Save a template clone with the canonical repository's summary and no embedding.
 
+        Returns False if the canonical repository no longer exists.
+        """
+        canonical = self.cosmos_db_service.read_item(
+            item_id=canonical_id, container_name=cosmosdb_container_name)
+        if not canonical:
+            return False
+        repo.description = canonical.get("description")
+        repo.tags = canonical.get("tags")
+        repo.canonical_id = canonical_id
+        # Also replacing its copies, which the app may be searching
+        self.embedding_profiles.upsert_item(
+            item=repo.to_dict(),
+            container_name=cosmosdb_container_name
+        )
+        logger.info(
+            f"Repository {repo.organization}/{repo.name} is a near duplicate of {canonical.get('url')}")
+        return True
+
+    def fetch_readme_stage(self, repo: RepositoryInfo) -> tuple:
+        return repo, self.fetch_readme_content(repo)
+
+    def fetch_readmes_stage(self, organization: str, repos: List[RepositoryInfo]) -> List[tuple]:
+        """Fetch the READMEs of a batch of repositories with one GraphQL query."""
+        readmes = self.fetch_readmes_graphql(organization, repos)
+        return [(repo, readmes[repo.id] if repo.id in readmes else self.fetch_readme_content(repo))
+                for repo in repos]
+
+    def summarize_repository(self, work: tuple) -> Optional[RepositoryInfo]:
+        """Summarize a repository from its README, or link it to the repository it duplicates."""
+        repo, readme_content = work
+
+        # Generate description for the repository, from the README's text without badges and code
+        context = self.text_preprocessor.prepare(
+            f"{repo.description or ''}\n\n{readme_content}")
+        tokens = self.text_preprocessor.count_tokens(context)
+
+        # Template clones are linked to the first repository instead of summarized again
+        with self.lock:
+            canonical_id, repo.minhash = self.near_duplicates.check(repo.id, context, tokens=tokens)
+            if not canonical_id and repo.minhash:
+                # Index it right away, so clones summarized at the same time link to it
+                self.near_duplicates.add(repo.id, self.near_duplicates.from_wire(repo.minhash))
+                self.in_flight[repo.id] = threading.Event()
+            written = self.in_flight.get(canonical_id) if canonical_id else None
+        if written:
+            written.wait(timeout=120)
         try:
-            # Fetch README content for the repository
-            readme_content = self.fetch_readme_content(repo)
+            if canonical_id and self.link_duplicate(repo, canonical_id):
+                return None
 
-            # Generate description for the repository
-            context = f"{repo.description}\n\n{readme_content}"
             summary, tags = self.foundry_service.summarize_and_generate_tags(
                 context)
-            repo.description = summary
-            repo.tags = tags
-
-            # Generate embedding for the repository
-            repo.embedding = self.foundry_service.generate_embedding(summary)
-
-            # Save repository to CosmosDB
-            self.cosmos_db_service.upsert_item(
+        except Exception:
+            self.release(repo.id, written=False)
+            raise
+        repo.description = summary
+        repo.tags = tags
+        return repo
+
+    def release(self, repo_id: str, written: bool) -> None:
+        """Wake the clones waiting for a repository to be written.
+
+        A repository that failed before it was written is taken out of the
+        MinHash index, so its clones are summarized instead of linked to it.
+        """
+        with self.lock:
+            event = self.in_flight.pop(repo_id, None)
+            if event and not written:
+                self.near_duplicates.remove(repo_id)
+        if event:
+            event.set()
+
+    def embed_repository(self, repo: RepositoryInfo) -> RepositoryInfo:
+        # Generate embedding for the repository
+        try:
+            repo.embedding = self.foundry_service.generate_embedding(repo.description)
+        except Exception:
+            self.release(repo.id, written=False)
+            raise
+        return repo
+
+    def write_repository(self, repo: RepositoryInfo) -> RepositoryInfo:
+        # Save repository to CosmosDB, with the embeddings of a model migration if there is one
+        try:
+            self.embedding_profiles.upsert_item(
                 item=repo.to_dict(),
-                container_name=cosmosdb_container_name
+                container_name=cosmosdb_container_name,
+                text=repo.description,
+                foundry_service=self.foundry_service
             )
+        except Exception:
+            self.release(repo.id, written=False)
+            raise
+        self.release(repo.id, written=True)
+        return repo
+
+    def process_repository(self, repo: RepositoryInfo, readme_content: Optional[str] = None) -> None:
+        """Process a repository: fetch README, generate embeddings, and save to CosmosDB."""
+
+        try:
+            # Fetch README content for the repository, unless it was fetched with GraphQL
+            if readme_content is None:
+                readme_content = self.fetch_readme_content(repo)
+            repo = self.summarize_repository((repo, readme_content))
+            if repo:
+                self.write_repository(self.embed_repository(repo))
 
         except Exception as e:
             logger.error(
                 f"Error processing repository {repo.organization}/{repo.name}: {e}")
 
-    def crawl_organization(self, organization: str) -> None:
-        """Main function to crawl an organization and save repositories to CosmosDB."""
+    def fetch_repository_states(self, organization: str) -> dict:
+        """Fetch the stored metadata and ETag of an organization's repositories, without their embeddings."""
+        items = self.cosmos_db_service.query_items(
+            query=f"SELECT c.id, c._etag, c.pushed_at, c.removed_at, c.{', c.'.join(metadata_fields)} "
+                  "FROM c WHERE c.organization = @organization",
+            container_name=cosmosdb_container_name,
+            parameters=[{"name": "@organization", "value": organization}])
+        return {item["id"]: item for item in items}
 
-        logger.info(f"Starting crawl for organization: {organization}")
-
-        # Fetch repositories for the organization
-        org_repos = self.fetch_org_repositories(organization)
-        if not org_repos:
-            logger.info(
-                f"No repositories found for organization: {organization}")
-            return
+    def refresh_metadata(self, repo: RepositoryInfo, state: dict) -> Optional[bool]:
+        """Patch the changed metadata of a repository that was not pushed to since it was processed.
 
-        # Save org_repos to a JSON file
-        # output_filename = f"{organization}_repos.json"
-        # with open(output_filename, "w", encoding="utf-8") as f:
-        #     json.dump([repo.to_dict() for repo in org_repos], f, ensure_ascii=False, indent=2)
-        # logger.info(f"Saved repository data to {output_filename}")
+        Returns True if the repository was patched, False if nothing changed,
+        None if the repository changed since its state was read.
+        """
+        changed = {field: getattr(repo, field) for field in metadata_fields
+                   if state.get(field) != getattr(repo, field)}
+        if not changed:
+            return False
 
-        # Load org_repos from a JSON file
-        # json_filename = f"{organization}_repos.json"
-        # with open(json_filename, "r", encoding="utf-8") as f:
-        #     repo_dicts = json.load(f)
-        #     org_repos = [RepositoryInfo(**repo_dict) for repo_dict in repo_dicts]
-        # logger.info(f"Loaded {len(org_repos)} repositories from {json_filename}")
+        try:
+            # Only apply if the document is still the one we read, and to its copies
+            self.embedding_profiles.patch_item(
+                item_id=repo.id,
+                fields=changed,
+                container_name=cosmosdb_container_name,
+                etag=state.get("_etag"))
+        except exceptions.CosmosAccessConditionFailedError:
+            logger.warning(
+                f"Repository {repo.organization}/{repo.name} changed while refreshing its metadata. "
+                "It will be refreshed on the next crawl.")
+            return None
+        return True
+
+    def crawl_organization(self, organization: str,
+                           since: Optional[datetime] = None) -> Optional[Tuple[List[str], List[str]]]:
+        """Main function to crawl an organization and save repositories to CosmosDB.
+
+        Listing, README fetching, summarization, embedding and writing run at the
+        same time as pipeline stages, connected by bounded queues. Returns the
+        update times of the repositories listed and of those that failed in a
+        stage, None if the listing stopped early.
+        """
 
-        logger.info(
-            f"Total repositories fetched for {organization}: {len(org_repos)}")
+        logger.info(f"Starting crawl for organization: {organization}")
 
-        # Process each repository
-        for repo in org_repos:
-            self.process_repository(repo)
-            time.sleep(0.1)  # Rate limiting
+        # Repositories not pushed to since they were processed only need a metadata patch
+        states = self.fetch_repository_states(organization)
+        patched = 0
+        changed_at: List[str] = []
+        # Update times of the repositories listed and not done yet, which failed once the pipeline ends
+        pending: Dict[str, str] = {}
+
+        def done(repo_id: str) -> None:
+            with self.lock:
+                pending.pop(repo_id, None)
+
+        def select(repo: RepositoryInfo) -> Optional[RepositoryInfo]:
+            nonlocal patched
+            changed_at.append(repo.updated_at)
+            with self.lock:
+                pending[repo.id] = repo.updated_at
+            state = states.get(repo.id)
+            if state and state.get("removed_at") and repo.archived:
+                # Tombstoned by the index hygiene job, leave it to expire
+                done(repo.id)
+                return None
+            if state and not state.get("removed_at") and repo.pushed_at \
+                    and state.get("pushed_at") == repo.pushed_at:
+                refreshed = self.refresh_metadata(repo, state)
+                if refreshed is not None:
+                    done(repo.id)
+                patched += bool(refreshed)
+                return None
+            return repo
+
+        def summarize(work: tuple) -> Optional[RepositoryInfo]:
+            repo = self.summarize_repository(work)
+            if repo is None:
+                # Linked as a near duplicate
+                done(work[0].id)
+            return repo
+
+        def write(repo: RepositoryInfo) -> RepositoryInfo:
+            self.write_repository(repo)
+            done(repo.id)
+            return repo
+
+        pipeline = CrawlPipeline(f"github-{organization}", queue_size=self.queue_size)
+        pipeline.add_stage("select", select)
+        if self.use_graphql:
+            # One query fetches the READMEs of up to 100 repositories
+            pipeline.add_stage("fetch", partial(self.fetch_readmes_stage, organization),
+                               batch_size=graphql_page_size)
+        else:
+            pipeline.add_stage("fetch", self.fetch_readme_stage, workers=self.workers)
+        pipeline.add_stage("summarize", summarize, workers=self.workers)
+        pipeline.add_stage("embed", self.embed_repository, workers=self.workers)
+        pipeline.add_stage("write", write, workers=2)
+
+        stats = pipeline.run(self.iter_org_repositories(organization, since=since))
+        self.pipeline_stats[organization] = stats
+        pipeline.log_stats()
+        if isinstance(pipeline.source_error, GitHubRateLimitError):
+            logger.warning(
+                f"Stopped listing {organization}: {pipeline.source_error}. It is crawled again on the next run.")
 
+        listed = stats["source_items"]
+        selected = stats["select"]["items_out"]
         logger.info(
-            f"Finished processing {len(org_repos)} repositories for organization: {organization}")
+            f"Finished processing {listed} repositories for organization: {organization} "
+            f"({stats['write']['items_out']} processed, {stats['summarize']['items_in'] - stats['summarize']['items_out']} "
+            f"linked as near duplicates, {patched} metadata patched, {listed - selected - patched} unchanged, "
+            f"{len(pending)} failed)")
+        return None if pipeline.source_error else (changed_at, list(pending.values()))
+
+    def get_stats(self) -> dict:
+        """Return the pipeline stats of the organizations crawled, by organization."""
+        return self.pipeline_stats
 
     def run(self):
         """Main function to run the GitHub crawler"""
         logger.info("GitHub crawler started.")
+        self.text_preprocessor.reset_stats()
+        self.near_duplicates.reset_stats()
+        try:
+            self.near_duplicates.load(self.cosmos_db_service, cosmosdb_container_name)
+        except Exception as e:
+            logger.error(f"Error loading repository signatures, only repositories of this run are compared: {e}")
+        self.embedding_profiles.load(cosmosdb_container_name)
+
+        organizations = github_organizations
+        scheduler = self.scheduler
+        if scheduler:
+            try:
+                scheduler.load()
+                organizations = scheduler.due_sources(github_organizations)
+            except Exception as e:
+                logger.error(f"Error loading the crawl schedule, crawling every organization: {e}")
+                scheduler = None
 
         # Crawl each organization
-        for org in github_organizations:
-            self.crawl_organization(org)
-
+        for org in organizations:
+            started_at = datetime.now(timezone.utc)
+            requests_before = self.count_requests()
+            crawled = self.crawl_organization(org, since=scheduler.since(org) if scheduler else None)
+            # An incomplete listing is resumed from the same point by the next crawl,
+            # and repositories that failed are listed again by it
+            if scheduler and crawled is not None:
+                changed_at, failed_at = crawled
+                scheduler.record(org, changed_at, self.count_requests() - requests_before,
+                                 now=started_at, failed_at=failed_at)
+
+        self.text_preprocessor.log_stats("GitHub crawler")
+        logger.info(f"GitHub API usage: {self.api_calls}, rate limiter: {self.rate_limiter.get_stats()}")
+        self.near_duplicates.log_stats("GitHub crawler")
+        if scheduler:
+            scheduler.log_stats()
         logger.info("GitHub crawler finished.")
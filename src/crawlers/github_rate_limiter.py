@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import deque
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# Secondary rate limits, in requests per minute, see
+# https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+points_per_minute = {"core": 900, "graphql": 2000}
+
+
+class GitHubRateLimitError(Exception):
+    """Raised when a request would have to wait longer than the crawl can afford."""
+
+    def __init__(self, resource: str, wait_seconds: float):
+        super().__init__(f"GitHub {resource} rate limit exhausted for {wait_seconds:.0f} seconds")
+        self.resource = resource
+        self.wait_seconds = wait_seconds
+
+
+class RateLimitBucket:
+    """Token bucket of one GitHub rate limit resource, fed by the X-RateLimit-* headers."""
+
+    def __init__(self, resource: str, limit: int, burst_ratio: float):
+        self.resource = resource
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = time.time() + 3600
+        self.burst_ratio = burst_ratio
+        self.tokens = self.burst
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.secondary_backoff = 0.0
+        self.recent = deque()
+
+    @property
+    def burst(self) -> float:
+        """Requests that can be sent at once, a share of what remains of the budget."""
+        return max(min(self.limit, self.remaining) * self.burst_ratio, 1.0)
+
+    @property
+    def rate(self) -> float:
+        """Requests per second that spread the remaining budget until the reset."""
+        return self.remaining / max(self.reset_at - time.time(), 1.0)
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.refilled_at) * self.rate,
+                          self.burst, float(self.remaining))
+        self.refilled_at = now
+
+
+class GitHubRateLimiter:
+    """Paces GitHub API requests to the rate limits reported by GitHub.
+
+    Each resource (core for REST, graphql) is a token bucket: up to burst_ratio
+    of the limit can be spent at once, then requests are paced to spread what
+    remains until the reset. Secondary rate limits (Retry-After, 403 or 429
+    without an exhausted budget, requests per minute) block the resource for
+    as long as GitHub asks. A request waits until it may be sent, and gives
+    up when the wait exceeds max_wait.
+    """
+
+    def __init__(self, burst_ratio: float = 0.1, max_wait: float = 300.0):
+        self.burst_ratio = burst_ratio
+        self.max_wait = max_wait
+        self.buckets: dict[str, RateLimitBucket] = {}
+        self.lock = threading.Lock()
+        self.waited_seconds = 0.0
+        self.throttled = 0
+
+    def get_bucket(self, resource: str) -> RateLimitBucket:
+        if resource not in self.buckets:
+            # Until GitHub reports the limit, assume the unauthenticated one
+            self.buckets[resource] = RateLimitBucket(resource, 60, self.burst_ratio)
+        return self.buckets[resource]
+
+    def delay(self, bucket: RateLimitBucket, now: float) -> float:
+        """Return the seconds until a request may be sent. Called with the lock held."""
+        bucket.refill()
+        while bucket.recent and bucket.recent[0] < now - 60:
+            bucket.recent.popleft()
+
+        delays = [bucket.blocked_until - now]
+        if bucket.remaining <= 0:
+            delays.append(bucket.reset_at - time.time())
+        elif bucket.tokens < 1:
+            delays.append((1 - bucket.tokens) / bucket.rate)
+        if len(bucket.recent) >= points_per_minute.get(bucket.resource, 900):
+            delays.append(bucket.recent[0] + 60 - now)
+        return max(max(delays), 0.0)
+
+    def acquire(self, resource: str) -> None:
+        """Wait until a request to the resource may be sent, and take its token.
+
+        Raises GitHubRateLimitError if the wait exceeds max_wait.
+        """
+        while True:
+            # Checking and taking the token at once, so concurrent requests cannot overdraw the bucket
+            with self.lock:
+                bucket = self.get_bucket(resource)
+                now = time.monotonic()
+                wait_seconds = self.delay(bucket, now)
+                if wait_seconds <= 0:
+                    bucket.tokens -= 1
+                    bucket.remaining -= 1
+                    bucket.recent.append(now)
+                    return
+                if wait_seconds > self.max_wait:
+                    raise GitHubRateLimitError(resource, wait_seconds)
+                self.waited_seconds += wait_seconds
+
+            time.sleep(wait_seconds)
+
+    def record_response(self, resource: str, response) -> bool:
+        """Update the bucket from a response's headers. Returns True if the request should be retried."""
+        headers = response.headers
+        with self.lock:
+            bucket = self.get_bucket(headers.get("X-RateLimit-Resource") or resource)
+            if headers.get("X-RateLimit-Limit") and int(headers["X-RateLimit-Limit"]) != bucket.limit:
+                # The first response tells the actual limit, e.g. of a token
+                bucket.limit = int(headers["X-RateLimit-Limit"])
+                bucket.tokens = bucket.burst
+            if headers.get("X-RateLimit-Remaining"):
+                bucket.remaining = int(headers["X-RateLimit-Remaining"])
+                bucket.tokens = min(bucket.tokens, float(bucket.remaining))
+            if headers.get("X-RateLimit-Reset"):
+                bucket.reset_at = int(headers["X-RateLimit-Reset"])
+
+            if response.status_code not in (403, 429):
+                bucket.secondary_backoff = 0.0
+                return False
+
+            self.throttled += 1
+            now = time.monotonic()
+            if headers.get("Retry-After"):
+                bucket.blocked_until = now + int(headers["Retry-After"])
+            elif headers.get("X-RateLimit-Remaining") == "0":
+                bucket.blocked_until = now + max(bucket.reset_at - time.time(), 1.0)
+            elif "rate limit" in (response.text or "").lower():
+                # Secondary limit without Retry-After: wait a minute, then back off exponentially
+                bucket.secondary_backoff = min(max(bucket.secondary_backoff * 2, 60.0), 900.0)
+                bucket.blocked_until = now + bucket.secondary_backoff
+            else:
+                # Forbidden for another reason, e.g. a blocked repository
+                return False
+            logger.warning(
+                f"GitHub {bucket.resource} rate limited for {bucket.blocked_until - now:.0f} seconds")
+            return True
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "waited_seconds": self.waited_seconds,
+                "throttled": self.throttled,
+                **{f"{resource}_remaining": bucket.remaining
+                   for resource, bucket in self.buckets.items()},
+            }
+
+
+# Global instance, as GitHub's limits apply to the token across crawlers
+github_rate_limiter = GitHubRateLimiter()
@@ -0,0 +1,226 @@
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+from data_models import SeismicContent
+from cosmos_db_service import CosmosDBService
+from embedding_profiles import EmbeddingProfiles
+from github_crawler import GitHubCrawler, github_organizations
+
+# Configure logging
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger("azure.functions")
+
+# CosmosDB configuration
+seismic_container_name = "seismic-contents"
+github_container_name = "github-repos"
+hygiene_container_name = "index-hygiene"
+knowledge_containers = [github_container_name,
+                        seismic_container_name, "blog-posts"]
+
+
+class IndexHygiene:
+    """Keeps the knowledge containers, and so their vector and full-text indexes, lean.
+
+    - Seismic contents get a per-item TTL from their expiration date, so Cosmos DB
+      deletes them when they expire. The containers need TTL enabled without a
+      default (DefaultTimeToLive = -1) for the ttl fields to apply.
+    - GitHub repositories that disappeared from their organization or became
+      archived are tombstoned (marked removed_at and expired after a grace
+      period) or pruned right away. Tombstoned ones that are listed again and
+      not archived are restored.
+    - Every run records the size and the RU cost of a vector query per container,
+      and logs the change since the previous run.
+
+    Items are patched and deleted through EmbeddingProfiles, so their copies
+    in the container of a migrated vector search are too.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 github_crawler: GitHubCrawler,
+                 prune: bool = False,
+                 grace_days: int = 7,
+                 max_missing_ratio: float = 0.2,
+                 max_workers: int = 8):
+        self.cosmos_db_service = cosmos_db_service
+        self.embedding_profiles = EmbeddingProfiles(cosmos_db_service)
+        self.github_crawler = github_crawler
+        self.prune = prune
+        self.grace_days = grace_days
+        # An incomplete listing must not tombstone half the container
+        self.max_missing_ratio = max_missing_ratio
+        self.max_workers = max_workers
+
+    def run_bulk(self, action: Callable[[dict], object], items: List[dict]) -> int:
+        """Apply an action to many items concurrently and return how many succeeded."""
+
+        def apply(item: dict) -> bool:
+            try:
+                action(item)
+                return True
+            except Exception as e:
+                logger.error(f"Index hygiene failed for item {item['id']}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return sum(executor.map(apply, items))
+
+    def expire_seismic_contents(self) -> dict:
+        """Set a TTL on Seismic contents that have an expiration date but no TTL yet."""
+        self.embedding_profiles.load(seismic_container_name)
+        items = self.cosmos_db_service.query_items(
+            query="SELECT c.id, c.expiration_date FROM c "
+                  "WHERE NOT IS_DEFINED(c.ttl) AND IS_STRING(c.expiration_date)",
+            container_name=seismic_container_name)
+
+        expiring = [(item, SeismicContent._ttl_seconds(item["expiration_date"]))
+                    for item in items]
+        expiring = [{**item, "ttl": ttl} for item, ttl in expiring if ttl]
+        updated = self.run_bulk(
+            lambda item: self.embedding_profiles.patch_item(
+                item_id=item["id"],
+                fields={"ttl": item["ttl"]},
+                container_name=seismic_container_name),
+            expiring)
+
+        # A TTL of one second means the item has already expired
+        expired = sum(1 for item in expiring if item["ttl"] == 1)
+        logger.info(
+            f"Seismic contents: {updated} of {len(expiring)} given a TTL, {expired} already expired.")
+        return {"ttl_set": updated, "expired": expired}
+
+    def clean_github_repos(self, organization: str) -> dict:
+        """Tombstone or prune the organization's repositories that disappeared or became archived."""
+        self.embedding_profiles.load(github_container_name)
+        listed = self.github_crawler.fetch_org_repositories(
+            organization, full_listing=True)
+        # Archived as the listing has it now, not as it was when the repository was last crawled
+        listed_archived = {repo.id: repo.archived for repo in listed}
+        stored = self.cosmos_db_service.query_items(
+            query="SELECT c.id, c.removed_at FROM c WHERE c.organization = @organization",
+            container_name=github_container_name,
+            parameters=[{"name": "@organization", "value": organization}])
+        current = [item for item in stored if not item.get("removed_at")]
+
+        missing = [item for item in current if item["id"] not in listed_archived]
+        archived = [item for item in current if listed_archived.get(item["id"])]
+        # Unarchived, or back in the organization
+        restored = [item for item in stored if item.get("removed_at")
+                    and listed_archived.get(item["id"]) is False]
+        if current and len(missing) > self.max_missing_ratio * len(current):
+            logger.warning(
+                f"{len(missing)} of {len(current)} repositories of {organization} are missing from "
+                "the listing, which looks incomplete. Skipping their removal.")
+            missing = []
+
+        stale = missing + archived
+        if self.prune:
+            removed = self.run_bulk(
+                lambda item: self.embedding_profiles.delete_item(
+                    item_id=item["id"], container_name=github_container_name),
+                stale)
+        else:
+            removed_at = datetime.now(timezone.utc).isoformat()
+            removed = self.run_bulk(
+                lambda item: self.embedding_profiles.patch_item(
+                    item_id=item["id"],
+                    fields={"removed_at": removed_at,
+                            "ttl": int(timedelta(days=self.grace_days).total_seconds())},
+                    container_name=github_container_name),
+                stale)
+        restored_count = self.run_bulk(
+            lambda item: self.embedding_profiles.patch_item(
+                item_id=item["id"],
+                fields={"archived": False},
+                container_name=github_container_name,
+                remove=["removed_at", "ttl"]),
+            restored)
+
+        logger.info(
+            f"GitHub repositories of {organization}: {len(missing)} missing, {len(archived)} archived, "
+            f"{removed} {'pruned' if self.prune else 'tombstoned'}, {restored_count} restored.")
+        return {"missing": len(missing), "archived": len(archived), "removed": removed,
+                "restored": restored_count}
+
+    def snapshot_container(self, container_name: str) -> dict:
+        """Measure the size of a container and the RU cost of a typical vector query."""
+        container = self.cosmos_db_service.get_container(container_name)
+
+        # Quota info reports usage as 'documentsSize=<KB>;documentsCount=<count>;...'
+        container.read(populate_quota_info=True)
+        usage = dict(re.findall(r"(\w+)=(\d+)", container.client_connection.last_response_headers.get(
+            "x-ms-resource-usage", "")))
+
+        # Reuse a stored embedding so measuring does not need an embedding call
+        sample = self.cosmos_db_service.query_items(
+            query="SELECT TOP 1 VALUE c.embedding FROM c WHERE IS_ARRAY(c.embedding)",
+            container_name=container_name)
+        query_charge, query_seconds = 0.0, 0.0
+        if sample:
+            start = time.perf_counter()
+            self.cosmos_db_service.query_items(
+                query="SELECT TOP 10 c.id FROM c ORDER BY VectorDistance(c.embedding, @embedding)",
+                container_name=container_name,
+                parameters=[{"name": "@embedding", "value": sample[0]}])
+            query_seconds = time.perf_counter() - start
+            query_charge = float(container.client_connection.last_response_headers.get(
+                "x-ms-request-charge", 0))
+
+        return {
+            "id": f"{container_name}-{datetime.now(timezone.utc):%Y-%m-%d}",
+            "container": container_name,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "documents_count": int(usage.get("documentsCount", 0)),
+            "documents_size_kb": int(usage.get("documentsSize", 0)),
+            "query_charge": query_charge,
+            "query_seconds": round(query_seconds, 3),
+        }
+
+    def report_trend(self, snapshot: dict) -> None:
+        """Store the snapshot and log how the container changed since the previous one."""
+        previous = self.cosmos_db_service.query_items(
+            query="SELECT TOP 1 * FROM c WHERE c.container = @container AND c.id != @id "
+                  "ORDER BY c.recorded_at DESC",
+            container_name=hygiene_container_name,
+            parameters=[{"name": "@container", "value": snapshot["container"]},
+                        {"name": "@id", "value": snapshot["id"]}])
+        self.cosmos_db_service.upsert_item(snapshot, hygiene_container_name)
+
+        message = (f"Container {snapshot['container']}: {snapshot['documents_count']} documents, "
+                   f"{snapshot['documents_size_kb']} KB, vector query {snapshot['query_charge']:.2f} RU")
+        if previous:
+            last = previous[0]
+            message += (f" (since {last['recorded_at'][:10]}: "
+                        f"{snapshot['documents_count'] - last['documents_count']:+d} documents, "
+                        f"{snapshot['documents_size_kb'] - last['documents_size_kb']:+d} KB, "
+                        f"{snapshot['query_charge'] - last['query_charge']:+.2f} RU)")
+        logger.info(message)
+
+    def run(self):
+        """Run the index hygiene job."""
+        logger.info("Index hygiene started.")
+        self.cosmos_db_service.ensure_container(hygiene_container_name)
+
+        try:
+            self.expire_seismic_contents()
+        except Exception as e:
+            logger.error(f"An error occurred expiring Seismic contents: {e}")
+
+        for organization in github_organizations:
+            try:
+                self.clean_github_repos(organization)
+            except Exception as e:
+                logger.error(
+                    f"An error occurred cleaning repositories of {organization}: {e}")
+
+        for container_name in knowledge_containers:
+            try:
+                self.report_trend(self.snapshot_container(container_name))
+            except Exception as e:
+                logger.error(
+                    f"An error occurred measuring container {container_name}: {e}")
+
+        logger.info("Index hygiene finished.")
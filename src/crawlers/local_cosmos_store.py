@@ -0,0 +1,381 @@
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import numpy as np
+from azure.cosmos import exceptions
+from snapshots import SnapshotImporter
+
+
+def copy_value(value):
+    """Copy a JSON value, so callers never share lists or dicts with the store."""
+    if isinstance(value, dict):
+        return {key: copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_value(item) if isinstance(item, (dict, list)) else item for item in value]
+    return value
+
+
+class Undefined:
+    """The value of a missing property, which Cosmos DB SQL tells apart from null."""
+
+    def __repr__(self) -> str:
+        return "undefined"
+
+
+undefined = Undefined()
+
+token_pattern = re.compile(r"\s*(?:(?P<number>-?\d+(?:\.\d+)?)|'(?P<string>(?:[^'\\]|\\.)*)'"
+                           r"|(?P<parameter>@\w+)|(?P<name>[A-Za-z_]\w*)|(?P<operator>!=|<>|>=|<=|[=<>(),.*]))")
+
+functions: Dict[str, Callable[..., Any]] = {
+    "IS_DEFINED": lambda value: value is not undefined,
+    "IS_ARRAY": lambda value: isinstance(value, list),
+    "IS_STRING": lambda value: isinstance(value, str),
+    "ARRAY_LENGTH": lambda value: len(value) if isinstance(value, list) else undefined,
+}
+
+comparisons: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda a, b: a == b, "!=": lambda a, b: a != b, "<>": lambda a, b: a != b,
+    ">": lambda a, b: a > b, ">=": lambda a, b: a >= b, "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+}
+
+
+def comparable(a, b) -> bool:
+    """Cosmos DB only compares values of the same type; other comparisons are undefined."""
+    if a is undefined or b is undefined:
+        return False
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return True
+    return type(a) is type(b)
+
+
+class LocalQuery:
+    """A Cosmos DB SQL query, parsed for evaluation on in-memory items.
+
+    Supports the subset the crawlers use: SELECT [VALUE] [TOP n] with *, COUNT(1)
+    or property paths with AS aliases, FROM c, WHERE with AND, OR, NOT,
+    comparisons, parameters, literals and IS_DEFINED, IS_ARRAY, IS_STRING and
+    ARRAY_LENGTH, and ORDER BY a property path. Anything else, such as
+    VectorDistance or GROUP BY, raises a ValueError naming it.
+    """
+
+    def __init__(self, query: str, parameters: Optional[list] = None):
+        self.query = query
+        self.parameters = {parameter["name"]: parameter["value"] for parameter in parameters or []}
+        self.tokens = self.tokenize(query)
+        self.position = 0
+        self.parse()
+
+    def tokenize(self, query: str) -> List[tuple]:
+        tokens, position = [], 0
+        while position < len(query.rstrip()):
+            match = token_pattern.match(query, position)
+            if not match:
+                raise ValueError(f"LocalCosmosStore cannot parse {query[position:].split()[0]!r} in: {query}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            # Keywords are matched upper-cased, property names as written
+            tokens.append((kind, value.upper() if kind == "name" else value, value))
+            position = match.end()
+        return tokens
+
+    def peek(self, *values: str) -> bool:
+        return self.position < len(self.tokens) and self.tokens[self.position][1] in values
+
+    def unsupported(self, expected: str = "") -> ValueError:
+        """The error for the clause at the current token, which the local store cannot evaluate."""
+        found = " ".join(token[2] for token in self.tokens[self.position:self.position + 2])
+        return ValueError(f"LocalCosmosStore does not support {repr(found) if found else 'the end of the query'}"
+                          + (f" where {expected} is expected" if expected else "") + f" in: {self.query}")
+
+    def take(self, *values: str) -> str:
+        if self.position >= len(self.tokens) or (values and self.tokens[self.position][1] not in values):
+            raise self.unsupported(" or ".join(values))
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def parse(self) -> None:
+        self.take("SELECT")
+        self.value = self.peek("VALUE")
+        if self.value:
+            self.take("VALUE")
+        self.top = None
+        if self.peek("TOP"):
+            self.take("TOP")
+            self.top = self.operand()
+        self.projection = self.select_list()
+        self.take("FROM")
+        self.alias = self.take()
+        self.where = None
+        if self.peek("WHERE"):
+            self.take("WHERE")
+            self.where = self.expression()
+        self.order_by, self.descending = None, False
+        if self.peek("ORDER"):
+            self.take("ORDER")
+            self.take("BY")
+            self.order_by = self.path()
+            if self.peek("ASC", "DESC"):
+                self.descending = self.take() == "DESC"
+        if self.position != len(self.tokens):
+            raise self.unsupported()
+
+    def select_list(self) -> Any:
+        if self.peek("*"):
+            self.take("*")
+            return "*"
+        if self.peek("COUNT"):
+            self.take("COUNT")
+            self.take("(")
+            self.take()
+            self.take(")")
+            return "COUNT"
+        projection = []
+        while True:
+            getter = self.path()
+            name = self.tokens[self.position - 1][2]
+            if self.peek("AS"):
+                self.take("AS")
+                self.take()
+                name = self.tokens[self.position - 1][2]
+            projection.append((name, getter))
+            if not self.peek(","):
+                return projection
+            self.take(",")
+
+    def path(self) -> Callable[[dict], Any]:
+        start = self.position
+        self.take()
+        keys = []
+        while self.peek("."):
+            self.take(".")
+            self.take()
+            keys.append(self.tokens[self.position - 1][2])
+        if not keys:
+            # Not a property path, e.g. VectorDistance(...) or FullTextScore(...)
+            self.position = start
+            raise self.unsupported("a property path")
+
+        def get(item: dict) -> Any:
+            value = item
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    return undefined
+                value = value[key]
+            return value
+        return get
+
+    def expression(self) -> Callable[[dict], Any]:
+        operands = [self.conjunction()]
+        while self.peek("OR"):
+            self.take("OR")
+            operands.append(self.conjunction())
+        if len(operands) == 1:
+            return operands[0]
+
+        def either(item: dict) -> Any:
+            values = [operand(item) for operand in operands]
+            if any(value is True for value in values):
+                return True
+            return False if all(value is False for value in values) else undefined
+        return either
+
+    def conjunction(self) -> Callable[[dict], Any]:
+        operands = [self.negation()]
+        while self.peek("AND"):
+            self.take("AND")
+            operands.append(self.negation())
+        if len(operands) == 1:
+            return operands[0]
+
+        def both(item: dict) -> Any:
+            values = [operand(item) for operand in operands]
+            if any(value is False for value in values):
+                return False
+            return True if all(value is True for value in values) else undefined
+        return both
+
+    def negation(self) -> Callable[[dict], Any]:
+        if self.peek("NOT"):
+            self.take("NOT")
+            operand = self.negation()
+
+            def negate(item: dict) -> Any:
+                value = operand(item)
+                return not value if isinstance(value, bool) else undefined
+            return negate
+        return self.comparison()
+
+    def comparison(self) -> Callable[[dict], Any]:
+        left = self.operand()
+        if not self.peek(*comparisons):
+            return left
+        compare = comparisons[self.take()]
+        right = self.operand()
+
+        def compared(item: dict) -> Any:
+            a, b = left(item), right(item)
+            return compare(a, b) if comparable(a, b) else undefined
+        return compared
+
+    def operand(self) -> Callable[[dict], Any]:
+        kind, value, _ = self.tokens[self.position] if self.position < len(self.tokens) else (None, None, None)
+        if value == "(":
+            self.take("(")
+            inner = self.expression()
+            self.take(")")
+            return inner
+        if kind == "number":
+            self.take()
+            number = float(value) if "." in value else int(value)
+            return lambda item: number
+        if kind == "string":
+            self.take()
+            string = value.replace("\\'", "'")
+            return lambda item: string
+        if kind == "parameter":
+            self.take()
+            if value not in self.parameters:
+                raise ValueError(f"Query parameter {value} is not set")
+            parameter = self.parameters[value]
+            return lambda item: parameter
+        if value in ("TRUE", "FALSE", "NULL"):
+            self.take()
+            constant = {"TRUE": True, "FALSE": False, "NULL": None}[value]
+            return lambda item: constant
+        if value in functions and self.position + 1 < len(self.tokens) and self.tokens[self.position + 1][1] == "(":
+            function = functions[self.take()]
+            self.take("(")
+            argument = self.expression()
+            self.take(")")
+            return lambda item: function(argument(item))
+        return self.path()
+
+    def run(self, items: List[dict]) -> List[Any]:
+        matched = [item for item in items if self.where is None or self.where(item) is True]
+        if self.projection == "COUNT":
+            results = [len(matched)]
+            return results if self.value else [{"$1": len(matched)}]
+        if self.order_by is not None:
+            # Undefined and null values sort first, then booleans, numbers and strings
+            def order(item: dict) -> tuple:
+                value = self.order_by(item)
+                rank = 0 if value is undefined else 1 if value is None else \
+                    2 if isinstance(value, bool) else 3 if isinstance(value, (int, float)) else 4
+                return (rank, value if rank > 2 else 0)
+            matched.sort(key=order, reverse=self.descending)
+        if self.top is not None:
+            matched = matched[:self.top({})]
+
+        if self.projection == "*":
+            return [copy_value(item) for item in matched]
+        if self.value:
+            return [copy_value(value) for item in matched
+                    if (value := self.projection[0][1](item)) is not undefined]
+        return [{name: copy_value(value) for name, getter in self.projection
+                 if (value := getter(item)) is not undefined} for item in matched]
+
+
+class LocalCosmosStore:
+    """In-memory stand-in for CosmosDBService, for tests and local development.
+
+    It keeps each container's items in a dict by id, and offers the operations
+    of CosmosDBService with the same results and errors, including etags for
+    conditional patches. Queries are evaluated by LocalQuery, which supports
+    the SQL the crawlers use apart from vector search; vector_search ranks
+    items by cosine similarity instead. load_snapshot fills the store from a
+    snapshot exported by snapshots.py.
+    """
+
+    def __init__(self):
+        self.containers: Dict[str, Dict[str, dict]] = {}
+        self.settings: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def ensure_container(self, container_name: str, settings: Optional[dict] = None) -> Dict[str, dict]:
+        with self.lock:
+            if container_name not in self.containers:
+                self.settings[container_name] = copy_value(settings or {})
+            return self.containers.setdefault(container_name, {})
+
+    def read_container_settings(self, container_name: str) -> dict:
+        self.get_container(container_name)
+        return copy_value(self.settings.get(container_name, {}))
+
+    def get_container(self, container_name: str) -> Dict[str, dict]:
+        if container_name not in self.containers:
+            raise exceptions.CosmosResourceNotFoundError(
+                status_code=404, message=f"Container {container_name} does not exist")
+        return self.containers[container_name]
+
+    def upsert_item(self, item: dict, container_name: str) -> dict:
+        stored = {key: value for key, value in copy_value(item).items() if not key.startswith("_")}
+        stored.update({"_etag": f'"{uuid.uuid4()}"', "_ts": int(time.time())})
+        with self.lock:
+            self.get_container(container_name)[stored["id"]] = stored
+        return copy_value(stored)
+
+    def read_item(self, item_id: str, container_name: str) -> Optional[dict]:
+        item = self.containers.get(container_name, {}).get(item_id)
+        return copy_value(item) if item else None
+
+    def check_item_exists(self, item_id: str, container_name: str) -> bool:
+        return item_id in self.containers.get(container_name, {})
+
+    def query_items(self, query: str, container_name: str, parameters: list = None) -> list:
+        return list(self.iter_items(query, container_name, parameters))
+
+    def iter_items(self, query: str, container_name: str, parameters: list = None,
+                   page_size: int = 1000, feed_range: Optional[dict] = None) -> Iterator[dict]:
+        local_query = LocalQuery(query, parameters)
+        with self.lock:
+            items = list(self.containers.get(container_name, {}).values())
+        return iter(local_query.run(items))
+
+    def feed_ranges(self, container_name: str) -> List[dict]:
+        return [{"container": container_name}]
+
+    def patch_item(self, item_id: str, fields: dict, container_name: str,
+                   etag: Optional[str] = None, remove: Optional[List[str]] = None) -> dict:
+        with self.lock:
+            item = self.get_container(container_name).get(item_id)
+            if item is None:
+                raise exceptions.CosmosResourceNotFoundError(
+                    status_code=404, message=f"Item {item_id} does not exist")
+            if etag and item["_etag"] != etag:
+                raise exceptions.CosmosAccessConditionFailedError(
+                    status_code=412, message=f"Item {item_id} was modified")
+            missing = [field for field in remove or [] if field not in item]
+            if missing:
+                raise exceptions.CosmosHttpResponseError(
+                    status_code=400, message=f"Item {item_id} has no field {missing[0]} to remove")
+            item.update(copy_value(fields))
+            for field in remove or []:
+                del item[field]
+            item.update({"_etag": f'"{uuid.uuid4()}"', "_ts": int(time.time())})
+            return copy_value(item)
+
+    def delete_item(self, item_id: str, container_name: str) -> bool:
+        with self.lock:
+            return self.containers.get(container_name, {}).pop(item_id, None) is not None
+
+    def vector_search(self, embedding: List[float], container_name: str, top_k: int = 5,
+                      field: str = "embedding") -> List[dict]:
+        """Return the top_k items by cosine similarity, with their score, as a vector search would."""
+        items = [item for item in self.containers.get(container_name, {}).values()
+                 if isinstance(item.get(field), list) and len(item[field]) == len(embedding)]
+        if not items:
+            return []
+        matrix = np.asarray([item[field] for item in items], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12)
+        return [{**copy_value(items[index]), "score": float(scores[index])}
+                for index in np.argsort(-scores)[:top_k]]
+
+    def load_snapshot(self, path: str, containers: Optional[List[str]] = None) -> dict:
+        """Load the containers of a snapshot directory, all of them by default."""
+        return SnapshotImporter(self, path, workers=1).run(containers)
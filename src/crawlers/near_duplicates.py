@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import logging
+import re
+from typing import Optional
+import numpy as np
+from cosmos_db_service import CosmosDBService
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# Mersenne prime for the permutation hashes, small enough for a * x + b to fit in 64 bits
+mersenne_prime = np.uint64((1 << 31) - 1)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of the items of a container, to find near-duplicate texts.
+
+    Each canonical item stores the MinHash signature of its text's word
+    3-shingles in a minhash field, so the index is rebuilt from the container
+    at the start of a run. Signatures are split into bands; items sharing a
+    band are candidates, and a candidate is a near duplicate if the signatures
+    estimate a Jaccard similarity of at least threshold.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 min_words: int = 50):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Short texts share too many shingles by chance to be compared reliably
+        self.min_words = min_words
+        rng = np.random.default_rng(1)
+        self.a = rng.integers(1, mersenne_prime, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, mersenne_prime, num_perm, dtype=np.uint64)
+        self.buckets: dict[tuple, list] = {}
+        self.reset_stats()
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Return the MinHash signature of the text's word 3-shingles."""
+        words = re.findall(r"\w+", (text or "").lower())
+        if len(words) < 3:
+            return None
+        shingles = {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+        hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "big")
+                           for shingle in shingles], dtype=np.uint64)
+        permuted = (hashes[:, None] * self.a + self.b) % mersenne_prime
+        return permuted.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def to_wire(signature: np.ndarray) -> str:
+        return base64.b64encode(signature.astype("<u4").tobytes()).decode()
+
+    @staticmethod
+    def from_wire(value: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(value), dtype="<u4").astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> list[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def add(self, item_id: str, signature: np.ndarray) -> None:
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append((item_id, signature))
+
+    def remove(self, item_id: str) -> None:
+        for key in list(self.buckets):
+            self.buckets[key] = [entry for entry in self.buckets[key] if entry[0] != item_id]
+
+    def find(self, signature: np.ndarray, exclude_id: Optional[str] = None) -> Optional[str]:
+        """Return the id of the most similar indexed item above the threshold, if any."""
+        best_id, best_similarity = None, self.threshold
+        for key in self.band_keys(signature):
+            for item_id, other in self.buckets.get(key, []):
+                if item_id == exclude_id:
+                    continue
+                similarity = float(np.mean(signature == other))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = item_id, similarity
+        return best_id
+
+    def load(self, cosmos_db_service: CosmosDBService, container_name: str) -> None:
+        """Index the signatures stored on the canonical items of a container."""
+        self.buckets = {}
+        items = cosmos_db_service.query_items(
+            query="SELECT c.id, c.minhash FROM c "
+                  "WHERE IS_DEFINED(c.minhash) AND NOT IS_DEFINED(c.canonical_id)",
+            container_name=container_name)
+        for item in items:
+            self.add(item["id"], self.from_wire(item["minhash"]))
+        logger.info(f"Loaded {len(items)} MinHash signatures from {container_name}")
+
+    def check(self, item_id: str, text: str, tokens: int = 0) -> tuple[Optional[str], Optional[str]]:
+        """Compute an item's signature and look for a canonical item it duplicates.
+
+        Returns the canonical item's id (None if the item is not a duplicate) and
+        the signature to store with the item (None if the text is too short).
+        tokens is what the LLM calls skipped for a duplicate would have sent.
+        """
+        self.checked += 1
+        if len(re.findall(r"\w+", text or "")) < self.min_words:
+            return None, None
+        signature = self.signature(text)
+        canonical_id = self.find(signature, exclude_id=item_id)
+        if canonical_id:
+            self.duplicates += 1
+            self.tokens_avoided += tokens
+        return canonical_id, self.to_wire(signature)
+
+    def reset_stats(self) -> None:
+        self.checked = 0
+        self.duplicates = 0
+        self.tokens_avoided = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "duplicate_rate": self.duplicates / self.checked if self.checked else 0.0,
+            # A summarization and an embedding call per duplicate
+            "llm_calls_avoided": self.duplicates * 2,
+            "tokens_avoided": self.tokens_avoided,
+        }
+
+    def log_stats(self, crawler_name: str) -> None:
+        """Log the duplicate rate and the cost avoided since the stats were reset."""
+        stats = self.get_stats()
+        logger.info(
+            f"{crawler_name} near duplicates: {stats['duplicates']} of {stats['checked']} items "
+            f"({stats['duplicate_rate']:.1%}), {stats['llm_calls_avoided']} LLM calls and "
+            f"{stats['tokens_avoided']} summarizer input tokens avoided")
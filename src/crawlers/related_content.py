@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from cosmos_db_service import CosmosDBService
+from embedding_profiles import EmbeddingProfiles
+
+# Configure logging
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger("azure.functions")
+
+# CosmosDB configuration
+related_container_name = "related-content"
+
+# The fields stored for a related item of each source, as its search agent shows them
+related_sources = {
+    "github-repos": {
+        "fields": ["name", "url", "description", "stars_count", "archived", "updated_at"],
+        "condition": "NOT IS_DEFINED(c.removed_at)",
+    },
+    "blog-posts": {
+        "fields": ["title", "url", "description", "published_date"],
+        "condition": "true",
+    },
+    "seismic-contents": {
+        "fields": ["name", "url", "description", "last_update", "expiration_date",
+                   "level", "solution_area", "format", "size", "confidentiality"],
+        "condition": "(NOT IS_DEFINED(c.expiration_date) OR NOT IS_STRING(c.expiration_date) "
+                     "OR c.expiration_date >= @now)",
+    },
+}
+
+
+def related_content_id(url: str) -> str:
+    """Identify an item's related content by its URL, which is what the agents know of it."""
+    return hashlib.md5(url.strip().rstrip("/").lower().encode()).hexdigest()
+
+
+class Source:
+    """The items of one container with their embeddings as rows of a normalized float32 matrix."""
+
+    def __init__(self, name: str, spec: dict, items: List[dict], matrix: np.ndarray):
+        self.name = name
+        self.spec = spec
+        self.items = items
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Cosine similarity is then a dot product
+        self.matrix = matrix / np.maximum(norms, 1e-12)
+
+    def compatible(self, other: 'Source') -> bool:
+        """Embeddings of different models or dimensions cannot be compared."""
+        return (self.spec["model"], self.spec["dimensions"]) == (other.spec["model"], other.spec["dimensions"])
+
+
+class RelatedContent:
+    """Nightly job that precomputes, for every item, the most similar items of the other sources.
+
+    The embeddings of the GitHub, blog and Seismic containers are loaded into
+    float32 matrices, and a blocked matrix product joins each source with the
+    others, keeping the top_k neighbors above min_score. Each item's neighbors
+    are stored in the related-content container under an id derived from its
+    URL, so the related_content kernel function answers with one point read.
+    Only documents whose neighbors or their stored fields changed are written,
+    and nothing is written if a source fails to load.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 top_k: int = 5,
+                 min_score: float = 0.4,
+                 block_elements: int = 2 ** 24,
+                 description_chars: int = 300,
+                 max_workers: int = 8):
+        self.cosmos_db_service = cosmos_db_service
+        self.top_k = top_k
+        self.min_score = min_score
+        # Similarity scores computed at once, 64 MB of float32
+        self.block_elements = block_elements
+        self.description_chars = description_chars
+        self.max_workers = max_workers
+        self.embedding_profiles = EmbeddingProfiles(cosmos_db_service)
+        self.stats = {"items": 0, "written": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+
+    def load_source(self, container_name: str) -> Source:
+        """Load a container's items and embeddings, as its vector search sees them."""
+        spec = self.embedding_profiles.read(container_name)["active"]
+        settings = related_sources[container_name]
+        fields = ", ".join(f"c.{field}" for field in ["id"] + settings["fields"])
+        query = (f"SELECT {fields}, c.{spec['field']} AS embedding FROM c "
+                 f"WHERE IS_ARRAY(c.{spec['field']}) AND ARRAY_LENGTH(c.{spec['field']}) > 0 "
+                 f"AND IS_STRING(c.url) AND {settings['condition']}")
+        parameters = [{"name": "@now", "value": datetime.now(timezone.utc).isoformat()}] \
+            if "@now" in settings["condition"] else []
+
+        items, rows = [], []
+        # Each embedding is turned into float32 as it arrives, not kept as a list of floats
+        for item in self.cosmos_db_service.iter_items(
+                query=query, container_name=spec.get("container") or container_name,
+                parameters=parameters):
+            embedding = np.asarray(item.pop("embedding"), dtype=np.float32)
+            if len(embedding) != spec["dimensions"]:
+                continue
+            if isinstance(item.get("description"), str):
+                item["description"] = item["description"][:self.description_chars]
+            rows.append(embedding)
+            items.append(item)
+
+        matrix = np.vstack(rows) if rows else np.empty((0, spec["dimensions"]), dtype=np.float32)
+        logger.info(f"Loaded {len(items)} embeddings of {container_name} ({matrix.nbytes // 2 ** 20} MB)")
+        return Source(container_name, spec, items, matrix)
+
+    def nearest(self, queries: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices and scores of the top_k target rows of each query row, best first.
+
+        Query rows are multiplied with the targets in blocks, so the scores held
+        at once stay under block_elements.
+        """
+        k = min(self.top_k, len(targets))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        if k == 0:
+            return indices, scores
+
+        rows = max(self.block_elements // len(targets), 1)
+        for start in range(0, len(queries), rows):
+            block = queries[start:start + rows] @ targets.T
+            # The k best of each row, unordered, then ordered
+            top = np.argpartition(block, -k, axis=1)[:, -k:]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            indices[start:start + rows] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + rows] = np.take_along_axis(top_scores, order, axis=1)
+        return indices, scores
+
+    def build_documents(self, source: Source, targets: List[Source]) -> List[dict]:
+        """Build the related-content documents of a source's items."""
+        neighbors: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            target.name: self.nearest(source.matrix, target.matrix) for target in targets}
+
+        documents = []
+        computed_at = datetime.now(timezone.utc).isoformat()
+        for row, item in enumerate(source.items):
+            related = {
+                target.name: [{**target.items[index], "score": round(float(score), 3)}
+                              for index, score in zip(neighbors[target.name][0][row],
+                                                      neighbors[target.name][1][row])
+                              if score >= self.min_score]
+                for target in targets}
+            # Scores drift with every crawl; a change of neighbors, of their order or of
+            # their stored fields, e.g. an archived repository, is a change
+            fingerprint = json.dumps({
+                "title": item.get("title") or item.get("name"),
+                "related": {name: [{key: value for key, value in neighbor.items() if key != "score"}
+                                   for neighbor in items]
+                            for name, items in related.items()},
+            }, sort_keys=True, default=str)
+            documents.append({
+                "id": related_content_id(item["url"]),
+                "source": source.name,
+                "item_id": item["id"],
+                "url": item["url"],
+                "title": item.get("title") or item.get("name"),
+                "related": related,
+                "fingerprint": hashlib.md5(fingerprint.encode()).hexdigest(),
+                "computed_at": computed_at,
+            })
+        return documents
+
+    def run_bulk(self, action: Callable[[dict], object], items: List[dict]) -> int:
+        """Apply an action to many items concurrently and return how many succeeded."""
+
+        def apply(item: dict) -> bool:
+            try:
+                action(item)
+                return True
+            except Exception as e:
+                logger.error(f"Related content failed for item {item['id']}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return sum(executor.map(apply, items))
+
+    def write_documents(self, documents: List[dict], fingerprints: Dict[str, str]) -> None:
+        changed = [document for document in documents
+                   if fingerprints.get(document["id"]) != document["fingerprint"]]
+        written = self.run_bulk(
+            lambda document: self.cosmos_db_service.upsert_item(document, related_container_name),
+            changed)
+        self.stats["written"] += written
+        self.stats["failed"] += len(changed) - written
+        self.stats["unchanged"] += len(documents) - len(changed)
+
+    def run(self, sources: Optional[List[str]] = None):
+        """Run the related content job."""
+        logger.info("Related content job started.")
+        start = time.perf_counter()
+        self.stats = {"items": 0, "written": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+        self.cosmos_db_service.ensure_container(related_container_name)
+
+        loaded = []
+        for container_name in sources or list(related_sources):
+            try:
+                loaded.append(self.load_source(container_name))
+            except Exception as e:
+                # Without a source, every other item would lose its neighbors of it
+                logger.error(f"Error loading the embeddings of {container_name}, "
+                             f"keeping the stored related content: {e}")
+                return
+        loaded_seconds = time.perf_counter() - start
+
+        stored = {document["id"]: document
+                  for document in self.cosmos_db_service.iter_items(
+                      query="SELECT c.id, c.source, c.fingerprint FROM c",
+                      container_name=related_container_name)}
+        fingerprints = {document_id: document.get("fingerprint") for document_id, document in stored.items()}
+
+        current = set()
+        for source in loaded:
+            targets = [target for target in loaded
+                       if target is not source and source.compatible(target)]
+            documents = self.build_documents(source, targets)
+            self.write_documents(documents, fingerprints)
+            current.update(document["id"] for document in documents)
+            self.stats["items"] += len(documents)
+
+        # Items of the loaded sources that were removed, expired or lost their embedding.
+        # The documents of sources not run are kept
+        loaded_names = {source.name for source in loaded}
+        stale = [{"id": document_id} for document_id, document in stored.items()
+                 if document_id not in current and document.get("source") in loaded_names]
+        self.stats["deleted"] = self.run_bulk(
+            lambda document: self.cosmos_db_service.delete_item(document["id"], related_container_name),
+            stale)
+
+        logger.info(
+            f"Related content job finished: {self.stats['items']} items, {self.stats['written']} written, "
+            f"{self.stats['unchanged']} unchanged, {self.stats['deleted']} deleted, {self.stats['failed']} failed "
+            f"(loaded in {loaded_seconds:.1f}s, total {time.perf_counter() - start:.1f}s)")
@@ -1,10 +1,14 @@
 import hashlib
 import os
 import json
-from typing import List
-from data_models import SeismicContent
+from datetime import datetime, timezone
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from data_models import SeismicContent, embedding_to_wire
 from foundry_service import FoundryService
 from cosmos_db_service import CosmosDBService
+from embedding_profiles import EmbeddingProfiles
 import logging
 from pathlib import Path
 
@@ -18,20 +22,39 @@ logger = logging.getLogger("azure.functions")
 data_source = str(Path(__file__).resolve()
                   .parents[2] / '.temp' / 'L200-300-400-processed.json')
 
+# CosmosDB configuration
+cosmosdb_container_name = "seismic-contents"
+
+# Columns of a Seismic content document, as written by SeismicContent.to_dict
+content_columns = [
+    "id", "name", "url", "version", "version_creation_date", "last_update", "creation_date",
+    "expiration_date", "description", "size", "format", "confidentiality", "sales_stage",
+    "audience", "competitor", "level", "language", "industry", "initiative", "segment",
+    "content_sub_type", "industry_sub_vertical", "solution_area", "content_group", "products",
+    "solution_play", "industry_vertical", "tags",
+]
+date_columns = ["version_creation_date", "last_update", "creation_date", "expiration_date"]
+# Columns that SeismicContent.from_dict defaults to "--" when missing
+placeholder_columns = ["sales_stage", "competitor", "industry", "initiative", "industry_sub_vertical",
+                       "products", "solution_play", "industry_vertical"]
+
 
 class SeismicCrawler:
     def __init__(self, cosmos_db_service: CosmosDBService,
-                 foundry_service: FoundryService):
+                 foundry_service: FoundryService,
+                 data_source_path: Optional[str] = None):
         """Initialize the Seismic Crawler with a data source."""
+        data_source_path = data_source_path or data_source
 
         # Ensure the data source exists
-        if not os.path.exists(data_source):
+        if not os.path.exists(data_source_path):
             raise FileNotFoundError(
-                f"Data source file not found: {data_source}")
+                f"Data source file not found: {data_source_path}")
 
-        self.data_source = data_source
+        self.data_source = data_source_path
         self.foundry_service = foundry_service
         self.cosmos_db_service = cosmos_db_service
+        self.embedding_profiles = EmbeddingProfiles(cosmos_db_service)
 
     def generate_item_id(self, url: str) -> str:
         """Generate a unique ID for a blog post based on URL."""
@@ -50,12 +73,17 @@ class SeismicCrawler:
 
     def process_data(self, seismic_data: List[SeismicContent]):
         """Process the fetched seismic data."""
+        self.embedding_profiles.load(cosmosdb_container_name)
 
         for item in seismic_data:
             try:                
 
+                # Expired content would be embedded only for Cosmos DB to delete it
+                if item.is_expired():
+                    continue
+
                 # Check if the item already exists in CosmosDB
-                if self.cosmos_db_service.check_item_exists(item.id, "seismic-contents"):
+                if self.cosmos_db_service.check_item_exists(item.id, cosmosdb_container_name):
                     logger.info(
                         f"Seismic content '{item.name}' already exists in CosmosDB.")
                     continue
@@ -72,9 +100,11 @@ class SeismicCrawler:
                     item.tags = item.products
                 
                 # Save the processed seismic content to CosmosDB
-                self.cosmos_db_service.upsert_item(
+                self.embedding_profiles.upsert_item(
                     item=item.to_dict(),
-                    container_name="seismic-contents"
+                    container_name=cosmosdb_container_name,
+                    text=embedding_content,
+                    foundry_service=self.foundry_service
                 )
 
             except Exception as e:
@@ -83,23 +113,112 @@ class SeismicCrawler:
 
     
 
+    def load_table(self) -> pd.DataFrame:
+        """Load the seismic export into a table with one column per document field."""
+        with open(self.data_source, 'r', encoding='utf-8') as file:
+            table = pd.DataFrame.from_records(json.load(file))
+        return table.reindex(columns=content_columns).astype(object)
+
+    @staticmethod
+    def normalize_table(table: pd.DataFrame) -> pd.DataFrame:
+        """Normalize dates, placeholders and tags column-wise, like SeismicContent does per row."""
+        table = table.copy()
+        for column in date_columns:
+            # Example: 'Jul 18, 2025 at 11:26 PM'. Unparsed values are kept as they are
+            parsed = pd.to_datetime(table[column], format="%b %d, %Y at %I:%M %p", errors="coerce")
+            iso = np.datetime_as_string(parsed.to_numpy(dtype="datetime64[s]"))
+            table[column] = pd.Series(np.char.add(iso, "Z"), index=table.index, dtype=object) \
+                .where(parsed.notna(), table[column])
+
+        for column in placeholder_columns:
+            table[column] = table[column].where(table[column].notna(), "--")
+
+        # Products double as tags when they are set
+        has_products = table["products"].notna() & (table["products"] != "--")
+        table["tags"] = table["products"].where(has_products, table["tags"])
+
+        # Rows without an id get the one generate_item_id would give them
+        missing_id = table["id"].isna()
+        if missing_id.any():
+            table.loc[missing_id, "id"] = [hashlib.md5(f"{url}".encode()).hexdigest()
+                                           for url in table.loc[missing_id, "url"]]
+
+        # Hash the content of all rows at once, to find the changed ones
+        table["content_hash"] = pd.util.hash_pandas_object(
+            table[content_columns].astype(str), index=False).map("{:016x}".format)
+
+        # Cosmos DB deletes the item when it expires, see SeismicContent._ttl_seconds.
+        # Expired rows get a ttl of 0, which drop_expired removes
+        expires_at = pd.to_datetime(table["expiration_date"], format="%Y-%m-%dT%H:%M:%SZ",
+                                    errors="coerce", utc=True)
+        seconds = (expires_at - datetime.now(timezone.utc)).dt.total_seconds()
+        table["ttl"] = seconds.clip(lower=1).round().where(~(seconds <= 0), 0)
+        return table
+
+    @staticmethod
+    def drop_expired(table: pd.DataFrame) -> pd.DataFrame:
+        """Drop the rows whose expiration date has passed, which would be embedded only to be deleted."""
+        return table[~(table["ttl"] <= 0)]
+
+    def fetch_stored_hashes(self) -> dict:
+        """Fetch the content hash of every stored item, without the rest of the document."""
+        items = self.cosmos_db_service.query_items(
+            query="SELECT c.id, c.content_hash FROM c",
+            container_name=cosmosdb_container_name)
+        return {item["id"]: item.get("content_hash") for item in items}
+
+    @staticmethod
+    def changed_rows(table: pd.DataFrame, stored_hashes: dict) -> List[dict]:
+        """Return the rows that are new or whose content changed, as documents."""
+        stored = table["id"].map(stored_hashes)
+        changed = table[stored.isna() | (stored != table["content_hash"])]
+        rows = changed.astype(object).where(changed.notna(), None).to_dict("records")
+        for row in rows:
+            if row["ttl"] is None:
+                del row["ttl"]
+            else:
+                row["ttl"] = int(row["ttl"])
+        return rows
+
+    def write_rows(self, rows: List[dict]) -> None:
+        """Embed and save changed rows to CosmosDB."""
+        for row in rows:
+            try:
+                logger.info(f"Processing Seismic content: {row['name']}")
+                row["embedding"] = embedding_to_wire(
+                    self.foundry_service.generate_embedding(row["name"]))
+                # With the embeddings of a model migration if there is one, which a plain upsert would drop
+                self.embedding_profiles.upsert_item(
+                    item=row,
+                    container_name=cosmosdb_container_name,
+                    text=row["name"],
+                    foundry_service=self.foundry_service
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error processing seismic content '{row['name']}': {e}")
+
     def run(self):
         """Run the Seismic Crawler."""
         try:
             logger.info("Seismic Crawler started.")
+            self.embedding_profiles.load(cosmosdb_container_name)
 
-            # Fetch and process seismic data
-            seismic_data = self.fetch_data()
+            # Load and normalize the seismic export as a table
+            table = self.normalize_table(self.load_table())
 
-            if not seismic_data:
+            if table.empty:
                 logger.warning("No seismic data found to process.")
                 return
 
-            # Process the fetched seismic data
-            self.process_data(seismic_data)
+            # Only new or changed rows that have not expired are embedded and written
+            current = self.drop_expired(table)
+            rows = self.changed_rows(current, self.fetch_stored_hashes())
+            self.write_rows(rows)
 
             logger.info(
-                f"Seismic Crawler finished processing {len(seismic_data)} items.")
+                f"Seismic Crawler finished processing {len(table)} items ({len(rows)} new or changed, "
+                f"{len(table) - len(current)} expired).")
 
         except Exception as e:
             logger.error(f"An error occurred processing seismic data: {e}")
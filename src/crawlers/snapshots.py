@@ -0,0 +1,355 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from azure.cosmos import exceptions
+from cosmos_db_service import CosmosDBService
+from data_models import embedding_to_wire
+from embedding_profiles import EmbeddingProfiles, default_profile
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# The containers the crawlers fill, which only hours of LLM calls rebuild
+snapshot_containers = ["github-repos", "blog-posts", "seismic-contents"]
+
+# Written by Cosmos DB, not part of an item
+system_fields = {"_rid", "_self", "_etag", "_attachments", "_ts"}
+
+manifest_name = "manifest.json"
+
+
+def vector_fields(profile: dict) -> Dict[str, int]:
+    """Return the embedding fields of a container's items and their dimensions."""
+    fields = {default_profile["field"]: default_profile["dimensions"]}
+    for spec in [profile.get("active"), profile.get("shadow")]:
+        # A spec stored in another container is snapshotted with that container
+        if spec and not spec.get("container"):
+            fields[spec["field"]] = spec["dimensions"]
+    return fields
+
+
+def snapshot_schema(fields: Dict[str, int]) -> pa.Schema:
+    return pa.schema(
+        [pa.field("id", pa.string(), nullable=False)]
+        + [pa.field(field, pa.list_(pa.float32(), dimensions)) for field, dimensions in fields.items()]
+        + [pa.field("document", pa.string(), nullable=False)])
+
+
+def to_record_batch(items: List[dict], schema: pa.Schema, fields: Dict[str, int]) -> pa.RecordBatch:
+    """Turn items into a record batch; embeddings become fixed-size float32 lists.
+
+    The other fields are kept as JSON, so items of any shape round-trip. An
+    embedding without the field's dimensions, such as the empty one of items
+    without text, stays in the JSON too.
+    """
+    documents = [{key: value for key, value in item.items() if key not in system_fields} for item in items]
+    columns = [pa.array([document["id"] for document in documents], pa.string())]
+    for field, dimensions in fields.items():
+        values = np.zeros((len(documents), dimensions), dtype=np.float32)
+        mask = np.ones(len(documents), dtype=bool)
+        for row, document in enumerate(documents):
+            value = document.get(field)
+            if isinstance(value, list) and len(value) == dimensions:
+                values[row] = document.pop(field)
+                mask[row] = False
+        columns.append(pa.FixedSizeListArray.from_arrays(
+            pa.array(values.ravel()), dimensions, mask=pa.array(mask)))
+    columns.append(pa.array([json.dumps(document, separators=(",", ":")) for document in documents],
+                            pa.string()))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def from_record_batch(batch: pa.RecordBatch) -> List[dict]:
+    """Turn a record batch back into items, with embeddings as Cosmos DB stores them."""
+    items = [json.loads(document) for document in batch.column("document").to_pylist()]
+    for field in batch.schema.names:
+        if field in ("id", "document"):
+            continue
+        column = batch.column(field)
+        dimensions = column.type.list_size
+        # The child values of null rows are zeros, so the matrix lines up with the rows
+        matrix = column.values.to_numpy(zero_copy_only=False)[
+            column.offset * dimensions:(column.offset + len(column)) * dimensions].reshape(-1, dimensions)
+        for item, vector, valid in zip(items, matrix, column.is_valid().to_numpy(zero_copy_only=False)):
+            if valid:
+                item[field] = embedding_to_wire(vector)
+    return items
+
+
+class SnapshotExporter:
+    """Exports containers to a snapshot directory of Parquet files.
+
+    Each container's feed ranges are read in parallel, one worker per range,
+    and every worker streams its pages into its own Parquet part, so neither
+    the reads nor the writes wait on each other and no container is held in
+    memory. A manifest lists the parts, item counts, embedding profiles and
+    the containers' indexing, vector and full-text policies.
+
+    The items are read over the export's duration, not at one point in time,
+    so items written during an export may or may not be in it.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 path: str,
+                 workers: int = 8,
+                 page_size: int = 1000,
+                 compression: str = "zstd"):
+        self.cosmos_db_service = cosmos_db_service
+        self.path = path
+        self.workers = workers
+        self.page_size = page_size
+        self.compression = compression
+        self.profiles = EmbeddingProfiles(cosmos_db_service)
+
+    def export_range(self, container_name: str, part: int, feed_range: Optional[dict],
+                     fields: Dict[str, int]) -> dict:
+        """Export the items of a feed range to a Parquet part."""
+        schema = snapshot_schema(fields)
+        file_name = f"{container_name}/part-{part:05d}.parquet"
+        items, count = [], 0
+        with pq.ParquetWriter(os.path.join(self.path, file_name), schema,
+                              compression=self.compression) as writer:
+            for item in self.cosmos_db_service.iter_items(
+                    query="SELECT * FROM c", container_name=container_name,
+                    page_size=self.page_size, feed_range=feed_range):
+                items.append(item)
+                if len(items) == self.page_size:
+                    writer.write_batch(to_record_batch(items, schema, fields))
+                    count += len(items)
+                    items = []
+            if items:
+                writer.write_batch(to_record_batch(items, schema, fields))
+                count += len(items)
+        return {"file": file_name, "items": count}
+
+    def export_container(self, container_name: str) -> dict:
+        start = time.perf_counter()
+        os.makedirs(os.path.join(self.path, container_name), exist_ok=True)
+        profile = self.profiles.read(container_name)
+        fields = vector_fields(profile)
+        feed_ranges = self.cosmos_db_service.feed_ranges(container_name)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            parts = list(executor.map(
+                lambda args: self.export_range(container_name, args[0], args[1], fields),
+                enumerate(feed_ranges)))
+
+        entry = {
+            "items": sum(part["items"] for part in parts),
+            "parts": parts,
+            "vector_fields": fields,
+            "profile": {key: profile.get(key) for key in ("active", "shadow")},
+            # Without its vector and full-text policies, an imported container cannot be searched
+            "settings": self.cosmos_db_service.read_container_settings(container_name),
+        }
+        seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(self.path, part["file"])) for part in parts)
+        logger.info(f"Exported {entry['items']} items of {container_name} from {len(parts)} feed ranges "
+                    f"in {seconds:.1f}s ({entry['items'] / max(seconds, 1e-9):,.0f} items/s, "
+                    f"{size / 2 ** 20:.1f} MB)")
+        return entry
+
+    def run(self, containers: Optional[List[str]] = None) -> dict:
+        """Export containers and write the snapshot's manifest."""
+        os.makedirs(self.path, exist_ok=True)
+        manifest = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "containers": {container_name: self.export_container(container_name)
+                           for container_name in containers or snapshot_containers},
+        }
+        with open(os.path.join(self.path, manifest_name), "w") as file:
+            json.dump(manifest, file, indent=2)
+        return manifest
+
+
+class WriteThrottle:
+    """Adapts the number of concurrent writes to the throughput Cosmos DB grants.
+
+    Writes that are still throttled after the SDK's own retries halve the
+    concurrency and pause all writers for the retry-after interval; every run
+    of successful writes as long as the current limit raises it by one again,
+    up to max_concurrency.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.active >= self.limit:
+                    self.condition.wait()
+                else:
+                    self.active += 1
+                    return
+
+    def release(self, retry_after: Optional[float] = None) -> None:
+        """Release a write slot; retry_after is set if the write was throttled."""
+        with self.condition:
+            self.active -= 1
+            if retry_after is not None:
+                self.throttled += 1
+                self.successes = 0
+                self.limit = max(self.limit // 2, 1)
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+def retry_after_seconds(error: exceptions.CosmosHttpResponseError, attempt: int) -> float:
+    """Return how long Cosmos DB asked to wait, or an exponential backoff."""
+    retry_after = (error.headers or {}).get("x-ms-retry-after-ms")
+    return float(retry_after) / 1000 if retry_after else min(2 ** attempt, 30)
+
+
+class SnapshotImporter:
+    """Bulk-imports a snapshot into containers, or into a LocalCosmosStore.
+
+    Missing containers are created with the policies of the exported ones, so
+    they can be searched like them. Items are upserted by a pool of writers
+    whose concurrency a WriteThrottle adapts, so an import runs at the
+    container's provisioned throughput without failing on throttling. Upserts
+    make an interrupted import safe to run again.
+    """
+
+    def __init__(self,
+                 cosmos_db_service: CosmosDBService,
+                 path: str,
+                 workers: int = 16,
+                 batch_size: int = 1000,
+                 max_retries: int = 5):
+        self.cosmos_db_service = cosmos_db_service
+        self.path = path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+
+    def read_manifest(self) -> dict:
+        with open(os.path.join(self.path, manifest_name)) as file:
+            return json.load(file)
+
+    def iter_items(self, entry: dict) -> Iterator[dict]:
+        """Yield the items of a container's snapshot, a record batch at a time."""
+        for part in entry["parts"]:
+            parquet_file = pq.ParquetFile(os.path.join(self.path, part["file"]))
+            for batch in parquet_file.iter_batches(batch_size=self.batch_size):
+                yield from from_record_batch(batch)
+
+    def write_item(self, item: dict, container_name: str, throttle: WriteThrottle) -> bool:
+        for attempt in range(self.max_retries + 1):
+            throttle.acquire()
+            try:
+                self.cosmos_db_service.upsert_item(item=item, container_name=container_name)
+                throttle.release()
+                return True
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code != 429 or attempt == self.max_retries:
+                    throttle.release()
+                    logger.error(f"Error importing item {item['id']} into {container_name}: {e}")
+                    return False
+                throttle.release(retry_after_seconds(e, attempt))
+            except Exception as e:
+                throttle.release()
+                logger.error(f"Error importing item {item['id']} into {container_name}: {e}")
+                return False
+        return False
+
+    def ensure_container(self, container_name: str, settings: dict) -> None:
+        """Create a missing container with the snapshot's policies, and check those of an existing one."""
+        self.cosmos_db_service.ensure_container(container_name, settings)
+        current = self.cosmos_db_service.read_container_settings(container_name)
+        for key in ("vectorEmbeddingPolicy", "fullTextPolicy"):
+            if settings.get(key) and current.get(key) != settings[key]:
+                logger.warning(f"The {key} of {container_name} differs from the snapshot's, "
+                               f"so vector or full-text search may not find the imported items")
+
+    def import_container(self, container_name: str, entry: dict, target: Optional[str] = None) -> dict:
+        target = target or container_name
+        start = time.perf_counter()
+        self.ensure_container(target, entry.get("settings") or {})
+        throttle = WriteThrottle(self.workers)
+        stats = {"items": 0, "written": 0, "failed": 0}
+
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def write_batch(items: List[dict]) -> None:
+                written = sum(executor.map(lambda item: self.write_item(item, target, throttle), items))
+                stats["items"] += len(items)
+                stats["written"] += written
+                stats["failed"] += len(items) - written
+
+            for item in self.iter_items(entry):
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    write_batch(batch)
+                    batch = []
+            if batch:
+                write_batch(batch)
+
+        seconds = time.perf_counter() - start
+        stats["throttled"] = throttle.throttled
+        logger.info(f"Imported {stats['written']} of {stats['items']} items of {container_name} into {target} "
+                    f"in {seconds:.1f}s ({stats['written'] / max(seconds, 1e-9):,.0f} items/s, "
+                    f"{stats['throttled']} throttled, final concurrency {throttle.limit})")
+        return stats
+
+    def run(self, containers: Optional[List[str]] = None, targets: Optional[Dict[str, str]] = None) -> dict:
+        """Import a snapshot's containers, optionally into containers of other names."""
+        manifest = self.read_manifest()
+        targets = targets or {}
+        return {container_name: self.import_container(container_name, manifest["containers"][container_name],
+                                                      targets.get(container_name))
+                for container_name in containers or list(manifest["containers"])}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("azure.cosmos").setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(
+        description="Export containers to a Parquet snapshot, or import one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export containers to a snapshot directory")
+    export_parser.add_argument("--workers", type=int, default=8, help="Feed ranges read in parallel")
+    import_parser = subparsers.add_parser("import", help="Import a snapshot directory")
+    import_parser.add_argument("--workers", type=int, default=16, help="Maximum concurrent writes")
+    import_parser.add_argument("--target", action="append", default=[], metavar="CONTAINER=TARGET",
+                               help="Import a container into a container of another name")
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("path")
+        subparser.add_argument("--containers", nargs="+", help="Default: all containers of the snapshot")
+    args = parser.parse_args()
+
+    cosmos_db_service = CosmosDBService()
+    if args.command == "export":
+        manifest = SnapshotExporter(cosmos_db_service, args.path, workers=args.workers).run(args.containers)
+        print({name: entry["items"] for name, entry in manifest["containers"].items()})
+    else:
+        print(SnapshotImporter(cosmos_db_service, args.path, workers=args.workers).run(
+            args.containers, dict(target.split("=", 1) for target in args.target)))
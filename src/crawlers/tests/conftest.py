@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The crawlers import each other as top-level modules, as the Functions host runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from embedding_profiles import profile_id, profiles_container_name
+from local_cosmos_store import LocalCosmosStore
+from snapshots import SnapshotExporter, SnapshotImporter
+
+container_name = "blog-posts"
+
+settings = {
+    "vectorEmbeddingPolicy": {"vectorEmbeddings": [
+        {"path": "/embedding", "dataType": "float32", "distanceFunction": "cosine", "dimensions": 1536}]},
+    "fullTextPolicy": {"defaultLanguage": "en-US", "fullTextPaths": [{"path": "/content", "language": "en-US"}]},
+}
+
+
+@pytest.fixture
+def store() -> LocalCosmosStore:
+    rng = np.random.default_rng(7)
+    store = LocalCosmosStore()
+    store.ensure_container(profiles_container_name)
+    store.upsert_item({
+        "id": profile_id(container_name),
+        "container": container_name,
+        "active": {"model": "text-embedding-3-small", "dimensions": 1536, "field": "embedding"},
+        "shadow": {"model": "text-embedding-3-large", "dimensions": 8, "field": "embedding_v2"},
+    }, profiles_container_name)
+    store.ensure_container(container_name, settings)
+    for index in range(12):
+        store.upsert_item({
+            "id": f"post-{index:02d}",
+            "title": f"Post {index}",
+            "published_date": f"2026-01-{index + 1:02d}",
+            "embedding": rng.random(1536, dtype=np.float32).tolist(),
+            # Items crawled before the migration have no shadow embedding yet
+            **({"embedding_v2": rng.random(8, dtype=np.float32).tolist()} if index % 2 else {}),
+        }, container_name)
+    # An item without text has an empty embedding, which stays in the JSON document
+    store.upsert_item({"id": "post-99", "title": "No text", "embedding": []}, container_name)
+    return store
+
+
+def test_snapshot_round_trip(store, tmp_path):
+    manifest = SnapshotExporter(store, str(tmp_path)).run([container_name])
+    assert manifest["containers"][container_name]["items"] == 13
+
+    imported = LocalCosmosStore()
+    stats = SnapshotImporter(imported, str(tmp_path), workers=2).run()
+    assert stats[container_name]["written"] == 13
+    assert imported.read_container_settings(container_name) == settings
+
+    query = "SELECT * FROM c"
+    for item, copy in zip(sorted(store.query_items(query, container_name), key=lambda item: item["id"]),
+                          sorted(imported.query_items(query, container_name), key=lambda item: item["id"])):
+        assert copy["id"] == item["id"] and copy["title"] == item["title"]
+        for field in ("embedding", "embedding_v2"):
+            assert (field in copy) == (field in item)
+            if field in item:
+                assert np.allclose(copy[field], item[field], atol=1e-6)
+
+    top = imported.query_items(
+        "SELECT TOP @count c.id, c.published_date FROM c WHERE IS_ARRAY(c.embedding_v2) "
+        "ORDER BY c.published_date DESC",
+        container_name, parameters=[{"name": "@count", "value": 3}])
+    assert [item["id"] for item in top] == ["post-11", "post-09", "post-07"]
+
+
+def test_unsupported_query_is_named(store):
+    with pytest.raises(ValueError, match="VectorDistance"):
+        store.query_items("SELECT TOP 5 c.id FROM c ORDER BY VectorDistance(c.embedding, @embedding)",
+                          container_name, parameters=[{"name": "@embedding", "value": [0.1] * 1536}])
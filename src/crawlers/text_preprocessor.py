@@ -0,0 +1,234 @@
+import html
+import logging
+import re
+import threading
+from html.parser import HTMLParser
+
+# Configure logging
+logger = logging.getLogger("azure.functions")
+
+# Sections of README files that are the same in every repository of an organization
+boilerplate_headings = re.compile(
+    r"^((contributing|code of conduct|license|licensing|trademarks?|legal notices?)\b.*|"
+    r"contributions?|security|reporting security issues|support|disclaimer|"
+    r"table of contents|contents|toc)$", re.IGNORECASE)
+
+# Paragraphs of boilerplate that also appear outside of their own section
+boilerplate_paragraphs = re.compile(
+    r"(Contributor License Agreement|Microsoft Open Source Code of Conduct|"
+    r"opencode@microsoft\.com|trademarks or logos is subject to|"
+    r"Microsoft's Trademark & Brand Guidelines|Microsoft Security Response Center)",
+    re.IGNORECASE)
+
+# Feed boilerplate after the post itself
+feed_footers = re.compile(
+    r"\n(The post .{0,300} appeared first on .*|Continue reading.*|Read more.*)$",
+    re.IGNORECASE | re.DOTALL)
+
+# Fenced code blocks and HTML comments, removed first so their lines are not read as headings
+code_blocks = re.compile(r"^[ \t]*(```|~~~).*?^[ \t]*\1[^\n]*$|<!--.*?-->", re.MULTILINE | re.DOTALL)
+
+markdown_patterns = [
+    # Badges, i.e. linked images, then images
+    (re.compile(r"\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)"), ""),
+    (re.compile(r"!\[[^\]]*\]\([^)]*\)"), ""),
+    (re.compile(r"!\[[^\]]*\]\[[^\]]*\]"), ""),
+    # Links keep their text, reference definitions go
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"\[([^\]]*)\]\[[^\]]*\]"), r"\1"),
+    (re.compile(r"^[ \t]*\[[^\]]+\]:\s*\S+.*$", re.MULTILINE), ""),
+    # Bare URLs
+    (re.compile(r"<?https?://\S+>?"), ""),
+    # Tables: separator rows, then cell borders
+    (re.compile(r"^[ \t]*\|?[ \t]*:?-{3,}:?[ \t]*(\|[ \t]*:?-{3,}:?[ \t]*)*\|?[ \t]*$", re.MULTILINE), ""),
+    (re.compile(r"[ \t]*\|[ \t]*"), " "),
+    # Horizontal rules, heading markers, quotes and emphasis
+    (re.compile(r"^[ \t]*([-*_][ \t]*){3,}$", re.MULTILINE), ""),
+    (re.compile(r"^[ \t]*#{1,6}[ \t]*", re.MULTILINE), ""),
+    (re.compile(r"^[ \t]*>[ \t]?", re.MULTILINE), ""),
+    (re.compile(r"(\*\*|__|~~|`)"), ""),
+]
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Collect the text of an HTML document, without code, media and page chrome."""
+
+    skipped_tags = {"script", "style", "pre", "code", "nav", "header", "footer", "aside",
+                    "figure", "svg", "noscript", "iframe", "form", "button", "template"}
+    block_tags = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "section", "article", "blockquote", "table", "tr", "hr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skipped_tags:
+            self.skip_depth += 1
+        elif tag in self.block_tags:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.skipped_tags:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in self.block_tags:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class TextPreprocessor:
+    """Turns crawled HTML and Markdown into clean text within the summarizer's token budget.
+
+    Code blocks, badges, images, links, markup and boilerplate sections are
+    removed, and the text is cut to token_budget tokens, counted with the
+    summarization model's tokenizer. Tokens before and after are counted per
+    run, to report what preprocessing saved.
+    """
+
+    def __init__(self, token_budget: int = 4000, encoding_name: str = "o200k_base"):
+        self.token_budget = token_budget
+        self.encoding_name = encoding_name
+        self.encoding = None
+        self.encoding_loaded = False
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def get_encoding(self):
+        """Load the tokenizer once; fall back to estimates if it is unavailable."""
+        with self.lock:
+            if not self.encoding_loaded:
+                self.encoding_loaded = True
+                try:
+                    import tiktoken
+                    self.encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    logger.warning(
+                        f"Tokenizer {self.encoding_name} unavailable, estimating tokens instead: {e}")
+        return self.encoding
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self.get_encoding()
+        if encoding is None:
+            return len(text) // 4 + 1 if text else 0
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to max_tokens tokens, at the last paragraph or sentence break if close."""
+        encoding = self.get_encoding()
+        if encoding is None:
+            if len(text) <= max_tokens * 4:
+                return text
+            cut = text[:max_tokens * 4]
+        else:
+            tokens = encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            cut = encoding.decode(tokens[:max_tokens])
+
+        # Prefer a clean break within the last tenth of the budget
+        for separator in ("\n\n", ". ", "\n"):
+            position = cut.rfind(separator)
+            if position >= len(cut) * 0.9:
+                return cut[:position + len(separator)].rstrip()
+        return cut
+
+    @staticmethod
+    def html_to_text(content: str) -> str:
+        extractor = HTMLTextExtractor()
+        try:
+            extractor.feed(content)
+            extractor.close()
+            text = extractor.text()
+        except Exception as e:
+            logger.warning(f"Failed to parse HTML, removing tags instead: {e}")
+            text = html.unescape(re.sub(r"<[^>]+>", " ", content))
+        return feed_footers.sub("", text.strip())
+
+    @staticmethod
+    def remove_boilerplate_sections(content: str) -> str:
+        """Drop Markdown sections with a boilerplate heading, up to the next heading of the same level."""
+        kept, skip_level = [], None
+        for line in content.splitlines():
+            heading = re.match(r"^[ \t]*(#{1,6})[ \t]+(.*)$", line)
+            if heading:
+                level = len(heading.group(1))
+                if skip_level is not None and level > skip_level:
+                    continue
+                title = re.sub(r"[^\w\s&']", "", heading.group(2)).strip()
+                skip_level = level if boilerplate_headings.match(title) else None
+            if skip_level is None:
+                kept.append(line)
+        return "\n".join(kept)
+
+    def markdown_to_text(self, content: str) -> str:
+        text = self.remove_boilerplate_sections(code_blocks.sub("", content))
+        # READMEs mix in HTML, e.g. centered logos and badge rows
+        text = re.sub(r"<(pre|code|script|style)\b.*?</\1>", "", text,
+                      flags=re.DOTALL | re.IGNORECASE)
+        text = re.sub(r"<img\b[^>]*>", "", text, flags=re.IGNORECASE)
+        text = html.unescape(re.sub(r"</?[A-Za-z][^>]*>", "", text))
+        for pattern, replacement in markdown_patterns:
+            text = pattern.sub(replacement, text)
+        return text
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Drop boilerplate paragraphs and collapse whitespace, keeping paragraph breaks."""
+        paragraphs = []
+        for paragraph in re.split(r"\n[ \t]*\n", text):
+            paragraph = "\n".join(line.strip() for line in paragraph.splitlines() if line.strip())
+            paragraph = re.sub(r"[ \t]+", " ", paragraph)
+            if paragraph and not boilerplate_paragraphs.search(paragraph):
+                paragraphs.append(paragraph)
+        return "\n\n".join(paragraphs)
+
+    def prepare(self, content: str, content_type: str = "markdown") -> str:
+        """Convert HTML or Markdown to clean text cut to the token budget, counting the tokens saved."""
+        if not content:
+            return ""
+        if content_type == "html":
+            text = self.html_to_text(content)
+        else:
+            text = self.markdown_to_text(content)
+        text = self.normalize(text)
+        prepared = self.truncate(text, self.token_budget)
+
+        tokens_before = self.count_tokens(content)
+        tokens_after = self.count_tokens(prepared)
+        with self.lock:
+            self.texts += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            self.truncated += int(len(prepared) < len(text))
+        return prepared
+
+    def reset_stats(self) -> None:
+        self.texts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.truncated = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "texts": self.texts,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_before - self.tokens_after,
+            "truncated": self.truncated,
+        }
+
+    def log_stats(self, crawler_name: str) -> None:
+        """Log the tokens preprocessing saved since the stats were reset."""
+        stats = self.get_stats()
+        saved_ratio = stats["tokens_saved"] / stats["tokens_before"] if stats["tokens_before"] else 0.0
+        logger.info(
+            f"{crawler_name} preprocessing: {stats['texts']} texts, "
+            f"{stats['tokens_before']} tokens before, {stats['tokens_after']} after, "
+            f"{stats['tokens_saved']} saved ({saved_ratio:.0%}), {stats['truncated']} truncated")